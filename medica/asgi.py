@@ -11,6 +11,10 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from medica.database import asgi_default_mode
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medica.settings')
+# Persistent connections are not reused by async requests, see medica/database.py
+os.environ.setdefault('DB_CONNECTIONS', asgi_default_mode())
 
 application = get_asgi_application()
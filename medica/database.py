@@ -0,0 +1,64 @@
+"""
+Connection management modes for the Postgres database (DB_CONNECTIONS).
+
+- 'per-request': Django's default, a new connection (TCP + TLS + auth)
+  for every request.
+- 'persistent': each worker thread keeps its connection for
+  DB_CONN_MAX_AGE seconds. The connection is checked before its first
+  use in a request, so a dropped one is replaced instead of failing the
+  request.
+- 'pool': a psycopg 3 connection pool per process (needs psycopg[pool]).
+  Connections are checked when they are handed out, and requests hand
+  them back when they finish. Pool sizes come from DB_POOL_MIN_SIZE and
+  DB_POOL_MAX_SIZE.
+- 'pgbouncer': behind a transaction-pooling proxy such as pgbouncer or
+  Supavisor (port 6543 on Supabase). Consecutive transactions may run on
+  different server connections, so server-side cursors (.iterator()) and
+  psycopg 3 prepared statements are turned off. LISTEN does not work
+  either, so EVENT_BROKER='postgres' needs a direct connection.
+
+'persistent' is the default under WSGI. It does not suit ASGI: Django
+opens the connections of async requests in a fresh context each time, so
+they are never reused and each one stays open for DB_CONN_MAX_AGE.
+medica/asgi.py therefore defaults to asgi_default_mode() instead.
+"""
+from importlib.util import find_spec
+
+CONNECTION_MODES = ['per-request', 'persistent', 'pool', 'pgbouncer']
+DEFAULT_CONN_MAX_AGE = 600
+DEFAULT_POOL_MIN_SIZE = 2
+DEFAULT_POOL_MAX_SIZE = 10
+
+
+def asgi_default_mode():
+    """DB_CONNECTIONS mode used under ASGI when none is set: 'pool' when psycopg_pool is installed"""
+    return 'pool' if find_spec('psycopg_pool') is not None else 'per-request'
+
+
+def connection_settings(mode, conn_max_age=DEFAULT_CONN_MAX_AGE,
+                        pool_min_size=DEFAULT_POOL_MIN_SIZE, pool_max_size=DEFAULT_POOL_MAX_SIZE):
+    """DATABASES entries (CONN_MAX_AGE, OPTIONS, ...) for a connection mode, to merge into a database"""
+    if mode == 'per-request':
+        return {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False}
+    if mode == 'persistent':
+        return {'CONN_MAX_AGE': conn_max_age, 'CONN_HEALTH_CHECKS': True}
+    if mode == 'pool':
+        # Pooled connections go back to the pool, they must not also persist
+        return {
+            'CONN_MAX_AGE': 0,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {'pool': {'min_size': pool_min_size, 'max_size': pool_max_size}},
+        }
+    if mode == 'pgbouncer':
+        options = {}
+        if find_spec('psycopg') is not None:
+            # Django uses psycopg 3 when it is installed. It prepares statements run 5 times by
+            # default, and another client's server connection does not know them
+            options['prepare_threshold'] = None
+        return {
+            'CONN_MAX_AGE': conn_max_age,
+            'CONN_HEALTH_CHECKS': True,
+            'DISABLE_SERVER_SIDE_CURSORS': True,
+            'OPTIONS': options,
+        }
+    raise ValueError(f"Unknown DB_CONNECTIONS mode {mode!r}, expected one of {', '.join(CONNECTION_MODES)}")
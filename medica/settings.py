@@ -14,6 +14,8 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 
+from .database import DEFAULT_CONN_MAX_AGE, DEFAULT_POOL_MAX_SIZE, DEFAULT_POOL_MIN_SIZE, connection_settings
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(BASE_DIR / '.env')
 
@@ -40,6 +42,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.sites',
+    'django.contrib.postgres',
     
     # Apps
     'medica911',
@@ -54,11 +57,16 @@ INSTALLED_APPS = [
 SITE_ID = 1
 
 MIDDLEWARE = [
+    # First, so its timings cover the whole stack
+    'medica911.middleware.PerformanceMiddleware',
+    # Before anything that reads the database (sessions, auth)
+    'medica911.middleware.ReplicaStickinessMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # request.user from cached snapshots (see medica911/auth_cache.py)
+    'medica911.middleware.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
@@ -68,16 +76,25 @@ ROOT_URLCONF = 'medica.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates plus render timing for the performance metrics
+        'BACKEND': 'medica911.metrics.InstrumentedDjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compiled templates are kept for the life of the process (and the
+            # doctor cards are cached rendered, see medica911/fragments.py)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'medica911.context_processors.google_config',
+                'medica911.context_processors.live_notifications',
             ],
         },
     },
@@ -100,6 +117,98 @@ DATABASES = {
     }
 }
 
+# How connections are kept between requests, see medica/database.py
+# 'persistent' by default, 'pool' needs psycopg[pool], 'pgbouncer' for a
+# transaction-pooling proxy (Supabase's Supavisor on port 6543).
+# medica.asgi defaults to 'pool' instead ('per-request' without psycopg[pool])
+
+DATABASES['default'].update(connection_settings(
+    os.getenv('DB_CONNECTIONS', 'persistent'),
+    conn_max_age=int(os.getenv('DB_CONN_MAX_AGE', DEFAULT_CONN_MAX_AGE)),
+    pool_min_size=int(os.getenv('DB_POOL_MIN_SIZE', DEFAULT_POOL_MIN_SIZE)),
+    pool_max_size=int(os.getenv('DB_POOL_MAX_SIZE', DEFAULT_POOL_MAX_SIZE)),
+))
+
+# Read replicas, a comma separated list of hosts in DB_REPLICA_HOSTS
+# Safe reads are spread over them, see medica911/routers.py. Tests run them
+# as mirrors of the test database.
+
+DATABASE_REPLICAS = []
+for index, host in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(','))):
+    alias = f'replica_{index + 1}'
+    DATABASES[alias] = {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['medica911.routers.ReplicaRouter']
+# Reads stay on the primary this long after a browser's last write
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', '10'))
+
+
+# Cache
+# Local memory by default, set REDIS_URL to share the cache between workers
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Cached request users (medica911/auth_cache.py) are dropped from the cache
+# when a user changes, which only reaches every worker through a shared
+# cache. By default they are used with a shared cache only, set
+# AUTH_USER_SNAPSHOTS to 'true' or 'false' to decide otherwise
+AUTH_USER_SNAPSHOTS = {'true': True, 'false': False}.get(os.getenv('AUTH_USER_SNAPSHOTS', '').lower())
+
+
+# Sessions
+# Read from the cache, written through to the database so they survive a
+# cache flush or restart
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+
+# Live notification stream
+# The stream is an endless response that only an ASGI server (uvicorn,
+# daphne) can hold open cheaply. Turn LIVE_NOTIFICATIONS on when serving
+# medica.asgi, pages then open it. Under WSGI (runserver) the endpoint
+# answers 204 and pages show the badge count of their last load.
+# 'memory' reaches the streams of the publishing process only, use 'postgres'
+# (LISTEN/NOTIFY) when running several ASGI workers
+
+LIVE_NOTIFICATIONS = os.getenv('LIVE_NOTIFICATIONS', 'false').lower() == 'true'
+EVENT_BROKER = os.getenv('EVENT_BROKER', 'memory')
+
+
+# Performance metrics
+# METRICS_DIR must be set (and shared by the workers of a host) when running
+# several worker processes so that /metrics reports all of them.
+# Outside DEBUG, /metrics is refused unless METRICS_TOKEN is set, scrapers
+# then send it as an `Authorization: Bearer <token>` header
+
+METRICS_DIR = os.getenv('METRICS_DIR') or None
+METRICS_TOKEN = os.getenv('METRICS_TOKEN') or None
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', '500'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'medica911.performance': {'handlers': ['console'], 'level': 'WARNING'},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
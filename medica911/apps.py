@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class Medica911Config(AppConfig):
     name = 'medica911'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,126 @@
+"""
+Cached request users.
+
+Sessions use the cached_db engine (see settings), so reading one is a
+cache hit. CachedAuthenticationMiddleware then builds request.user from a
+compact snapshot of the user instead of loading the row on every
+request. The snapshot keeps the columns used by the role decorators,
+the navbar and the dashboard headers, the doctor profile id, and the session auth hash that
+verifies the session. The other columns are deferred, so reading one
+loads it as with .only().
+
+Snapshots are dropped once a transaction that changes them commits. The
+User and Doctor signals in signals.py cover saves and deletes, and the
+bulk writers call forget_users() themselves (notification counters,
+CSV import). On a miss, or when the session hash does not match (password
+changed, rotated SECRET_KEY), django.contrib.auth does the usual lookup
+and checks, and its result is cached again. That lookup reads the primary,
+a lagging replica could miss another user's write (a deactivation, a new
+notification) and the snapshot would keep it for SNAPSHOT_TIMEOUT.
+
+forget_users() only reaches the workers sharing the cache. With a
+per-process cache (local memory, the default without REDIS_URL) other
+workers would keep a deactivated user logged in, so snapshots are only
+used with a shared cache unless settings.AUTH_USER_SNAPSHOTS says otherwise.
+"""
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.crypto import constant_time_compare
+
+from .models import Doctor, User
+from .routers import reading_primary
+
+SNAPSHOT_TIMEOUT = 60 * 60
+SNAPSHOT_FIELDS = [
+    'id', 'username', 'email', 'first_name', 'last_name', 'role',
+    'is_superuser', 'is_staff', 'is_active', 'phone', 'city', 'profile_picture', 'unread_notifications',
+]
+
+
+def snapshots_enabled():
+    """Whether request users come from snapshots, by default when the cache is shared by every worker"""
+    enabled = getattr(settings, 'AUTH_USER_SNAPSHOTS', None)
+    if enabled is None:
+        return not isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache))
+    return enabled
+
+
+def _key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def _snapshot(user):
+    return (
+        {name: getattr(user, name) for name in SNAPSHOT_FIELDS},
+        user.doctor_profile_id,
+        user.get_session_auth_hash(),
+    )
+
+
+def _session_user_id(user_id, backend_path):
+    """The logged in user's id, None when the session has none (or names an unknown backend)"""
+    if user_id is None or backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return None
+    return User._meta.pk.to_python(user_id)
+
+
+def _restore(snapshot, session_hash):
+    """User instance from a snapshot, None when the snapshot no longer matches the session"""
+    if snapshot is None:
+        return None
+    values, doctor_profile_id, auth_hash = snapshot
+    if not session_hash or not constant_time_compare(session_hash, auth_hash) or not values['is_active']:
+        return None
+    # from_db() takes the values in field order
+    names = [field.attname for field in User._meta.concrete_fields if field.attname in values]
+    user = User.from_db(DEFAULT_DB_ALIAS, names, [values[name] for name in names])
+    user.__dict__['doctor_profile_id'] = doctor_profile_id
+    return user
+
+
+def get_user(request):
+    """request.user for the session: from the snapshot when it matches, else loaded and cached"""
+    session = request.session
+    user_id = _session_user_id(session.get(SESSION_KEY), session.get(BACKEND_SESSION_KEY))
+    if user_id is None:
+        return auth.get_user(request)
+    user = _restore(cache.get(_key(user_id)), session.get(HASH_SESSION_KEY))
+    if user is not None:
+        return user
+    with reading_primary():
+        user = auth.get_user(request)
+        if user.is_authenticated:
+            cache.set(_key(user.pk), _snapshot(user), SNAPSHOT_TIMEOUT)
+    return user
+
+
+async def aget_user(request):
+    """get_user() for async views"""
+    session = request.session
+    user_id = _session_user_id(await session.aget(SESSION_KEY), await session.aget(BACKEND_SESSION_KEY))
+    if user_id is None:
+        return await auth.aget_user(request)
+    user = _restore(await cache.aget(_key(user_id)), await session.aget(HASH_SESSION_KEY))
+    if user is not None:
+        return user
+    with reading_primary():
+        user = await auth.aget_user(request)
+        if user.is_authenticated:
+            # The property would query synchronously
+            user.__dict__['doctor_profile_id'] = await (
+                Doctor.objects.filter(user_id=user.pk).values_list('pk', flat=True).afirst()
+            )
+            await cache.aset(_key(user.pk), _snapshot(user), SNAPSHOT_TIMEOUT)
+    return user
+
+
+def forget_users(user_ids):
+    """Drop the snapshots of these users once the current transaction commits"""
+    keys = [_key(user_id) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,177 @@
+"""
+Slot availability engine.
+
+A doctor's day is a bitmap of 30 minute slots (bit i = slot starting at
+i * 30 minutes past midnight). The weekly template comes from the active
+DoctorAvailability windows, and each cached day bitmap is the template for
+that weekday with the non-cancelled appointments cleared. Day bitmaps are
+invalidated by the signals in signals.py when bookings or schedules change.
+"""
+import time as time_module
+from datetime import time, timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Appointment, DoctorAvailability
+
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+CACHE_TIMEOUT = 60 * 60 * 24
+
+# Doctors who never set a schedule keep the historical 08:00 - 18:00 every day
+DEFAULT_WINDOW = (time(8, 0), time(18, 0))
+
+# Statuses that free the slot again
+RELEASED_STATUSES = ['cancelled']
+
+
+def slot_index(value):
+    return (value.hour * 60 + value.minute) // SLOT_MINUTES
+
+
+def slot_time(index):
+    minutes = index * SLOT_MINUTES
+    return time(minutes // 60, minutes % 60)
+
+
+def window_bitmap(start, end):
+    """Bitmap of the slots that fit entirely inside [start, end)"""
+    start_minutes = start.hour * 60 + start.minute
+    end_minutes = end.hour * 60 + end.minute
+    bitmap = 0
+    for index in range(SLOTS_PER_DAY):
+        if index * SLOT_MINUTES >= start_minutes and (index + 1) * SLOT_MINUTES <= end_minutes:
+            bitmap |= 1 << index
+    return bitmap
+
+
+def bitmap_times(bitmap):
+    return [slot_time(index) for index in range(SLOTS_PER_DAY) if bitmap >> index & 1]
+
+
+# --- Cache keys ---
+
+def _version_key(doctor_id):
+    return f'availability:{doctor_id}:version'
+
+
+def _schedule_version(doctor_id):
+    version = cache.get(_version_key(doctor_id))
+    if version is None:
+        version = time_module.time_ns()
+        cache.add(_version_key(doctor_id), version, None)
+        version = cache.get(_version_key(doctor_id), version)
+    return version
+
+
+def _template_key(doctor_id, version):
+    return f'availability:{doctor_id}:{version}:week'
+
+
+def _day_key(doctor_id, version, day):
+    return f'availability:{doctor_id}:{version}:{day.isoformat()}'
+
+
+def invalidate_schedule(doctor_id):
+    """Drop every cached bitmap of a doctor (their weekly windows changed)"""
+    cache.set(_version_key(doctor_id), time_module.time_ns(), None)
+
+
+def invalidate_days(doctor_id, days):
+    """Drop the cached bitmaps of specific days (a booking on those days changed)"""
+    version = _schedule_version(doctor_id)
+    cache.delete_many([_day_key(doctor_id, version, day) for day in days])
+
+
+# --- Bitmaps ---
+
+def weekly_template(doctor_id, version=None):
+    """List of 7 bitmaps (Monday first) built from the doctor's active availability windows"""
+    version = version or _schedule_version(doctor_id)
+    key = _template_key(doctor_id, version)
+    template = cache.get(key)
+    if template is not None:
+        return template
+
+    windows = list(
+        DoctorAvailability.objects.filter(doctor_id=doctor_id)
+        .values_list('day_of_week', 'start_time', 'end_time', 'is_active')
+    )
+    if windows:
+        template = [0] * 7
+        for day_of_week, start, end, is_active in windows:
+            if is_active:
+                template[day_of_week] |= window_bitmap(start, end)
+    else:
+        template = [window_bitmap(*DEFAULT_WINDOW)] * 7
+
+    cache.set(key, template, CACHE_TIMEOUT)
+    return template
+
+
+def day_bitmaps(doctor_id, start, end):
+    """Free-slot bitmaps for every day in [start, end], reading through the cache"""
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    version = _schedule_version(doctor_id)
+    keys = {day: _day_key(doctor_id, version, day) for day in days}
+    cached = cache.get_many(keys.values())
+
+    bitmaps = {}
+    missing = []
+    for day in days:
+        if keys[day] in cached:
+            bitmaps[day] = cached[keys[day]]
+        else:
+            missing.append(day)
+
+    if missing:
+        template = weekly_template(doctor_id, version)
+        computed = {day: template[day.weekday()] for day in missing}
+        booked = (
+            Appointment.objects
+            .filter(doctor_id=doctor_id, appointment_date__range=(missing[0], missing[-1]))
+            .exclude(status__in=RELEASED_STATUSES)
+            .values_list('appointment_date', 'appointment_time')
+        )
+        for day, booked_time in booked:
+            if day in computed:
+                computed[day] &= ~(1 << slot_index(booked_time))
+        cache.set_many({keys[day]: bitmap for day, bitmap in computed.items()}, CACHE_TIMEOUT)
+        bitmaps.update(computed)
+
+    return bitmaps
+
+
+def _bookable_bitmap(day, bitmap, now):
+    # Past days and already started slots of today are never offered
+    today = now.date()
+    if day < today:
+        return 0
+    if day == today:
+        passed = slot_index(now.time()) + 1
+        bitmap &= ~((1 << passed) - 1)
+    return bitmap
+
+
+def free_slots(doctor_id, start, end):
+    """Map each day in [start, end] to the list of bookable slot times"""
+    now = timezone.localtime()
+    return {
+        day: bitmap_times(_bookable_bitmap(day, bitmap, now))
+        for day, bitmap in day_bitmaps(doctor_id, start, end).items()
+    }
+
+
+def is_slot_free(doctor_id, day, slot):
+    """Whether a single slot can still be booked"""
+    bitmap = _bookable_bitmap(day, day_bitmaps(doctor_id, day, day)[day], timezone.localtime())
+    return bool(bitmap >> slot_index(slot) & 1)
+
+
+def slot_choices(doctor_id):
+    """Every slot time the doctor could offer on some weekday, for form choices"""
+    union = 0
+    for bitmap in weekly_template(doctor_id):
+        union |= bitmap
+    return bitmap_times(union)
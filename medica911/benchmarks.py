@@ -0,0 +1,198 @@
+"""
+View benchmark harness.
+
+run_benchmarks() requests every route of medica911.urls as each role
+(anonymous, client, doctor, admin) against a synthetic dataset and
+measures latency percentiles, SQL queries and the peak memory allocated
+while serving the request. compare() checks a run against a saved JSON
+baseline and lists the views that got slower, chattier or hungrier.
+
+The benchmark_views management command wires both together, in a throwaway
+test database seeded by synthetic.SyntheticDataset.
+"""
+import gc
+import json
+import statistics
+import time
+import tracemalloc
+
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+
+from . import urls
+from .models import Appointment, User
+
+ROLES = ('anonymous', 'client', 'doctor', 'admin')
+BENCHMARK_PREFIX = 'benchmark'
+
+# Routes a plain request loop cannot measure, with the reason printed in the report
+SKIPPED = {
+    'logout': "ends the session the following requests rely on",
+    'notification_stream': "Server-Sent Events stream that never completes",
+}
+# Routes that only accept POST, sent with empty data
+POST_ROUTES = {'mark_notifications_read'}
+# Query strings worth measuring on top of the bare route
+VARIANTS = {
+    'browse_doctors': ['?name=card', '?city=Tunis', '?near=Sousse&radius=25'],
+}
+
+
+def route_names():
+    return [pattern.name for pattern in urls.urlpatterns if isinstance(pattern, URLPattern)]
+
+
+class Actors:
+    """The users each role logs in as and the objects the routes point at"""
+
+    def __init__(self, prefix=BENCHMARK_PREFIX):
+        # A client with a completed, unreviewed visit, so add_review renders its form
+        appointment = (
+            Appointment.objects.filter(
+                client__username__startswith=f'{prefix}-', status='completed', review__isnull=True
+            )
+            .select_related('client', 'doctor__user').order_by('pk').first()
+        )
+        if appointment is None:
+            raise ValueError(f"No {prefix}-* dataset with a completed appointment to benchmark against")
+        self.users = {
+            'anonymous': None,
+            'client': appointment.client,
+            'doctor': appointment.doctor.user,
+            'admin': User.objects.get(username=f'{prefix}-admin'),
+        }
+        self.kwargs = {
+            'pk': appointment.pk,
+            'appointment_id': appointment.pk,
+            'doctor_id': appointment.doctor_id,
+            'role': 'doctor',
+        }
+
+    def paths(self):
+        """[(name, path, method)] of every measurable route, raising on a route whose arguments are unknown"""
+        paths = []
+        for pattern in urls.urlpatterns:
+            if pattern.name in SKIPPED:
+                continue
+            names = pattern.pattern.regex.groupindex
+            missing = set(names) - set(self.kwargs)
+            if missing:
+                raise ValueError(f"Don't know how to fill {', '.join(sorted(missing))} of the '{pattern.name}' route")
+            path = reverse(pattern.name, kwargs={name: self.kwargs[name] for name in names})
+            method = 'post' if pattern.name in POST_ROUTES else 'get'
+            paths.append((pattern.name, path, method))
+            for query in VARIANTS.get(pattern.name, ()):
+                paths.append((f'{pattern.name}{query}', path + query, method))
+        return paths
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def measure(client, path, method='get', requests=30, warmup=3):
+    """Latency percentiles (ms), queries and peak allocated KiB of one route"""
+    def send(path):
+        response = getattr(client, method)(path)
+        if response.streaming:
+            # A streamed body is only produced, and its rows only queried, while it is consumed
+            for _ in response.streaming_content:
+                pass
+        return response
+
+    for _ in range(warmup):
+        send(path)
+
+    # The request_started signal empties the query log, so it must start out empty too
+    reset_queries()
+    with CaptureQueriesContext(connection) as captured:
+        response = send(path)
+    # Read now, the captured queries are a view into a log the next request clears
+    queries = len(captured)
+
+    # Like timeit, keep collector pauses triggered by earlier routes out of this one's timings
+    gc.collect()
+    gc.disable()
+    timings = []
+    try:
+        for _ in range(requests):
+            start = time.perf_counter()
+            send(path)
+            timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        gc.enable()
+    timings.sort()
+
+    # Separate pass, tracing allocations slows every request down
+    tracemalloc.start()
+    try:
+        send(path)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'status': response.status_code,
+        'queries': queries,
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(_percentile(timings, 0.95), 3),
+        'p99_ms': round(_percentile(timings, 0.99), 3),
+        'memory_kib': round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(actors, roles=ROLES, requests=30, warmup=3, only=None, log=None):
+    """{'<route> [<role>]': measurements} of every route and role"""
+    results = {}
+    for role in roles:
+        # A view that crashes is reported with its 500 instead of aborting the run
+        client = Client(raise_request_exception=False)
+        if actors.users[role] is not None:
+            client.force_login(actors.users[role])
+        for name, path, method in actors.paths():
+            if only and not any(fragment in name for fragment in only):
+                continue
+            key = f'{name} [{role}]'
+            results[key] = measure(client, path, method, requests, warmup)
+            if log:
+                log(key, results[key])
+    return results
+
+
+def compare(baseline, results, threshold=0.5, min_ms=2.0, min_kib=64.0):
+    """
+    Regressions of results against baseline, as readable lines.
+
+    Query counts are exact, so any extra query is a regression. Latency and
+    memory only count when they grow by more than threshold and by more
+    than min_ms / min_kib, which keeps timer noise on fast views from
+    failing the run. Latency is judged on the median: the tail percentiles
+    are reported, but a single scheduler hiccup moves them.
+    """
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        if current['status'] != previous['status']:
+            regressions.append(f"{key}: status {previous['status']} -> {current['status']}")
+        if current['queries'] > previous['queries']:
+            regressions.append(f"{key}: {previous['queries']} -> {current['queries']} queries")
+        for metric, unit, floor in (('p50_ms', 'ms p50', min_ms), ('memory_kib', 'KiB', min_kib)):
+            before, after = previous[metric], current[metric]
+            if after > before * (1 + threshold) and after - before > floor:
+                regressions.append(f"{key}: {before:.1f} -> {after:.1f} {unit} (+{(after / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def load_baseline(path):
+    with open(path) as handle:
+        return json.load(handle)['results']
+
+
+def save_baseline(path, results, meta):
+    with open(path, 'w') as handle:
+        json.dump({'meta': meta, 'results': results}, handle, indent=2, sort_keys=True)
+        handle.write('\n')
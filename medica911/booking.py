@@ -0,0 +1,64 @@
+"""
+Contention-safe booking.
+
+A slot is claimed with a plain INSERT and the partial unique constraint on
+(doctor, date, time) decides the winner, so racing patients never take a
+lock and each attempt is a single statement. Losers get SlotUnavailable
+with the nearest free slots instead of an IntegrityError.
+"""
+from datetime import datetime, timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from . import availability
+from .models import Appointment
+
+ALTERNATIVES_COUNT = 3
+ALTERNATIVES_HORIZON_DAYS = 7
+
+
+class SlotUnavailable(Exception):
+    """The requested slot was taken, `alternatives` holds the nearest (date, time) pairs still free"""
+
+    def __init__(self, alternatives):
+        super().__init__("This time slot is no longer available.")
+        self.alternatives = alternatives
+
+
+def nearest_free_slots(doctor_id, day, slot, count=ALTERNATIVES_COUNT, horizon_days=ALTERNATIVES_HORIZON_DAYS):
+    """The `count` free slots closest in time to the requested one, looking `horizon_days` either way"""
+    requested = datetime.combine(day, slot)
+    start = max(day - timedelta(days=horizon_days), timezone.localdate())
+    free = availability.free_slots(doctor_id, start, day + timedelta(days=horizon_days))
+    candidates = [
+        (free_day, free_time)
+        for free_day, times in free.items()
+        for free_time in times
+    ]
+    candidates.sort(key=lambda candidate: abs(datetime.combine(*candidate) - requested))
+    return candidates[:count]
+
+
+def book_slot(client, doctor, appointment_date, appointment_time, reason=None):
+    """Create a pending appointment or raise SlotUnavailable if someone else holds the slot"""
+    appointment = Appointment(
+        client=client,
+        doctor=doctor,
+        appointment_date=appointment_date,
+        appointment_time=appointment_time,
+        reason=reason,
+        status='pending',
+    )
+    try:
+        if connection.in_atomic_block:
+            # Only pay for a savepoint when a caller already opened a transaction
+            with transaction.atomic():
+                appointment.save(force_insert=True)
+        else:
+            appointment.save(force_insert=True)
+    except IntegrityError:
+        # Our cached bitmap said the slot was free, so it is stale for this day
+        availability.invalidate_days(doctor.pk, [appointment_date])
+        raise SlotUnavailable(nearest_free_slots(doctor.pk, appointment_date, appointment_time))
+    return appointment
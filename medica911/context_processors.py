@@ -1,7 +1,15 @@
 import os
 
+from django.conf import settings
+
 def google_config(request):
     client_id = os.getenv('GOOGLE_CLIENT_ID', '')
     return {
         'GOOGLE_CLIENT_ID': client_id
     }
+
+
+def live_notifications(request):
+    return {
+        'LIVE_NOTIFICATIONS': settings.LIVE_NOTIFICATIONS
+    }
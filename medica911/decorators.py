@@ -2,52 +2,64 @@ from django.shortcuts import redirect
 from django.contrib import messages
 from functools import wraps
 
+from asgiref.sync import iscoroutinefunction
+
+
+def _access_denied(request, has_access, denied_message):
+    """Redirect response when the user may not see the view, None when they may"""
+    if not request.user.is_authenticated:
+        messages.error(request, 'Please login to access this page.')
+        return redirect('login')
+
+    if not has_access(request.user):
+        messages.error(request, denied_message)
+        return redirect('dashboard')
+
+    return None
+
+
+def _restrict(view_func, has_access, denied_message):
+    # Works for sync and async views, async ones load the user without blocking
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            request.user = await request.auser()
+            denied = _access_denied(request, has_access, denied_message)
+            if denied is not None:
+                return denied
+            return await view_func(request, *args, **kwargs)
+        return async_wrapper
 
-def admin_required(view_func):
-    """Decorator to restrict access to admin users only"""
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        if not request.user.is_authenticated:
-            messages.error(request, 'Please login to access this page.')
-            return redirect('login')
-        
-        if not request.user.is_admin:
-            messages.error(request, 'Admin access required.')
-            return redirect('dashboard')
-        
+        denied = _access_denied(request, has_access, denied_message)
+        if denied is not None:
+            return denied
         return view_func(request, *args, **kwargs)
     return wrapper
 
 
-def doctor_required(view_func):
-    """Decorator to restrict access to doctor users only"""
+def resolve_user(view_func):
+    """Load request.user through the async auth API before an async view runs, so templates can read it"""
     @wraps(view_func)
-    def wrapper(request, *args, **kwargs):
-        if not request.user.is_authenticated:
-            messages.error(request, 'Please login to access this page.')
-            return redirect('login')
-        
-        # Allow superusers or users with doctor role
-        if not (request.user.is_doctor or request.user.is_superuser):
-            messages.error(request, 'Doctor access required.')
-            return redirect('dashboard')
-        
-        return view_func(request, *args, **kwargs)
+    async def wrapper(request, *args, **kwargs):
+        request.user = await request.auser()
+        return await view_func(request, *args, **kwargs)
     return wrapper
 
 
+def admin_required(view_func):
+    """Decorator to restrict access to admin users only"""
+    return _restrict(view_func, lambda user: user.is_admin, 'Admin access required.')
+
+
+def doctor_required(view_func):
+    """Decorator to restrict access to doctor users only"""
+    # Allow superusers or users with doctor role
+    return _restrict(view_func, lambda user: user.is_doctor or user.is_superuser, 'Doctor access required.')
+
+
 def client_required(view_func):
     """Decorator to restrict access to client users only"""
-    @wraps(view_func)
-    def wrapper(request, *args, **kwargs):
-        if not request.user.is_authenticated:
-            messages.error(request, 'Please login to access this page.')
-            return redirect('login')
-        
-        # Allow superusers or users with client role
-        if not (request.user.is_client or request.user.is_superuser):
-            messages.error(request, 'Client access required.')
-            return redirect('dashboard')
-        
-        return view_func(request, *args, **kwargs)
-    return wrapper
+    # Allow superusers or users with client role
+    return _restrict(view_func, lambda user: user.is_client or user.is_superuser, 'Client access required.')
@@ -0,0 +1,255 @@
+"""
+Live event stream.
+
+Services publish small JSON events to per-user channels and the SSE
+endpoint (views.notification_stream) relays them to the browser. Each
+open stream is one coroutine and one bounded asyncio queue, no thread, so
+a single ASGI worker holds thousands of idle connections.
+
+The in-process broker only reaches streams of the publishing process.
+PostgresBroker sends events through LISTEN/NOTIFY instead so every
+worker receives them. Select it with the EVENT_BROKER setting.
+
+Notification events carry the notification id as SSE event id. A client
+reconnecting with Last-Event-ID first gets what it missed from the
+database. A client too slow to drain its queue is disconnected and
+catches up the same way, so memory per stream stays bounded.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 100
+HEARTBEAT_SECONDS = 15
+RETRY_MILLISECONDS = 3000
+CATCH_UP_LIMIT = 100
+
+
+@dataclass
+class Event:
+    type: str
+    data: dict = field(default_factory=dict)
+    id: int = None
+
+    def encode(self):
+        """The event in text/event-stream framing"""
+        lines = [] if self.id is None else [f'id: {self.id}']
+        lines.append(f'event: {self.type}')
+        lines.append(f'data: {json.dumps(self.data, cls=DjangoJSONEncoder, separators=(",", ":"))}')
+        return '\n'.join(lines) + '\n\n'
+
+    def as_dict(self):
+        return {'type': self.type, 'data': self.data, 'id': self.id}
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def notification_event(notification):
+    return Event('notification', {
+        'title': notification.title,
+        'message': notification.message,
+        'notification_type': notification.notification_type,
+        'created_at': notification.created_at,
+    }, id=notification.pk)
+
+
+# --- Brokers ---
+
+class Subscription:
+    """One stream's queue, fed from any thread through the stream's event loop"""
+
+    def __init__(self, maxsize=QUEUE_SIZE):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def _put(self, event):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class InProcessBroker:
+    """Fan events out to the subscriptions of this process"""
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel, maxsize=QUEUE_SIZE):
+        """Open a subscription, must be called from the event loop that will read it"""
+        subscription = Subscription(maxsize)
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, channel, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[channel]
+
+    def publish(self, channel, event):
+        """Deliver an event, safe to call from any thread"""
+        self._deliver(channel, event)
+
+    def _deliver(self, channel, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._put, event)
+            except RuntimeError:
+                # The stream's loop is already closed, unsubscribe is on its way
+                pass
+
+
+class PostgresBroker(InProcessBroker):
+    """
+    Relay events between processes with LISTEN/NOTIFY.
+
+    Publishing is a pg_notify() on the current connection, so an event
+    published inside a transaction is only delivered if it commits. Each
+    process runs one listener thread on its own connection and hands what
+    it hears to the in-process fan-out.
+    """
+
+    NOTIFY_CHANNEL = 'medica_events'
+    POLL_SECONDS = 5
+    RECONNECT_SECONDS = 1
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    def subscribe(self, channel, maxsize=QUEUE_SIZE):
+        self._ensure_listener()
+        return super().subscribe(channel, maxsize)
+
+    def publish(self, channel, event):
+        payload = json.dumps({'channel': channel, 'event': event.as_dict()}, cls=DjangoJSONEncoder)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.NOTIFY_CHANNEL, payload])
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='event-listener', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        # The thread has its own Django connection, used only for LISTEN
+        while True:
+            try:
+                connection.ensure_connection()
+                with connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.NOTIFY_CHANNEL}')
+                for payload in self._notifications(connection.connection):
+                    message = json.loads(payload)
+                    self._deliver(message['channel'], Event(**message['event']))
+            except Exception:
+                logger.exception("Event listener lost its connection, reconnecting")
+                connection.close()
+                time.sleep(self.RECONNECT_SECONDS)
+
+    def _notifications(self, raw):
+        if hasattr(raw, 'poll'):
+            # psycopg2
+            while True:
+                if select.select([raw], [], [], self.POLL_SECONDS)[0]:
+                    raw.poll()
+                    while raw.notifies:
+                        yield raw.notifies.pop(0).payload
+        else:
+            # psycopg 3
+            while True:
+                for notify in raw.notifies(timeout=self.POLL_SECONDS):
+                    yield notify.payload
+
+
+EVENT_BROKERS = {
+    'memory': InProcessBroker,
+    'postgres': PostgresBroker,
+}
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """The process wide broker chosen by settings.EVENT_BROKER"""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = EVENT_BROKERS[getattr(settings, 'EVENT_BROKER', 'memory')]()
+        return _broker
+
+
+def publish_on_commit(user_id, event):
+    """Publish to a user's channel once the current transaction commits"""
+    transaction.on_commit(lambda: get_broker().publish(user_channel(user_id), event))
+
+
+# --- Stream ---
+
+async def stream(user_id, last_event_id=None, heartbeat=HEARTBEAT_SECONDS):
+    """
+    Yield the text/event-stream chunks of one user's stream.
+
+    Ends when the subscription overflows or after a full catch-up page, the
+    browser then reconnects with Last-Event-ID and resumes from there.
+    """
+    broker = get_broker()
+    channel = user_channel(user_id)
+    # Subscribe before reading the backlog so nothing published meanwhile is lost
+    subscription = broker.subscribe(channel)
+    try:
+        yield f'retry: {RETRY_MILLISECONDS}\n\n'
+        if last_event_id is not None:
+            missed = 0
+            backlog = Notification.objects.filter(user_id=user_id, pk__gt=last_event_id).order_by('pk')
+            async for notification in backlog[:CATCH_UP_LIMIT]:
+                missed += 1
+                last_event_id = notification.pk
+                yield notification_event(notification).encode()
+            if missed == CATCH_UP_LIMIT:
+                return
+
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), heartbeat)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing the idle connection
+                yield ': heartbeat\n\n'
+                continue
+            if subscription.overflowed:
+                return
+            if event.id is not None and last_event_id is not None and event.id <= last_event_id:
+                # Already sent from the backlog
+                continue
+            yield event.encode()
+    finally:
+        broker.unsubscribe(channel, subscription)
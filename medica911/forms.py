@@ -1,6 +1,12 @@
+from datetime import datetime
+
 from django import forms
+from django.db.models import Q
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from .models import User, Doctor, Appointment, Review, Speciality, DoctorAvailability
+from . import availability, geo
+from .booking import nearest_free_slots
+from .search import get_search_backend
 
 
 class CustomUserCreationForm(UserCreationForm):
@@ -149,19 +155,30 @@ class AppointmentForm(forms.ModelForm):
             }),
         }
     
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, doctor=None, **kwargs):
         super().__init__(*args, **kwargs)
-        # Generate time slots
-        time_choices = []
-        for hour in range(8, 18):  # 8 AM to 6 PM
-            for minute in ['00', '30']:
-                time_str = f"{hour:02d}:{minute}"
-                time_choices.append((time_str, f"{hour:02d}:{minute}"))
-        self.fields['appointment_time'] = forms.ChoiceField(
-            choices=time_choices,
+        self.doctor = doctor
+        self.alternatives = []
+        # Slots come from the doctor's weekly schedule, the chosen date is checked in clean()
+        slots = availability.slot_choices(doctor.pk) if doctor else availability.bitmap_times(
+            availability.window_bitmap(*availability.DEFAULT_WINDOW)
+        )
+        self.fields['appointment_time'] = forms.TypedChoiceField(
+            choices=[(slot.strftime('%H:%M'), slot.strftime('%H:%M')) for slot in slots],
+            coerce=lambda value: datetime.strptime(value, '%H:%M').time(),
             widget=forms.Select(attrs={'class': 'form-select'})
         )
 
+    def clean(self):
+        cleaned_data = super().clean()
+        appointment_date = cleaned_data.get('appointment_date')
+        appointment_time = cleaned_data.get('appointment_time')
+        if self.doctor and appointment_date and appointment_time:
+            if not availability.is_slot_free(self.doctor.pk, appointment_date, appointment_time):
+                self.add_error('appointment_time', "This time slot is not available, please pick another one.")
+                self.alternatives = nearest_free_slots(self.doctor.pk, appointment_date, appointment_time)
+        return cleaned_data
+
 
 class AppointmentUpdateForm(forms.ModelForm):
     """Form for updating appointment status"""
@@ -176,6 +193,23 @@ class AppointmentUpdateForm(forms.ModelForm):
             'prescription': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
         }
 
+    def clean_status(self):
+        """
+        A cancelled appointment frees its slot for other bookings, it can
+        only become active again while the slot is still free
+        """
+        status = self.cleaned_data.get('status')
+        appointment = self.instance
+        if appointment.status == 'cancelled' and status != 'cancelled':
+            taken = Appointment.objects.filter(
+                doctor_id=appointment.doctor_id,
+                appointment_date=appointment.appointment_date,
+                appointment_time=appointment.appointment_time,
+            ).exclude(status='cancelled').exclude(pk=appointment.pk).exists()
+            if taken:
+                raise forms.ValidationError("This time slot has been booked again since the cancellation.")
+        return status
+
 
 class ReviewForm(forms.ModelForm):
     """Form for submitting reviews"""
@@ -227,9 +261,75 @@ class DoctorSearchForm(forms.Form):
         required=False,
         widget=forms.TextInput(attrs={
             'class': 'form-control',
-            'placeholder': 'Doctor Name'
+            'placeholder': 'Doctor, clinic or speciality'
+        })
+    )
+    near = forms.CharField(
+        required=False,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Near (city)'
         })
     )
+    radius = forms.TypedChoiceField(
+        choices=[(km, f'Within {km} km') for km in geo.RADIUS_CHOICES],
+        coerce=int,
+        empty_value=geo.DEFAULT_RADIUS_KM,
+        initial=geo.DEFAULT_RADIUS_KM,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+
+    def clean_near(self):
+        near = self.cleaned_data.get('near', '').strip()
+        if near and geo.geocode(near) is None:
+            raise forms.ValidationError("Unknown city, try the nearest larger town.")
+        return near
+
+    @property
+    def origin(self):
+        """(latitude, longitude) of the `near` city, None without one"""
+        return geo.geocode(self.cleaned_data.get('near'))
+
+    @property
+    def search_query(self):
+        """Free text of the name box, ranked by the search backend"""
+        return (self.cleaned_data.get('name') or '').strip()
+
+    async def ais_valid(self):
+        """
+        is_valid() for async views. The speciality options are loaded once
+        through the async ORM and the field validates against them, so
+        neither cleaning nor rendering the form queries synchronously.
+        """
+        field = self.fields['speciality']
+        specialities = {str(speciality.pk): speciality async for speciality in field.queryset}
+        self.fields['speciality'] = forms.TypedChoiceField(
+            choices=[('', field.empty_label)] + [
+                (pk, field.label_from_instance(speciality)) for pk, speciality in specialities.items()
+            ],
+            coerce=specialities.get,
+            empty_value=None,
+            required=False,
+            widget=field.widget,
+        )
+        return self.is_valid()
+
+    def search(self, doctors):
+        """
+        Apply the filters to a Doctor queryset, annotating `search_rank` when
+        there is text and `distance` (km) when searching near a city
+        """
+        if self.cleaned_data.get('speciality'):
+            doctors = doctors.filter(speciality=self.cleaned_data['speciality'])
+        if self.cleaned_data.get('city'):
+            # A filter, not more search text: 'Tunis' must not match a doctor in Sfax with a Tunis clinic address
+            doctors = doctors.filter(user__city__icontains=self.cleaned_data['city'].strip())
+        if self.search_query:
+            doctors = get_search_backend().search(doctors, self.search_query)
+        if self.origin:
+            doctors = geo.nearby(doctors, *self.origin, self.cleaned_data['radius'])
+        return doctors
 
 
 class AppointmentFilterForm(forms.Form):
@@ -256,3 +356,135 @@ class AppointmentFilterForm(forms.Form):
         empty_label="All Specialities",
         widget=forms.Select(attrs={'class': 'form-select'})
     )
+
+    def filter(self, appointments):
+        """Apply the filters to an Appointment queryset"""
+        if self.cleaned_data.get('status'):
+            appointments = appointments.filter(status=self.cleaned_data['status'])
+        if self.cleaned_data.get('date_from'):
+            appointments = appointments.filter(appointment_date__gte=self.cleaned_data['date_from'])
+        if self.cleaned_data.get('date_to'):
+            appointments = appointments.filter(appointment_date__lte=self.cleaned_data['date_to'])
+        if self.cleaned_data.get('speciality'):
+            appointments = appointments.filter(doctor__speciality=self.cleaned_data['speciality'])
+        return appointments
+
+
+class UserFilterForm(forms.Form):
+    """Form for filtering and sorting the admin user tables"""
+
+    # Keyset orderings, each ends on 'id' and every field is NOT NULL
+    SORTS = {
+        'newest': ("Newest first", ['-date_joined', '-id']),
+        'oldest': ("Oldest first", ['date_joined', 'id']),
+        'name': ("Name", ['last_name', 'first_name', 'id']),
+        'email': ("Email", ['email', 'id']),
+    }
+    DEFAULT_SORT = 'newest'
+
+    q = forms.CharField(
+        required=False,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Name, username or email'
+        })
+    )
+    city = forms.CharField(
+        required=False,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'City'
+        })
+    )
+    status = forms.ChoiceField(
+        choices=[('', 'Any Status'), ('active', 'Active'), ('inactive', 'Inactive')],
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    sort = forms.ChoiceField(
+        choices=[(key, label) for key, (label, _) in SORTS.items()],
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+
+    @property
+    def ordering(self):
+        sort = self.cleaned_data.get('sort') if self.is_valid() else None
+        return self.SORTS[sort or self.DEFAULT_SORT][1]
+
+    def filter(self, users):
+        """Apply the filters to a User queryset"""
+        if not self.is_valid():
+            return users
+        query = self.cleaned_data.get('q', '').strip()
+        if query:
+            users = users.filter(
+                Q(username__icontains=query) | Q(email__icontains=query)
+                | Q(first_name__icontains=query) | Q(last_name__icontains=query)
+            )
+        if self.cleaned_data.get('city'):
+            users = users.filter(city__iexact=self.cleaned_data['city'].strip())
+        if self.cleaned_data.get('status'):
+            users = users.filter(is_active=self.cleaned_data['status'] == 'active')
+        return users
+
+
+class DoctorImportRowForm(forms.Form):
+    """One row of the doctor onboarding CSV (see onboarding.py)"""
+
+    DAYS = {'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6}
+
+    email = forms.EmailField()
+    username = forms.CharField(max_length=150, required=False, validators=[User.username_validator])
+    first_name = forms.CharField(max_length=150)
+    last_name = forms.CharField(max_length=150)
+    phone = forms.CharField(max_length=20, required=False)
+    city = forms.CharField(max_length=100, required=False)
+    license_number = forms.CharField(max_length=50)
+    speciality = forms.CharField(max_length=100, required=False)
+    experience_years = forms.IntegerField(min_value=0, required=False)
+    consultation_fee = forms.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    clinic_name = forms.CharField(max_length=200, required=False)
+    clinic_address = forms.CharField(required=False)
+    bio = forms.CharField(required=False)
+    education = forms.CharField(required=False)
+    is_available = forms.NullBooleanField(required=False)
+    # "mon 08:00-16:00; tue 08:00-12:00; tue 14:00-18:00", empty leaves the schedule alone
+    availability = forms.CharField(required=False)
+
+    def clean_email(self):
+        return self.cleaned_data['email'].lower()
+
+    def clean_username(self):
+        return self.cleaned_data['username'] or self.cleaned_data.get('email', '').lower()
+
+    def clean_availability(self):
+        value = self.cleaned_data['availability'].strip()
+        if not value:
+            return None
+        windows = []
+        for part in filter(None, (part.strip() for part in value.split(';'))):
+            try:
+                day, hours = part.split()
+                start, end = (datetime.strptime(bound, '%H:%M').time() for bound in hours.split('-'))
+            except ValueError:
+                raise forms.ValidationError(f"'{part}' is not like 'mon 08:00-16:00'.")
+            if day[:3].lower() not in self.DAYS:
+                raise forms.ValidationError(f"Unknown day '{day}'.")
+            if start >= end:
+                raise forms.ValidationError(f"'{part}' ends before it starts.")
+            windows.append((self.DAYS[day[:3].lower()], start, end))
+        if len({(day, start) for day, start, _ in windows}) != len(windows):
+            raise forms.ValidationError("Two windows start at the same time on the same day.")
+        return windows
+
+
+class DoctorImportForm(forms.Form):
+    """Upload of a doctor onboarding CSV"""
+
+    file = forms.FileField(widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv'}))
+    dry_run = forms.BooleanField(
+        required=False,
+        label="Only validate, write nothing",
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
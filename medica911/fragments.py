@@ -0,0 +1,113 @@
+"""
+Versioned template fragment caching.
+
+Each named fragment has a version stored in the cache and its rendered
+copy is cached under a key made of its name and version. Bumping the
+version (from signals.py) makes every cached copy of that fragment
+unreachable, so a view that only renders cached fragments runs no
+database queries. afragments() fetches the copies once and renders the
+missing ones from rows the view loads for them, so a copy expiring
+during the request cannot leave the page template querying the database.
+
+Doctor cards in listings are cached one by one instead, under a key made
+of the values the card shows that change without a save of the doctor
+(ratings) plus Doctor.updated_at and User.updated_at. Editing a doctor
+therefore only misses that doctor's card, and a listing page fetches all
+of its cards with one get_many().
+"""
+import time
+
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+HOME_SPECIALITIES = 'home_specialities'
+HOME_TOP_DOCTORS = 'home_top_doctors'
+HOME_TEMPLATES = {
+    HOME_SPECIALITIES: 'medica911/home_specialities.html',
+    HOME_TOP_DOCTORS: 'medica911/home_top_doctors.html',
+}
+
+DOCTOR_CARD = 'doctor_card'
+DOCTOR_CARD_TEMPLATE = 'medica911/client/doctor_card.html'
+
+
+def _version_key(name):
+    return f'fragment:{name}:version'
+
+
+def fragment_versions(*names):
+    """Current version of each fragment, creating missing ones"""
+    keys = {name: _version_key(name) for name in names}
+    stored = cache.get_many(keys.values())
+    versions = {}
+    for name, key in keys.items():
+        if key not in stored:
+            cache.add(key, time.time_ns(), None)
+            stored[key] = cache.get(key)
+        versions[name] = stored[key]
+    return versions
+
+
+async def afragment_versions(*names):
+    """fragment_versions() for async views"""
+    keys = {name: _version_key(name) for name in names}
+    stored = await cache.aget_many(keys.values())
+    versions = {}
+    for name, key in keys.items():
+        if key not in stored:
+            await cache.aadd(key, time.time_ns(), None)
+            stored[key] = await cache.aget(key)
+        versions[name] = stored[key]
+    return versions
+
+
+async def afragments(templates, loaders):
+    """
+    Rendered HTML of each named fragment, from the cache or rendered (and
+    cached) for the missing ones. templates maps each name to its template,
+    loaders each name to an async function returning its template context.
+    """
+    versions = await afragment_versions(*templates)
+    keys = {name: make_template_fragment_key(name, [version]) for name, version in versions.items()}
+    html = await cache.aget_many(keys.values())
+    rendered = {
+        key: render_to_string(templates[name], await loaders[name]())
+        for name, key in keys.items() if key not in html
+    }
+    if rendered:
+        await cache.aset_many(rendered, FRAGMENT_TIMEOUT)
+        html.update(rendered)
+    return {name: mark_safe(html[key]) for name, key in keys.items()}
+
+
+def invalidate_fragments(*names):
+    cache.set_many({_version_key(name): time.time_ns() for name in names}, None)
+
+
+def doctor_card_key(doctor):
+    """Cache key of a doctor's listing card, the doctor comes with its user and speciality"""
+    return make_template_fragment_key(DOCTOR_CARD, [
+        doctor.pk, doctor.updated_at.isoformat(), doctor.user.updated_at.isoformat(),
+        # Kept up to date with F() updates, which leave updated_at alone
+        doctor.rating, doctor.total_reviews,
+        # A renamed speciality does not touch its doctors
+        doctor.speciality.name if doctor.speciality_id else None,
+    ])
+
+
+async def adoctor_cards(doctors):
+    """Rendered card of each doctor, from the cache or rendered (and cached) for the missing ones"""
+    keys = [doctor_card_key(doctor) for doctor in doctors]
+    cards = await cache.aget_many(keys)
+    rendered = {
+        key: render_to_string(DOCTOR_CARD_TEMPLATE, {'doctor': doctor})
+        for key, doctor in zip(keys, doctors) if key not in cards
+    }
+    if rendered:
+        await cache.aset_many(rendered, FRAGMENT_TIMEOUT)
+        cards.update(rendered)
+    return [mark_safe(cards[key]) for key in keys]
@@ -0,0 +1,165 @@
+"""
+Doctor locations and nearest-doctor search.
+
+Clinics are geocoded offline against the bundled table of Tunisian cities
+(data/cities.csv): the clinic address is searched for a known city name or
+alias, then the doctor's city is, and the doctor gets that city's
+coordinates. Saving a doctor never waits on a network geocoder, at the cost
+of city-level precision.
+
+Located doctors also store `geo_cell`, the number of their cell in a grid of
+CELL_DEGREES x CELL_DEGREES cells. It is a plain indexed integer, so the
+same spatial index works on SQLite and Postgres. nearby() prunes a radius
+search in three steps of increasing cost:
+
+1. geo_cell IN (the cells the bounding box of the circle overlaps), an
+   index lookup;
+2. latitude and longitude within that bounding box;
+3. the exact great-circle (haversine) distance, computed in SQL for the
+   rows left, which also orders the results.
+"""
+import csv
+import math
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+
+from django.db.models import FloatField, Value
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+
+from .models import Doctor
+
+CITIES_FILE = Path(__file__).resolve().parent / 'data' / 'cities.csv'
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+CELL_DEGREES = 0.2
+CELLS_PER_ROW = round(360 / CELL_DEGREES)
+# Past this many cells the IN list costs more than it prunes, the bounding box filter is used alone
+MAX_CELLS = 400
+RADIUS_CHOICES = [5, 10, 25, 50, 100]
+DEFAULT_RADIUS_KM = 25
+LOCATION_FIELDS = ['latitude', 'longitude', 'geo_cell']
+
+
+def normalize(text):
+    """Lowercase, without accents, punctuation or repeated spaces: 'Gabès,' -> 'gabes'"""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char if char.isalnum() else ' ' for char in text if not unicodedata.combining(char))
+    return ' '.join(text.lower().split())
+
+
+@lru_cache(maxsize=None)
+def cities():
+    """{normalized city name or alias: (city name, latitude, longitude)}"""
+    table = {}
+    with open(CITIES_FILE, newline='', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            city = (row['name'], float(row['latitude']), float(row['longitude']))
+            for name in [row['name'], *row['aliases'].split('|')]:
+                if name.strip():
+                    table[normalize(name)] = city
+    return table
+
+
+def find_city(*texts):
+    """
+    (city name, latitude, longitude) of the first text that names a known
+    city, None when none does. Addresses usually end with the city, so when
+    an address names several ('12 rue de Tunis, Sfax') the last one wins.
+    """
+    table = cities()
+    for text in texts:
+        if not text:
+            continue
+        padded = f' {normalize(text)} '
+        found = None
+        for name, city in table.items():
+            position = padded.rfind(f' {name} ')
+            if position >= 0 and (found is None or position > found[0]):
+                found = (position, city)
+        if found:
+            return found[1]
+    return None
+
+
+def geocode(*texts):
+    """(latitude, longitude) of the first text that names a known city, None when none does"""
+    city = find_city(*texts)
+    return city[1:] if city else None
+
+
+def cell_of(latitude, longitude):
+    row = math.floor((latitude + 90) / CELL_DEGREES)
+    column = math.floor((longitude + 180) / CELL_DEGREES)
+    return row * CELLS_PER_ROW + column
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """(min latitude, max latitude, min longitude, max longitude) around a circle"""
+    delta_latitude = radius_km / KM_PER_DEGREE
+    # A degree of longitude shrinks away from the equator, take it at the box edge farthest from it
+    widest = min(abs(latitude) + delta_latitude, 89.9)
+    delta_longitude = radius_km / (KM_PER_DEGREE * math.cos(math.radians(widest)))
+    return (
+        latitude - delta_latitude, latitude + delta_latitude,
+        longitude - delta_longitude, longitude + delta_longitude,
+    )
+
+
+def cells_in(box):
+    """Grid cells overlapping a bounding box, None when there are more than MAX_CELLS"""
+    min_latitude, max_latitude, min_longitude, max_longitude = box
+    first, last = cell_of(min_latitude, min_longitude), cell_of(max_latitude, max_longitude)
+    rows = range(first // CELLS_PER_ROW, last // CELLS_PER_ROW + 1)
+    columns = range(first % CELLS_PER_ROW, last % CELLS_PER_ROW + 1)
+    if len(rows) * len(columns) > MAX_CELLS:
+        return None
+    return [row * CELLS_PER_ROW + column for row in rows for column in columns]
+
+
+def distance_km(latitude, longitude):
+    """Expression for the haversine distance in km between a point and each doctor"""
+    def constant(value):
+        return Value(value, output_field=FloatField())
+
+    doctor_latitude = Radians('latitude')
+    half_latitude = (doctor_latitude - constant(math.radians(latitude))) / 2
+    half_longitude = (Radians('longitude') - constant(math.radians(longitude))) / 2
+    a = Power(Sin(half_latitude), 2) + (
+        Cos(doctor_latitude) * constant(math.cos(math.radians(latitude))) * Power(Sin(half_longitude), 2)
+    )
+    # Rounding can push sqrt(a) just above 1 for antipodal points, out of asin's domain
+    return constant(2 * EARTH_RADIUS_KM) * ASin(Least(Sqrt(a), constant(1.0)))
+
+
+def nearby(doctors, latitude, longitude, radius_km):
+    """Doctors within radius_km of a point, annotated with their `distance` in km"""
+    box = bounding_box(latitude, longitude, radius_km)
+    cells = cells_in(box)
+    if cells is not None:
+        doctors = doctors.filter(geo_cell__in=cells)
+    return doctors.filter(
+        latitude__range=box[:2], longitude__range=box[2:],
+    ).annotate(distance=distance_km(latitude, longitude)).filter(distance__lte=radius_km)
+
+
+def set_location(doctor, clinic_address, city):
+    """Set a doctor's location fields from its clinic address or city, clearing them when neither is known"""
+    point = geocode(clinic_address, city)
+    doctor.latitude, doctor.longitude = point or (None, None)
+    doctor.geo_cell = cell_of(*point) if point else None
+
+
+def refresh_locations(doctor_ids):
+    """Geocode these doctors again, saving the ones whose location changed"""
+    moved = []
+    doctors = Doctor.objects.filter(pk__in=doctor_ids).select_related('user').only(
+        *LOCATION_FIELDS, 'clinic_address', 'user__city',
+    )
+    for doctor in doctors:
+        before = (doctor.latitude, doctor.longitude)
+        set_location(doctor, doctor.clinic_address, doctor.user.city)
+        if (doctor.latitude, doctor.longitude) != before:
+            moved.append(doctor)
+    Doctor.objects.bulk_update(moved, LOCATION_FIELDS)
+    return len(moved)
@@ -0,0 +1,176 @@
+import logging
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from medica.database import CONNECTION_MODES, connection_settings
+from medica911.benchmarks import BENCHMARK_PREFIX
+from medica911.synthetic import SyntheticDataset
+
+from .benchmark_servers import DEFAULT_PATHS
+
+# Settings owned by the connection modes, reset before each mode is applied
+MODE_KEYS = ['CONN_MAX_AGE', 'CONN_HEALTH_CHECKS', 'DISABLE_SERVER_SIDE_CURSORS']
+MODE_OPTIONS = ['pool', 'prepare_threshold']
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure per-request latency of the public read pages under each DB_CONNECTIONS mode "
+        "(medica/database.py) against the configured PostgreSQL server, on a seeded test database. "
+        "Requests go through the WSGI handler in worker threads, so connections are opened, reused "
+        "and released exactly as in a deployed worker. Point --pgbouncer at a transaction-pooling "
+        "pgbouncer in front of the same server to measure the pgbouncer mode through it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', default=DEFAULT_PATHS)
+        parser.add_argument('--mode', action='append', choices=CONNECTION_MODES, help="Only these modes (repeatable)")
+        parser.add_argument('--requests', type=int, default=300, help="Measured requests per mode")
+        parser.add_argument('--warmup', type=int, default=10, help="Unmeasured requests per thread first")
+        parser.add_argument('--threads', type=int, default=4, help="Worker threads sending requests")
+        parser.add_argument('--pgbouncer', metavar='HOST:PORT', help="pgbouncer in front of the database")
+        parser.add_argument('--doctors', type=int, default=200)
+        parser.add_argument('--clients', type=int, default=2000)
+        parser.add_argument('--keepdb', action='store_true', help="Reuse the test database and its dataset")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError(f"Connection modes only apply to PostgreSQL, the database is {connection.vendor}")
+        pgbouncer = None
+        if options['pgbouncer']:
+            host, _, port = options['pgbouncer'].rpartition(':')
+            if not host or not port.isdigit():
+                raise CommandError("--pgbouncer must be HOST:PORT")
+            pgbouncer = {'HOST': host, 'PORT': port}
+
+        request_logger = logging.getLogger('django.request')
+        request_level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        setup_test_environment()
+        original = connections.settings['default']
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            dataset = SyntheticDataset(
+                doctors=options['doctors'], clients=options['clients'], appointments=options['clients'] * 5,
+                notifications=0, prefix=BENCHMARK_PREFIX,
+            )
+            if not dataset.exists():
+                dataset.generate(log=lambda message: None)
+            with override_settings(SLOW_REQUEST_MS=None, METRICS_DIR=None):
+                self._run(options, dict(original), pgbouncer)
+        finally:
+            self._use(original)
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+            request_logger.setLevel(request_level)
+
+    def _run(self, options, base, pgbouncer):
+        for key in MODE_KEYS:
+            base.pop(key, None)
+        base['OPTIONS'] = {
+            key: value for key, value in base.get('OPTIONS', {}).items() if key not in MODE_OPTIONS
+        }
+
+        self.stdout.write(
+            f"{options['threads']} threads, {options['requests']} requests per mode, "
+            f"paths: {' '.join(options['paths'])}\n"
+        )
+        self.stdout.write(f"{'mode':<14}{'connects':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+        results = {}
+        for mode in options['mode'] or CONNECTION_MODES:
+            mode_settings = connection_settings(mode)
+            settings_dict = {
+                **base, **mode_settings, 'OPTIONS': {**base['OPTIONS'], **mode_settings.get('OPTIONS', {})},
+            }
+            if mode == 'pgbouncer' and pgbouncer:
+                settings_dict.update(pgbouncer)
+            self._use(settings_dict)
+            try:
+                latencies, connects, errors = self._measure(options)
+            except ImproperlyConfigured as exc:
+                # 'pool' without psycopg[pool] installed
+                self.stdout.write(f"{mode:<14}skipped: {str(exc).splitlines()[0]}")
+                continue
+            finally:
+                if 'pool' in settings_dict['OPTIONS']:
+                    with suppress(ImproperlyConfigured):
+                        connection.close_pool()
+            latencies.sort()
+            results[mode] = p50 = statistics.median(latencies) * 1000
+            self.stdout.write(
+                f"{mode:<14}{connects:>9}{p50:>9.2f}"
+                f"{latencies[int(len(latencies) * 0.95)] * 1000:>9.2f}"
+                f"{latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000:>9.2f}"
+                f"{errors:>8}"
+            )
+        if 'per-request' in results:
+            self.stdout.write('')
+            for mode, p50 in results.items():
+                if mode != 'per-request':
+                    self.stdout.write(f"{mode}: median {results['per-request'] - p50:+.2f} ms saved per request")
+
+    def _use(self, settings_dict):
+        """Make settings_dict the configuration of the 'default' connection of every thread started from now"""
+        connection.close()
+        connections.settings['default'] = connections.configure_settings({'default': settings_dict})['default']
+        del connections['default']
+
+    def _measure(self, options):
+        handler = WSGIHandler()
+        factory = RequestFactory()
+        paths = options['paths']
+        per_thread = -(-options['requests'] // options['threads'])
+        lock = threading.Lock()
+        connects = [0]
+        errors = [0]
+
+        def connected(sender, **kwargs):
+            with lock:
+                connects[0] += 1
+
+        def request(path):
+            environ = factory.get(path).environ
+            start = time.perf_counter()
+            response = handler(environ, lambda status, headers: None)
+            for _ in response:
+                pass
+            # Sends request_finished, which closes or releases the connection as a worker would
+            response.close()
+            return time.perf_counter() - start, response.status_code
+
+        def worker(index):
+            latencies = []
+            try:
+                for count in range(options['warmup'] + per_thread):
+                    elapsed, status = request(paths[(index + count) % len(paths)])
+                    if status >= 400:
+                        with lock:
+                            errors[0] += 1
+                    elif count >= options['warmup']:
+                        latencies.append(elapsed)
+            finally:
+                connection.close()
+            return latencies
+
+        connection_created.connect(connected)
+        try:
+            with ThreadPoolExecutor(options['threads']) as executor:
+                chunks = list(executor.map(worker, range(options['threads'])))
+        finally:
+            connection_created.disconnect(connected)
+        latencies = [elapsed for chunk in chunks for elapsed in chunk]
+        if not latencies:
+            raise CommandError("No successful request, check the paths")
+        return latencies, connects[0], errors[0]
@@ -0,0 +1,116 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from medica911 import geo
+from medica911.benchmarks import BENCHMARK_PREFIX
+from medica911.models import Doctor
+from medica911.synthetic import SyntheticDataset
+
+DEFAULT_ORIGINS = ['Tunis', 'Sfax', 'Kairouan', 'Tozeur']
+DEFAULT_RADII = [10, 50]
+
+
+def scan(doctors, latitude, longitude, radius_km):
+    """Exact distance of every located doctor, no pruning"""
+    return doctors.filter(latitude__isnull=False).annotate(
+        distance=geo.distance_km(latitude, longitude),
+    ).filter(distance__lte=radius_km)
+
+
+def bounding_box(doctors, latitude, longitude, radius_km):
+    """Exact distance of the doctors inside the bounding box"""
+    box = geo.bounding_box(latitude, longitude, radius_km)
+    return doctors.filter(latitude__range=box[:2], longitude__range=box[2:]).annotate(
+        distance=geo.distance_km(latitude, longitude),
+    ).filter(distance__lte=radius_km)
+
+
+STRATEGIES = [('scan', scan), ('bbox', bounding_box), ('grid+bbox', geo.nearby)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare nearest-doctor search strategies on a synthetic national dataset, seeded in a "
+        "test database: an exact distance over every doctor, the bounding box alone, and the grid "
+        "cells plus bounding box that browse_doctors uses (geo.nearby). The old user__city__icontains "
+        "filter is timed too, as a reference. Each strategy fetches one sorted result page, and the "
+        "pruned strategies are checked to find the same doctors as the full scan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('origins', nargs='*', default=DEFAULT_ORIGINS, help="Cities to search around")
+        parser.add_argument('--radius', type=int, action='append', help="Radius in km (repeatable)")
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--limit', type=int, default=12, help="Rows fetched per query (one result page)")
+        parser.add_argument('--doctors', type=int, default=20000)
+        parser.add_argument('--keepdb', action='store_true', help="Reuse the test database and its dataset")
+
+    def handle(self, *args, **options):
+        origins = []
+        for name in options['origins']:
+            city = geo.find_city(name)
+            if city is None:
+                raise CommandError(f"Unknown city {name!r}")
+            origins.append(city)
+
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            dataset = SyntheticDataset(
+                doctors=options['doctors'], clients=100, appointments=0, notifications=0, prefix=BENCHMARK_PREFIX,
+            )
+            if not dataset.exists():
+                dataset.generate(log=lambda message: None)
+            self._run(options, origins)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+    def _run(self, options, origins):
+        doctors = Doctor.objects.filter(is_available=True).select_related('user', 'speciality')
+        self.stdout.write(f"{doctors.count()} available doctors, {options['repeat']} runs per query\n")
+        self.stdout.write(f"{'origin':<12}{'km':>5}  {'strategy':<12}{'rows':>6}{'p50 ms':>10}{'p95 ms':>10}")
+
+        mismatches = 0
+        for name, latitude, longitude in origins:
+            rows, timings = self._time(
+                options, lambda: doctors.filter(user__city__icontains=name).order_by('-rating', 'id'),
+            )
+            self._report(name, '', 'icontains', rows, timings)
+            for radius in options['radius'] or DEFAULT_RADII:
+                expected = None
+                for label, strategy in STRATEGIES:
+                    rows, timings = self._time(
+                        options,
+                        lambda: strategy(doctors, latitude, longitude, radius).order_by('distance', 'id'),
+                    )
+                    found = [doctor.pk for doctor in rows]
+                    if expected is None:
+                        expected = found
+                    elif found != expected:
+                        mismatches += 1
+                        label += ' (differs)'
+                    self._report(name, radius, label, rows, timings)
+
+        if mismatches:
+            raise CommandError(f"{mismatches} pruned searches found other doctors than the full scan")
+
+    def _time(self, options, query):
+        timings = []
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            rows = list(query()[:options['limit']])
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        return rows, timings
+
+    def _report(self, origin, radius, label, rows, timings):
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f"{origin:<12}{radius:>5}  {label:<12}{len(rows):>6}{statistics.median(timings):>10.2f}{p95:>10.2f}"
+        )
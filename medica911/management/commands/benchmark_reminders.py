@@ -0,0 +1,88 @@
+import asyncio
+import math
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from medica911.availability import SLOT_MINUTES, SLOTS_PER_DAY
+from medica911.models import Appointment, Doctor, Notification, User
+from medica911.reminders import BATCH_SIZE, CONCURRENCY, run_reminders
+from medica911.stats import rebuild_stats
+
+BENCHMARK_PREFIX = 'benchmark-reminders'
+SEED_BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = "Seed a day of open appointments and measure how fast the reminder scheduler works through them"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--appointments', type=int, default=200000)
+        parser.add_argument('--clients', type=int, default=20000)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--concurrency', type=int, default=CONCURRENCY)
+        parser.add_argument('--keep', action='store_true', help="Keep the generated users and appointments")
+
+    def handle(self, *args, **options):
+        now = timezone.localtime().replace(tzinfo=None, second=0, microsecond=0)
+        started = time.perf_counter()
+        self._seed(now, options['appointments'], options['clients'])
+        self.stdout.write(f"seeded {options['appointments']} appointments in {time.perf_counter() - started:.1f}s")
+
+        try:
+            for label in ('first run', 'second run'):
+                started = time.perf_counter()
+                sent = asyncio.run(run_reminders(
+                    now=now, batch_size=options['batch_size'], concurrency=options['concurrency']
+                ))
+                elapsed = time.perf_counter() - started
+                total = sum(sent.values())
+                self.stdout.write(
+                    f"{label}: {total} reminders ({', '.join(f'level {level}: {count}' for level, count in sent.items())})"
+                    f" in {elapsed:.2f}s, {total / elapsed:.0f}/s"
+                )
+                if label == 'second run' and total:
+                    raise CommandError(f"{total} reminders were sent twice")
+            self.stdout.write(self.style.SUCCESS("No reminder was sent twice."))
+        finally:
+            connections.close_all()
+            if not options['keep']:
+                Notification.objects.filter(user__username__startswith=BENCHMARK_PREFIX).delete()
+                Appointment.objects.filter(client__username__startswith=BENCHMARK_PREFIX).delete()
+                User.objects.filter(username__startswith=BENCHMARK_PREFIX).delete()
+            # bulk_create skipped the counter signals
+            rebuild_stats()
+
+    def _seed(self, now, appointments, clients):
+        User.objects.filter(username__startswith=BENCHMARK_PREFIX).delete()
+        # One appointment per doctor per slot over the coming 24 hours
+        doctor_count = math.ceil(appointments / SLOTS_PER_DAY)
+        doctor_users = User.objects.bulk_create([
+            User(username=f'{BENCHMARK_PREFIX}-doctor-{index}', first_name='Bench', last_name=str(index), role='doctor')
+            for index in range(doctor_count)
+        ], batch_size=SEED_BATCH_SIZE)
+        doctors = Doctor.objects.bulk_create([
+            Doctor(user=user, license_number=f'{BENCHMARK_PREFIX}-{user.pk}') for user in doctor_users
+        ], batch_size=SEED_BATCH_SIZE)
+        client_users = User.objects.bulk_create([
+            User(username=f'{BENCHMARK_PREFIX}-client-{index}', role='client') for index in range(clients)
+        ], batch_size=SEED_BATCH_SIZE)
+
+        first_slot = now + timedelta(minutes=SLOT_MINUTES - now.minute % SLOT_MINUTES)
+        batch = []
+        for index in range(appointments):
+            start = first_slot + timedelta(minutes=SLOT_MINUTES * (index % SLOTS_PER_DAY))
+            batch.append(Appointment(
+                client=client_users[index % clients],
+                doctor=doctors[index // SLOTS_PER_DAY],
+                appointment_date=start.date(),
+                appointment_time=start.time(),
+                status='confirmed' if index % 3 else 'pending',
+            ))
+            if len(batch) == SEED_BATCH_SIZE:
+                Appointment.objects.bulk_create(batch)
+                batch = []
+        Appointment.objects.bulk_create(batch)
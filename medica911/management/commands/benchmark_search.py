@@ -0,0 +1,37 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from medica911.models import Doctor
+from medica911.search import IcontainsSearchBackend, get_search_backend
+
+DEFAULT_QUERIES = ['cardiology', 'tunis', 'ben salah', 'cardiolgy sfax', 'pediatrics clinic']
+
+
+class Command(BaseCommand):
+    help = "Compare doctor search latency of the indexed backend against the icontains path"
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*', default=DEFAULT_QUERIES)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--limit', type=int, default=12, help="Rows fetched per query (one result page)")
+
+    def handle(self, *args, **options):
+        backends = [('icontains', IcontainsSearchBackend()), ('indexed', get_search_backend())]
+        doctors = Doctor.objects.filter(is_available=True).select_related('user', 'speciality')
+        self.stdout.write(f"{doctors.count()} available doctors, {options['repeat']} runs per query\n")
+        self.stdout.write(f"{'query':<22}{'backend':<12}{'rows':>6}{'p50 ms':>10}{'p95 ms':>10}")
+
+        for query in options['queries']:
+            for label, backend in backends:
+                timings = []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    rows = list(backend.search(doctors, query).order_by('-search_rank', 'id')[:options['limit']])
+                    timings.append((time.perf_counter() - start) * 1000)
+                timings.sort()
+                p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                self.stdout.write(
+                    f"{query:<22}{label:<12}{len(rows):>6}{statistics.median(timings):>10.2f}{p95:>10.2f}"
+                )
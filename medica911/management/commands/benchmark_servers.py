@@ -0,0 +1,112 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PATHS = ['/', '/doctors/browse/', '/doctors/browse/?name=card']
+
+
+class Command(BaseCommand):
+    help = (
+        "Load the public read pages on a WSGI and an ASGI deployment and compare requests/s and latency. "
+        "Start both first, e.g. `gunicorn medica.wsgi -w 4 --threads 8 -b 127.0.0.1:8000` and "
+        "`uvicorn medica.asgi:application --workers 4 --port 8001`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', default=DEFAULT_PATHS)
+        parser.add_argument('--wsgi', default='http://127.0.0.1:8000', help="Base URL of the WSGI server")
+        parser.add_argument('--asgi', default='http://127.0.0.1:8001', help="Base URL of the ASGI server")
+        parser.add_argument('--concurrency', type=int, default=200, help="Open keep-alive connections")
+        parser.add_argument('--duration', type=float, default=20, help="Seconds of load per server")
+        parser.add_argument('--warmup', type=float, default=2, help="Seconds of unmeasured load first")
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{options['concurrency']} connections, {options['duration']:.0f}s per server, "
+            f"paths: {' '.join(options['paths'])}\n"
+        )
+        self.stdout.write(f"{'server':<8}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        results = {}
+        for label in ('wsgi', 'asgi'):
+            url = urlsplit(options[label])
+            if url.scheme != 'http' or not url.hostname:
+                raise CommandError(f"--{label} must be a plain http:// URL")
+            asyncio.run(self._load(url, options['paths'], options['concurrency'], options['warmup']))
+            latencies, errors, elapsed = asyncio.run(
+                self._load(url, options['paths'], options['concurrency'], options['duration'])
+            )
+            if not latencies:
+                raise CommandError(f"No successful request against {options[label]}")
+            latencies.sort()
+            results[label] = rps = len(latencies) / elapsed
+            self.stdout.write(
+                f"{label:<8}{len(latencies):>10}{rps:>10.0f}"
+                f"{statistics.median(latencies) * 1000:>10.1f}"
+                f"{latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000:>10.1f}"
+                f"{errors:>8}"
+            )
+        self.stdout.write(f"\nASGI / WSGI throughput: {results['asgi'] / results['wsgi']:.2f}x")
+
+    async def _load(self, url, paths, concurrency, duration):
+        latencies = []
+        errors = [0]
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*[
+            self._client(url, paths[index % len(paths):] + paths[:index % len(paths)], deadline, latencies, errors)
+            for index in range(concurrency)
+        ])
+        return latencies, errors[0], time.perf_counter() - started
+
+    async def _client(self, url, paths, deadline, latencies, errors):
+        host, port = url.hostname, url.port or 80
+        reader = writer = None
+        sent = 0
+        while time.perf_counter() < deadline:
+            path = url.path.rstrip('/') + paths[sent % len(paths)]
+            sent += 1
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(host, port)
+                start = time.perf_counter()
+                writer.write(f'GET {path} HTTP/1.1\r\nHost: {url.netloc}\r\n\r\n'.encode())
+                status, keep_alive = await self._read_response(reader)
+                if status >= 400:
+                    errors[0] += 1
+                else:
+                    latencies.append(time.perf_counter() - start)
+            except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                errors[0] += 1
+                keep_alive = False
+            if not keep_alive and writer is not None:
+                writer.close()
+                writer = None
+        if writer is not None:
+            writer.close()
+
+    async def _read_response(self, reader):
+        """Read one HTTP/1.1 response, returning its status and whether the connection stays open"""
+        status = int((await reader.readuntil(b'\r\n')).split()[1])
+        headers = {}
+        while True:
+            line = await reader.readuntil(b'\r\n')
+            if line == b'\r\n':
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip().lower()
+
+        if headers.get('transfer-encoding') == 'chunked':
+            while True:
+                size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                await reader.readexactly(size + 2)
+                if not size:
+                    break
+        elif 'content-length' in headers:
+            await reader.readexactly(int(headers['content-length']))
+        else:
+            await reader.read()
+            return status, False
+        return status, headers.get('connection') != 'close'
@@ -0,0 +1,104 @@
+import logging
+import os
+import platform
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from medica911.benchmarks import (
+    BENCHMARK_PREFIX, ROLES, SKIPPED, Actors, compare, load_baseline, run_benchmarks, save_baseline,
+)
+from medica911.synthetic import SyntheticDataset
+
+DEFAULT_BASELINE = os.path.join('benchmarks', 'views.json')
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every medica911 route as anonymous, client, doctor and admin users on a seeded test "
+        "database, then compare latency, queries and memory with a JSON baseline and fail on regressions. "
+        "Baselines are machine specific: record one with --save on the machine that runs the comparison."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline JSON file")
+        parser.add_argument('--save', action='store_true', help="Write this run as the new baseline")
+        parser.add_argument('--threshold', type=float, default=0.5, help="Allowed median latency and memory growth")
+        parser.add_argument('--requests', type=int, default=30, help="Measured requests per route and role")
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--role', action='append', choices=ROLES, help="Only these roles (repeatable)")
+        parser.add_argument('--only', action='append', help="Only routes whose name contains this (repeatable)")
+        parser.add_argument('--doctors', type=int, default=200)
+        parser.add_argument('--clients', type=int, default=5000)
+        parser.add_argument('--appointments', type=int, default=100000)
+        parser.add_argument('--notifications', type=int, default=50000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--keepdb', action='store_true', help="Reuse the test database and its dataset")
+
+    def handle(self, *args, **options):
+        if not options['save'] and not os.path.exists(options['baseline']):
+            raise CommandError(f"No baseline at {options['baseline']}, record one with --save first")
+
+        # 404/500 tracebacks of role-restricted routes would drown the report, their statuses are recorded
+        request_logger = logging.getLogger('django.request')
+        request_level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            # Keep slow-request logging and metric snapshots out of the measurements
+            with override_settings(SLOW_REQUEST_MS=None, METRICS_DIR=None):
+                results = self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+            request_logger.setLevel(request_level)
+
+        if options['save']:
+            os.makedirs(os.path.dirname(options['baseline']) or '.', exist_ok=True)
+            save_baseline(options['baseline'], results, {
+                'recorded': timezone.now().isoformat(timespec='seconds'),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'machine': platform.node(),
+                'requests': options['requests'],
+                'seed': options['seed'],
+            })
+            self.stdout.write(self.style.SUCCESS(f"Saved {len(results)} results to {options['baseline']}"))
+            return
+
+        regressions = compare(load_baseline(options['baseline']), results, options['threshold'])
+        if regressions:
+            raise CommandError(
+                f"{len(regressions)} regressions against {options['baseline']}:\n  " + '\n  '.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS(f"No regression against {options['baseline']}"))
+
+    def _run(self, options):
+        dataset = SyntheticDataset(
+            doctors=options['doctors'], clients=options['clients'], appointments=options['appointments'],
+            notifications=options['notifications'], seed=options['seed'], prefix=BENCHMARK_PREFIX,
+        )
+        if not dataset.exists():
+            started = time.perf_counter()
+            dataset.generate(log=lambda message: None)
+            self.stdout.write(f"Seeded the benchmark dataset in {time.perf_counter() - started:.1f}s")
+
+        self.stdout.write(f"Skipped: {', '.join(f'{name} ({reason})' for name, reason in SKIPPED.items())}\n")
+        self.stdout.write(f"{'route [role]':<48}{'status':>7}{'queries':>8}{'p50 ms':>9}{'p95 ms':>9}"
+                          f"{'p99 ms':>9}{'KiB':>9}")
+
+        def log(key, result):
+            self.stdout.write(
+                f"{key:<48}{result['status']:>7}{result['queries']:>8}{result['p50_ms']:>9.2f}"
+                f"{result['p95_ms']:>9.2f}{result['p99_ms']:>9.2f}{result['memory_kib']:>9.0f}"
+            )
+
+        return run_benchmarks(
+            Actors(BENCHMARK_PREFIX), roles=options['role'] or ROLES, requests=options['requests'],
+            warmup=options['warmup'], only=options['only'], log=log,
+        )
@@ -0,0 +1,57 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from medica911.synthetic import PASSWORD, SyntheticDataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with a deterministic synthetic dataset for benchmarks: doctors, clients, "
+        "appointments, reviews and notifications. The same --seed and --anchor always give the same rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=1000)
+        parser.add_argument('--clients', type=int, default=50000)
+        parser.add_argument('--appointments', type=int, default=1000000)
+        parser.add_argument('--notifications', type=int, default=500000)
+        parser.add_argument('--review-rate', type=float, default=0.4, help="Share of completed visits reviewed")
+        parser.add_argument('--history-days', type=int, default=365)
+        parser.add_argument('--future-days', type=int, default=30)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--anchor', type=date.fromisoformat, help="'Today' of the dataset (YYYY-MM-DD)")
+        parser.add_argument('--batch-size', type=int, default=10000, help="Rows per COPY or bulk_create")
+        parser.add_argument('--no-copy', action='store_true', help="Use bulk_create even on Postgres")
+        parser.add_argument('--prefix', default='synthetic', help="Username prefix of the generated users")
+
+    def handle(self, *args, **options):
+        if options['doctors'] < 1 or options['clients'] < 1:
+            raise CommandError("At least one doctor and one client are needed")
+        dataset = SyntheticDataset(
+            doctors=options['doctors'], clients=options['clients'],
+            appointments=options['appointments'], notifications=options['notifications'],
+            review_rate=options['review_rate'], history_days=options['history_days'],
+            future_days=options['future_days'], seed=options['seed'], anchor=options['anchor'],
+            batch_size=options['batch_size'], use_copy=False if options['no_copy'] else None,
+            prefix=options['prefix'],
+        )
+        if dataset.exists():
+            raise CommandError(f"Users named {options['prefix']}-* already exist, pick another --prefix")
+
+        method = 'COPY' if dataset.use_copy else 'bulk_create'
+        self.stdout.write(f"Generating with seed {options['seed']}, anchor {dataset.anchor}, using {method}")
+        started = time.perf_counter()
+        tables = dataset.generate(log=self.stdout.write)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"\n{'table':<32}{'rows':>12}{'seconds':>10}{'rows/s':>12}")
+        for table, (rows, seconds) in tables.items():
+            rate = rows / seconds if seconds else 0
+            self.stdout.write(f"{table:<32}{rows:>12}{seconds:>10.1f}{rate:>12.0f}")
+        total = sum(rows for rows, _ in tables.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"\n{total} rows in {elapsed:.1f}s ({total / elapsed:.0f} rows/s overall). "
+            f"Every user's password is '{PASSWORD}', the admin is {options['prefix']}-admin."
+        ))
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from medica911.onboarding import CHUNK_SIZE, InvalidImportFile, import_doctors
+
+ERRORS_SHOWN = 50
+
+
+class Command(BaseCommand):
+    help = (
+        "Import doctors (user, profile, speciality and weekly availability) from a CSV file. Columns: "
+        "email, first_name, last_name, license_number (required), username, phone, city, speciality, "
+        "experience_years, consultation_fee, clinic_name, clinic_address, bio, education, is_available "
+        "(true/false) and availability ('mon 08:00-16:00; tue 08:00-12:00'). Existing doctors are "
+        "updated, matched on email and license number."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Rows per transaction")
+        parser.add_argument('--dry-run', action='store_true', help="Validate and match every row, write nothing")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(report):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{report.rows} rows read, {report.imported} doctors written, {len(report.errors)} errors "
+                f"({report.rows / elapsed:.0f} rows/s)"
+            )
+
+        try:
+            # utf-8-sig drops the byte order mark spreadsheet exports start with
+            with open(options['path'], newline='', encoding='utf-8-sig') as handle:
+                report = import_doctors(handle, options['chunk_size'], options['dry_run'], progress)
+        except (OSError, InvalidImportFile) as exc:
+            raise CommandError(exc)
+
+        for line, message in report.errors[:ERRORS_SHOWN]:
+            self.stderr.write(f"line {line}: {message}")
+        if len(report.errors) > ERRORS_SHOWN:
+            self.stderr.write(f"... and {len(report.errors) - ERRORS_SHOWN} more errors")
+
+        action = "Would import" if options['dry_run'] else "Imported"
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} {report.imported} of {report.rows} rows in {time.perf_counter() - started:.1f}s: "
+            f"{report.created_doctors} new doctors, {report.updated_doctors} updated, "
+            f"{report.availabilities} availability windows, {report.created_specialities} new specialities."
+        ))
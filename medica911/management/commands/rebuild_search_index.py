@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from medica911.models import Doctor
+from medica911.search import refresh_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild doctor search documents and the search index (after bulk loads or raw SQL edits)"
+
+    def handle(self, *args, **options):
+        refresh_search_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {Doctor.objects.count()} doctors."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from medica911.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the admin dashboard counters (after bulk loads or raw SQL edits)"
+
+    def handle(self, *args, **options):
+        values = rebuild_stats()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(values)} counters."))
@@ -0,0 +1,45 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from medica911.models import Doctor, Review
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = "Recompute every doctor's rating, rating sum and review count from the reviews table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report doctors that drifted")
+
+    def handle(self, *args, **options):
+        # One grouped query for every doctor's review totals
+        totals = {
+            row['appointment__doctor']: (row['total'], row['count'])
+            for row in Review.objects.order_by().values('appointment__doctor')
+            .annotate(total=Sum('rating'), count=Count('id'))
+        }
+
+        drifted = []
+        checked = 0
+        doctors = Doctor.objects.only('id', 'rating', 'rating_sum', 'total_reviews').order_by('pk')
+        for doctor in doctors.iterator(chunk_size=BATCH_SIZE):
+            checked += 1
+            total, count = totals.get(doctor.pk, (0, 0))
+            rating = (Decimal(total) / count).quantize(Decimal('0.01'), ROUND_HALF_UP) if count else Decimal('0.00')
+            if (doctor.rating_sum, doctor.total_reviews, doctor.rating) != (total, count, rating):
+                doctor.rating_sum, doctor.total_reviews, doctor.rating = total, count, rating
+                drifted.append(doctor)
+
+        if not options['dry_run']:
+            for start in range(0, len(drifted), BATCH_SIZE):
+                with transaction.atomic():
+                    Doctor.objects.bulk_update(
+                        drifted[start:start + BATCH_SIZE], ['rating', 'rating_sum', 'total_reviews']
+                    )
+
+        action = "Would repair" if options['dry_run'] else "Repaired"
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} doctors. {action} {len(drifted)}."))
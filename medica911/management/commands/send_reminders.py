@@ -0,0 +1,43 @@
+import asyncio
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from medica911.reminders import BATCH_SIZE, CONCURRENCY, run_reminders
+
+
+class Command(BaseCommand):
+    help = "Send day-before and hour-before appointment reminders, once or in a loop until SIGINT/SIGTERM"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=60, help="Seconds between two scans")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help="Batches written in parallel")
+        parser.add_argument('--once', action='store_true', help="Run a single scan and exit")
+
+    def handle(self, *args, **options):
+        try:
+            asyncio.run(self._main(options))
+        finally:
+            connections.close_all()
+
+    async def _main(self, options):
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+
+        while not stop.is_set():
+            sent = await run_reminders(
+                batch_size=options['batch_size'], concurrency=options['concurrency'], stop=stop
+            )
+            if any(sent.values()):
+                self.stdout.write(", ".join(f"level {level}: {count} sent" for level, count in sent.items()))
+            if options['once']:
+                break
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=options['interval'])
+            except asyncio.TimeoutError:
+                pass
+        self.stdout.write("Reminder scheduler stopped.")
@@ -0,0 +1,102 @@
+import statistics
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from medica911.availability import DEFAULT_WINDOW, bitmap_times, window_bitmap
+from medica911.booking import SlotUnavailable, book_slot
+from medica911.models import Doctor, User
+
+STRESS_PREFIX = 'stress-booking'
+
+
+class Command(BaseCommand):
+    help = "Hammer single slots from many threads through book_slot and report throughput and conflict rate"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=32)
+        parser.add_argument('--rounds', type=int, default=20, help="Slots fought over, one after the other")
+        parser.add_argument('--keep', action='store_true', help="Keep the generated doctor and clients")
+
+    def handle(self, *args, **options):
+        threads, rounds = options['threads'], options['rounds']
+        doctor, clients = self._setup(threads)
+        slots = self._slots(rounds)
+
+        results = []
+        results_lock = threading.Lock()
+        barrier = threading.Barrier(threads)
+
+        def worker(client):
+            try:
+                for day, slot in slots:
+                    barrier.wait()
+                    start = time.perf_counter()
+                    try:
+                        book_slot(client, doctor, day, slot, reason='stress test')
+                        won = True
+                    except SlotUnavailable:
+                        won = False
+                    elapsed = time.perf_counter() - start
+                    with results_lock:
+                        results.append(((day, slot), won, elapsed))
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(client,)) for client in clients]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        wall = time.perf_counter() - started
+
+        try:
+            self._report(results, wall, threads, rounds)
+        finally:
+            if not options['keep']:
+                User.objects.filter(username__startswith=STRESS_PREFIX).delete()
+
+    def _setup(self, threads):
+        User.objects.filter(username__startswith=STRESS_PREFIX).delete()
+        doctor_user = User.objects.create_user(f'{STRESS_PREFIX}-doctor', role='doctor')
+        doctor = Doctor.objects.create(user=doctor_user, license_number=f'{STRESS_PREFIX}-{doctor_user.pk}')
+        clients = User.objects.bulk_create([
+            User(username=f'{STRESS_PREFIX}-client-{index}', role='client') for index in range(threads)
+        ])
+        return doctor, clients
+
+    def _slots(self, rounds):
+        # Far enough ahead that no real booking is involved
+        day = timezone.localdate() + timedelta(days=365)
+        day_slots = bitmap_times(window_bitmap(*DEFAULT_WINDOW))
+        slots = []
+        while len(slots) < rounds:
+            slots.extend((day, slot) for slot in day_slots)
+            day += timedelta(days=1)
+        return slots[:rounds]
+
+    def _report(self, results, wall, threads, rounds):
+        winners = {}
+        for slot, won, _ in results:
+            winners[slot] = winners.get(slot, 0) + int(won)
+        latencies = sorted(elapsed * 1000 for _, _, elapsed in results)
+        conflicts = sum(1 for _, won, _ in results if not won)
+
+        self.stdout.write(f"threads: {threads}, slots: {rounds}, attempts: {len(results)}")
+        self.stdout.write(f"throughput: {len(results) / wall:.1f} attempts/s over {wall:.2f}s")
+        self.stdout.write(f"conflict rate: {conflicts / len(results):.1%}")
+        self.stdout.write(
+            f"latency ms p50: {statistics.median(latencies):.2f}"
+            f"  p99: {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]:.2f}"
+            f"  max: {latencies[-1]:.2f}"
+        )
+
+        double_booked = [slot for slot, count in winners.items() if count != 1]
+        if double_booked:
+            raise CommandError(f"{len(double_booked)} slots did not end with exactly one booking: {double_booked[:5]}")
+        self.stdout.write(self.style.SUCCESS("Every slot was booked exactly once."))
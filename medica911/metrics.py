@@ -0,0 +1,264 @@
+"""
+Per-view performance metrics.
+
+PerformanceMiddleware (middleware.py) measures every request and feeds
+the histograms below, labelled by resolved URL name. Observing is a few
+list increments under one lock per request.
+
+Each process keeps its own cumulative series. When METRICS_DIR is set,
+the series are written as a JSON snapshot to one file per process at most
+every FLUSH_SECONDS, and the /metrics view sums every process's file.
+Any worker answering the scrape therefore reports the totals of all
+workers, the same scheme as prometheus_client's multiprocess mode. The
+file of a process that is no longer running is deleted at the next scrape,
+its totals leave the sums (scrapers see a counter reset).
+
+/metrics answers with a `Bearer METRICS_TOKEN` authorization header only,
+or to anyone while DEBUG is on and no token is set.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.template.exceptions import TemplateDoesNotExist
+from django.utils.crypto import constant_time_compare
+
+FLUSH_SECONDS = 5
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+HISTOGRAMS = {
+    'medica_request_duration_seconds': ("Wall time of the request", SECONDS_BUCKETS),
+    'medica_request_sql_queries': ("SQL queries issued by the request", QUERY_BUCKETS),
+    'medica_request_sql_duration_seconds': ("Time spent in SQL by the request", SECONDS_BUCKETS),
+    'medica_request_template_duration_seconds': ("Time spent rendering templates", SECONDS_BUCKETS),
+}
+REQUESTS_TOTAL = 'medica_requests_total'
+
+
+class RequestStats:
+    """What one request spent, filled by the SQL wrapper and the template backend"""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.statements = {}
+
+    def record_query(self, sql, seconds):
+        self.queries += 1
+        self.sql_seconds += seconds
+        # SQL still has its placeholders, so the text is the query's signature
+        self.statements[sql] = self.statements.get(sql, 0) + 1
+
+    def duplicates(self):
+        """(count, sql) of the statements that ran more than once, most repeated first"""
+        return sorted(((count, sql) for sql, count in self.statements.items() if count > 1), reverse=True)
+
+
+# Context variables follow the request into sync_to_async threads, where async views run their queries
+current_request = ContextVar('medica_request_stats', default=None)
+
+
+def time_sql(execute, sql, params, many, context):
+    """Execute wrapper installed on every connection (signals.py), charging queries to the current request"""
+    stats = current_request.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.record_query(sql, time.perf_counter() - start)
+
+
+class Registry:
+    """Cumulative series of this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # {metric: {view: [per-bucket counts + overflow, sum]}}
+        self._histograms = {name: {} for name in HISTOGRAMS}
+        # {(view, status): count}
+        self._requests = {}
+        self._last_flush = 0.0
+        self._path = None
+
+    def observe_request(self, view, status, duration, stats):
+        values = {
+            'medica_request_duration_seconds': duration,
+            'medica_request_sql_queries': stats.queries,
+            'medica_request_sql_duration_seconds': stats.sql_seconds,
+            'medica_request_template_duration_seconds': stats.template_seconds,
+        }
+        with self._lock:
+            for name, value in values.items():
+                buckets = HISTOGRAMS[name][1]
+                series = self._histograms[name].get(view)
+                if series is None:
+                    series = self._histograms[name][view] = [[0] * (len(buckets) + 1), 0]
+                series[0][bisect_left(buckets, value)] += 1
+                series[1] += value
+            key = (view, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+        self.maybe_flush()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'histograms': {
+                    name: {view: [list(counts), total] for view, (counts, total) in series.items()}
+                    for name, series in self._histograms.items()
+                },
+                'requests': [[view, status, count] for (view, status), count in self._requests.items()],
+            }
+
+    # --- Multi-process snapshots ---
+
+    def maybe_flush(self, force=False):
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if not directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < FLUSH_SECONDS:
+            return
+        self._last_flush = now
+        if self._path is None:
+            os.makedirs(directory, exist_ok=True)
+            # The start time keeps a recycled pid from overwriting a dead process's totals
+            self._path = os.path.join(directory, f'{os.getpid()}-{time.time_ns()}.json')
+        temporary = f'{self._path}.{threading.get_ident()}.tmp'
+        with open(temporary, 'w') as handle:
+            json.dump(self.snapshot(), handle)
+        os.replace(temporary, self._path)
+
+
+REGISTRY = Registry()
+atexit.register(REGISTRY.maybe_flush, force=True)
+
+
+def _running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Running, as another user
+        pass
+    return True
+
+
+def collect():
+    """Snapshots of every running process (just this one without METRICS_DIR)"""
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if not directory:
+        return [REGISTRY.snapshot()]
+    REGISTRY.maybe_flush(force=True)
+    snapshots = []
+    for filename in os.listdir(directory):
+        pid = filename.partition('-')[0]
+        if pid.isdigit() and not _running(int(pid)):
+            # Left by a stopped worker, or a temporary file of one that died while writing
+            try:
+                os.remove(os.path.join(directory, filename))
+            except OSError:
+                pass
+            continue
+        if filename.endswith('.json'):
+            try:
+                with open(os.path.join(directory, filename)) as handle:
+                    snapshots.append(json.load(handle))
+            except (OSError, ValueError):
+                # Removed or being replaced right now, it will be there next scrape
+                continue
+    return snapshots
+
+
+def merge(snapshots):
+    histograms = {name: {} for name in HISTOGRAMS}
+    requests = {}
+    for snapshot in snapshots:
+        for name, series in snapshot['histograms'].items():
+            for view, (counts, total) in series.items():
+                merged = histograms[name].setdefault(view, [[0] * len(counts), 0])
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+        for view, status, count in snapshot['requests']:
+            requests[(view, status)] = requests.get((view, status), 0) + count
+    return histograms, requests
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(snapshots):
+    """Text exposition format 0.0.4 of the merged snapshots"""
+    histograms, requests = merge(snapshots)
+    lines = [
+        f'# HELP {REQUESTS_TOTAL} Requests by view and status code',
+        f'# TYPE {REQUESTS_TOTAL} counter',
+    ]
+    for (view, status), count in sorted(requests.items()):
+        lines.append(f'{REQUESTS_TOTAL}{{view="{_label(view)}",status="{status}"}} {count}')
+
+    for name, (documentation, buckets) in HISTOGRAMS.items():
+        lines.append(f'# HELP {name} {documentation}')
+        lines.append(f'# TYPE {name} histogram')
+        for view, (counts, total) in sorted(histograms[name].items()):
+            view = _label(view)
+            cumulative = 0
+            for bound, count in zip(buckets, counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{name}_bucket{{view="{view}",le="+Inf"}} {cumulative}')
+            lines.append(f'{name}_sum{{view="{view}"}} {total}')
+            lines.append(f'{name}_count{{view="{view}"}} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint, guarded by METRICS_TOKEN (open without one in DEBUG only)"""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return HttpResponseForbidden()
+    elif not settings.DEBUG:
+        return HttpResponseForbidden()
+    return HttpResponse(render_prometheus(collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# --- Template render time ---
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = current_request.get()
+        if stats is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_seconds += time.perf_counter() - start
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, adding each render's time to the current request's stats"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,144 @@
+import logging
+import time
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.utils.functional import SimpleLazyObject
+
+from . import auth_cache, metrics, routers
+
+logger = logging.getLogger('medica911.performance')
+
+SLOW_REQUEST_MS = 500
+DUPLICATES_LOGGED = 5
+
+
+class PerformanceMiddleware:
+    """
+    Time every request and its template rendering, recording them with
+    the SQL counted by metrics.time_sql per URL name in the metrics registry. Requests slower than
+    settings.SLOW_REQUEST_MS are logged with their repeated statements.
+    Works in front of sync and async views without adding a thread hop.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token, start = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current_request.reset(token)
+        self._finish(request, response, stats, start)
+        return response
+
+    async def __acall__(self, request):
+        stats, token, start = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current_request.reset(token)
+        self._finish(request, response, stats, start)
+        return response
+
+    def _start(self):
+        stats = metrics.RequestStats()
+        return stats, metrics.current_request.set(stats), time.perf_counter()
+
+    def _finish(self, request, response, stats, start):
+        duration = time.perf_counter() - start
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None else '<unresolved>'
+        metrics.REGISTRY.observe_request(view, response.status_code, duration, stats)
+
+        threshold = getattr(settings, 'SLOW_REQUEST_MS', SLOW_REQUEST_MS)
+        if threshold is not None and duration * 1000 >= threshold:
+            duplicates = stats.duplicates()[:DUPLICATES_LOGGED]
+            logger.warning(
+                "Slow request %s %s (%s): %.0f ms, %d queries in %.0f ms, templates %.0f ms%s",
+                request.method, request.path, view, duration * 1000,
+                stats.queries, stats.sql_seconds * 1000, stats.template_seconds * 1000,
+                ''.join(f"\n  {count}x {sql}" for count, sql in duplicates),
+            )
+
+
+def _cached_user(request):
+    if not hasattr(request, '_cached_user'):
+        request._cached_user = auth_cache.get_user(request)
+    return request._cached_user
+
+
+async def _acached_user(request):
+    if not hasattr(request, '_acached_user'):
+        request._acached_user = await auth_cache.aget_user(request)
+    return request._acached_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """
+    AuthenticationMiddleware with request.user read from the snapshots of
+    auth_cache.py, so that authenticated requests need no query to know
+    who is asking. Without a shared cache it is plain AuthenticationMiddleware.
+    """
+
+    def process_request(self, request):
+        super().process_request(request)
+        if not auth_cache.snapshots_enabled():
+            return
+        request.user = SimpleLazyObject(lambda: _cached_user(request))
+        request.auser = partial(_acached_user, request)
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Pin the reads of a request to the primary database when it changes
+    data (not GET/HEAD/OPTIONS) or follows a write by the same browser
+    within settings.REPLICA_STICKY_SECONDS, and start that window when
+    it writes (see routers.py).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = routers.begin_request(self._pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routers.end_request(token)
+        return self._finish(response, wrote)
+
+    async def __acall__(self, request):
+        token = routers.begin_request(self._pinned(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            wrote = routers.end_request(token)
+        return self._finish(response, wrote)
+
+    def _pinned(self, request):
+        return request.method not in self.SAFE_METHODS or routers.sticky_until(request) > time.time()
+
+    def _finish(self, response, wrote):
+        if wrote:
+            routers.stick(response)
+        return response
@@ -0,0 +1,73 @@
+# Generated by Django 6.0.1 on 2026-10-18 02:04
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS doctors_search_vector_gin ON doctors USING gin (search_vector)'
+        )
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS doctors_search_document_trgm ON doctors USING gin (search_document gin_trgm_ops)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS doctor_search USING fts5(document, tokenize='trigram')"
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS doctors_search_vector_gin')
+        schema_editor.execute('DROP INDEX IF EXISTS doctors_search_document_trgm')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS doctor_search')
+
+
+def backfill_search_documents(apps, schema_editor):
+    Doctor = apps.get_model('medica911', 'Doctor')
+    vendor = schema_editor.connection.vendor
+
+    doctors = list(Doctor.objects.select_related('user', 'speciality'))
+    for doctor in doctors:
+        parts = [
+            doctor.user.first_name, doctor.user.last_name, doctor.user.city, doctor.clinic_name,
+            doctor.speciality.name if doctor.speciality_id else None, doctor.bio,
+        ]
+        doctor.search_document = ' '.join(part.strip() for part in parts if part and part.strip())
+    Doctor.objects.bulk_update(doctors, ['search_document'], batch_size=1000)
+
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            "UPDATE doctors SET search_vector = to_tsvector('simple', coalesce(search_document, ''))"
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute('INSERT INTO doctor_search (rowid, document) SELECT id, search_document FROM doctors')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medica911', '0001_initial'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='doctor',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-18 02:08
+
+from django.db import migrations, models
+
+
+def backfill_rating_sum(apps, schema_editor):
+    Doctor = apps.get_model('medica911', 'Doctor')
+    Review = apps.get_model('medica911', 'Review')
+
+    totals = Review.objects.values('appointment__doctor').annotate(total=models.Sum('rating'))
+    doctors = []
+    for row in totals:
+        doctors.append(Doctor(pk=row['appointment__doctor'], rating_sum=row['total']))
+    Doctor.objects.bulk_update(doctors, ['rating_sum'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medica911', '0003_appointment_slot_constraint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctor',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_rating_sum, migrations.RunPython.noop),
+    ]
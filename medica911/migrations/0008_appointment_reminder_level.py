@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 02:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medica911', '0007_user_unread_notifications'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='reminder_level',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+    ]
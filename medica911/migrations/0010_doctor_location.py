@@ -0,0 +1,149 @@
+# Generated by Django 6.0.1 on 2026-10-18 03:03
+
+import math
+import unicodedata
+
+from django.db import migrations, models
+
+# Frozen copy of the geo.py lookup and of its city table as of this migration,
+# so later changes to either leave the backfill alone
+CELL_DEGREES = 0.2
+CELLS_PER_ROW = 1800
+CITIES = [
+    # (names..., latitude, longitude), data/cities.csv when this migration was written
+    (
+        'Tunis', 'Tunis Centre', 'El Menzah', 'El Manar', 'Le Bardo', 'Bardo', 'La Marsa', 'Marsa', 'Carthage',
+        'Le Kram', 'La Goulette', 36.8065, 10.1815,
+    ),
+    ('Ariana', 'Ariana Ville', 'Raoued', 'Ennasr', 'Soukra', 'La Soukra', 36.8625, 10.1956),
+    ('Ben Arous', 'Rades', 'Ezzahra', 'Hammam Lif', 'Megrine', 'Mourouj', 'El Mourouj', 36.7531, 10.2189),
+    ('Manouba', 'La Manouba', 'Den Den', 'Oued Ellil', 36.8101, 10.0956),
+    ('Bizerte', 'Binzart', 'Menzel Bourguiba', 37.2744, 9.8739),
+    ('Mateur', 37.0400, 9.6650),
+    ('Nabeul', 'Dar Chaabane', 36.4561, 10.7376),
+    ('Hammamet', 'Yasmine Hammamet', 36.4000, 10.6167),
+    ('Kelibia', 'Klibia', 36.8476, 11.0939),
+    ('Korba', 36.5786, 10.8586),
+    ('Grombalia', 36.6000, 10.5000),
+    ('Zaghouan', 36.4029, 10.1429),
+    ('Beja', 'Beja Ville', 36.7256, 9.1817),
+    ('Medjez el Bab', 'Mejez el Bab', 36.6500, 9.6167),
+    ('Jendouba', 36.5011, 8.7803),
+    ('Tabarka', 36.9544, 8.7581),
+    ('Ain Draham', 36.7833, 8.6833),
+    ('Le Kef', 'Kef', 'El Kef', 36.1742, 8.7049),
+    ('Tajerouine', 35.8917, 8.5528),
+    ('Siliana', 36.0849, 9.3708),
+    ('Makthar', 'Maktar', 35.8575, 9.2058),
+    ('Sousse', 'Sahloul', 'Khezama', 'Hammam Sousse', 35.8256, 10.6360),
+    ('Msaken', "M'saken", 35.7333, 10.5833),
+    ('Enfidha', 'Enfida', 36.1353, 10.3808),
+    ('Monastir', 'Skanes', 35.7643, 10.8113),
+    ('Moknine', 35.6333, 10.9000),
+    ('Ksar Hellal', 35.6430, 10.8910),
+    ('Jemmal', 'Jammel', 35.6230, 10.7590),
+    ('Mahdia', 35.5047, 11.0622),
+    ('El Jem', 35.2967, 10.7128),
+    ('Ksour Essef', 35.4181, 10.9947),
+    ('Kairouan', 'Kairouan Ville', 35.6781, 10.0963),
+    ('Haffouz', 35.6333, 9.6667),
+    ('Sbikha', 35.9333, 10.0167),
+    ('Kasserine', 35.1676, 8.8365),
+    ('Sbeitla', 35.2297, 9.1294),
+    ('Feriana', 34.9500, 8.5667),
+    ('Sidi Bouzid', 35.0382, 9.4849),
+    ('Regueb', 34.8592, 9.7864),
+    ('Meknassy', 34.6000, 9.6000),
+    ('Sfax', 'Sakiet Ezzit', 'Sakiet Eddaier', 'Thyna', 34.7406, 10.7603),
+    ('Mahres', 34.5333, 10.5000),
+    ('Jebiniana', 35.0333, 10.9000),
+    ('Gabes', 'Gabès', 'Qabis', 33.8815, 10.0982),
+    ('Mareth', 33.6333, 10.3000),
+    ('El Hamma', 33.8864, 9.7956),
+    ('Medenine', 'Médenine', 33.3549, 10.5055),
+    ('Djerba', 'Houmt Souk', 'Midoun', 'Jerba', 33.8758, 10.8575),
+    ('Zarzis', 33.5039, 11.1122),
+    ('Ben Gardane', 'Ben Guerdane', 33.1389, 11.2167),
+    ('Tataouine', 32.9297, 10.4518),
+    ('Gafsa', 34.4250, 8.7842),
+    ('Metlaoui', 34.3208, 8.4014),
+    ('Redeyef', 34.3833, 8.1500),
+    ('Tozeur', 33.9197, 8.1335),
+    ('Nefta', 33.8731, 7.8778),
+    ('Kebili', 'Kébili', 33.7044, 8.9690),
+    ('Douz', 33.4667, 9.0167),
+]
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char if char.isalnum() else ' ' for char in text if not unicodedata.combining(char))
+    return ' '.join(text.lower().split())
+
+
+def load_cities():
+    table = {}
+    for *names, latitude, longitude in CITIES:
+        for name in names:
+            table[normalize(name)] = (latitude, longitude)
+    return table
+
+
+def geocode(table, *texts):
+    # The city named last in a text wins, addresses end with it
+    for text in texts:
+        if not text:
+            continue
+        padded = f' {normalize(text)} '
+        found = None
+        for name, point in table.items():
+            position = padded.rfind(f' {name} ')
+            if position >= 0 and (found is None or position > found[0]):
+                found = (position, point)
+        if found:
+            return found[1]
+    return None
+
+
+def locate_doctors(apps, schema_editor):
+    Doctor = apps.get_model('medica911', 'Doctor')
+    table = load_cities()
+    doctors = list(Doctor.objects.select_related('user'))
+    for doctor in doctors:
+        point = geocode(table, doctor.clinic_address, doctor.user.city)
+        if point:
+            doctor.latitude, doctor.longitude = point
+            row = math.floor((doctor.latitude + 90) / CELL_DEGREES)
+            column = math.floor((doctor.longitude + 180) / CELL_DEGREES)
+            doctor.geo_cell = row * CELLS_PER_ROW + column
+    Doctor.objects.bulk_update(doctors, ['latitude', 'longitude', 'geo_cell'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medica911', '0009_user_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctor',
+            name='geo_cell',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='latitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='longitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='doctor',
+            index=models.Index(fields=['geo_cell'], name='doctor_geo_cell_idx'),
+        ),
+        migrations.RunPython(locate_doctors, migrations.RunPython.noop),
+    ]
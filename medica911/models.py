@@ -1,6 +1,23 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models.functions import Cast, Lower, Round
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.search import SearchVectorField
 from django.utils import timezone
+from django.utils.functional import cached_property
+
+
+def _skip_on_full_update(instance, save_kwargs, *skipped):
+    """Leave columns that are only ever changed by F()/bulk UPDATEs out of a plain instance.save()"""
+    if instance._state.adding or save_kwargs.get('update_fields') is not None or save_kwargs.get('force_insert'):
+        return
+    # Deferred columns were not loaded, so they are not written back either (as Model.save() does)
+    deferred = instance.get_deferred_fields()
+    save_kwargs['update_fields'] = [
+        field.attname for field in instance._meta.concrete_fields
+        if not field.primary_key and field.attname not in skipped and field.attname not in deferred
+    ]
 
 
 class User(AbstractUser):
@@ -19,15 +36,42 @@ class User(AbstractUser):
     profile_picture = models.URLField(blank=True, null=True)
     supabase_uid = models.CharField(max_length=255, unique=True, null=True, blank=True)
     date_of_birth = models.DateField(blank=True, null=True)
+    # Denormalized badge count, only ever changed with F() updates (see notifications.py)
+    unread_notifications = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'users'
+        indexes = [
+            # Keyset orderings of the admin user tables (UserFilterForm.SORTS)
+            models.Index(fields=['role', '-date_joined', '-id'], name='users_role_joined_idx'),
+            models.Index(fields=['role', 'last_name', 'first_name', 'id'], name='users_role_name_idx'),
+            models.Index(fields=['role', 'email', 'id'], name='users_role_email_idx'),
+            # Case-insensitive email matching of the doctor import (onboarding.py)
+            models.Index(Lower('email'), name='users_email_lower_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_full_name()} ({self.role})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored role so role changes can move the dashboard counters
+        instance._stored_role = instance.__dict__.get('role')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        # A full save must not write back a stale unread counter over concurrent increments
+        _skip_on_full_update(self, kwargs, 'unread_notifications')
+        super().save(*args, **kwargs)
+    
+    @cached_property
+    def doctor_profile_id(self):
+        """Id of the user's doctor profile (None without one), preset on cached request users (auth_cache.py)"""
+        return Doctor.objects.filter(user_id=self.pk).values_list('pk', flat=True).first()
+    
     @property
     def is_admin(self):
         return self.role == 'admin' or self.is_superuser
@@ -74,20 +118,65 @@ class Doctor(models.Model):
     is_available = models.BooleanField(default=True)
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
     total_reviews = models.PositiveIntegerField(default=0)
+    # Sum of all review ratings, so the average can be updated without re-aggregating
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    # Denormalized search text, maintained by signals (see search.py)
+    search_document = models.TextField(blank=True, default='', editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Clinic location, geocoded from the clinic address or city by signals (see geo.py)
+    latitude = models.FloatField(null=True, blank=True, editable=False)
+    longitude = models.FloatField(null=True, blank=True, editable=False)
+    geo_cell = models.PositiveIntegerField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'doctors'
         ordering = ['-rating', 'user__first_name']
+        indexes = [
+            # Directory and home page: available doctors by rating
+            models.Index(
+                fields=['-rating', 'id'],
+                condition=models.Q(is_available=True),
+                name='doctor_available_rating_idx',
+            ),
+            # Nearest-doctor search: grid cells around the search point
+            models.Index(fields=['geo_cell'], name='doctor_geo_cell_idx'),
+        ]
     
     def __str__(self):
         return f"Dr. {self.user.get_full_name()} - {self.speciality}"
     
+    def save(self, *args, **kwargs):
+        # A full save (the profile form) must not write back a stale rating over concurrent reviews
+        _skip_on_full_update(self, kwargs, 'rating', 'rating_sum', 'total_reviews')
+        super().save(*args, **kwargs)
+    
     @property
     def full_name(self):
         return f"Dr. {self.user.get_full_name()}"
 
+    @classmethod
+    def apply_review_change(cls, doctor_id, rating_delta, count_delta):
+        """Shift the stored rating sum and review count and recompute the average in a single UPDATE"""
+        new_sum = models.F('rating_sum') + rating_delta
+        new_count = models.F('total_reviews') + count_delta
+        return cls.objects.filter(pk=doctor_id).update(
+            rating_sum=new_sum,
+            total_reviews=new_count,
+            rating=models.Case(
+                models.When(
+                    total_reviews__gt=-count_delta,
+                    then=Round(Cast(
+                        Cast(new_sum, models.FloatField()) / new_count,
+                        models.DecimalField(max_digits=12, decimal_places=4),
+                    ), 2),
+                ),
+                default=models.Value(Decimal('0.00')),
+                output_field=models.DecimalField(max_digits=3, decimal_places=2),
+            ),
+        )
+
 
 class DoctorAvailability(models.Model):
     """Doctor's weekly availability schedule"""
@@ -137,17 +226,55 @@ class Appointment(models.Model):
     notes = models.TextField(blank=True, null=True)
     diagnosis = models.TextField(blank=True, null=True)
     prescription = models.TextField(blank=True, null=True)
+    # Closest reminder already sent, see reminders.py (0 none, 1 day before, 2 hour before)
+    reminder_level = models.PositiveSmallIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'appointments'
         ordering = ['-appointment_date', '-appointment_time']
-        unique_together = ['doctor', 'appointment_date', 'appointment_time']
+        indexes = [
+            # Doctor calendar window
+            models.Index(fields=['doctor', 'appointment_date', 'status'], name='appt_doctor_date_status_idx'),
+            # Client dashboard history, newest first
+            models.Index(fields=['client', '-appointment_date', '-appointment_time'], name='appt_client_date_idx'),
+            models.Index(fields=['status'], name='appt_status_idx'),
+            # Only the still-open appointments, for reminders and pending queues
+            models.Index(
+                fields=['appointment_date', 'appointment_time'],
+                condition=models.Q(status__in=['pending', 'confirmed']),
+                name='appt_open_date_idx',
+            ),
+            models.Index(fields=['created_at'], name='appt_created_idx'),
+        ]
+        constraints = [
+            # A cancelled appointment releases its slot for the next patient
+            models.UniqueConstraint(
+                fields=['doctor', 'appointment_date', 'appointment_time'],
+                condition=~models.Q(status='cancelled'),
+                name='appointment_slot_unique',
+                violation_error_message="This time slot is already booked.",
+            ),
+        ]
     
     def __str__(self):
         return f"{self.client.get_full_name()} - {self.doctor} on {self.appointment_date}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so status changes can move the dashboard counters
+        instance._stored_status = instance.__dict__.get('status')
+        # and the stored doctor and day, whose cached slots a rescheduled visit frees
+        instance._stored_day = (instance.__dict__.get('doctor_id'), instance.__dict__.get('appointment_date'))
+        return instance
+    
+    def save(self, *args, **kwargs):
+        # The reminder scheduler claims rows with bulk UPDATEs, a stale edit must not undo them
+        _skip_on_full_update(self, kwargs, 'reminder_level')
+        super().save(*args, **kwargs)
+    
     @property
     def is_upcoming(self):
         from datetime import datetime
@@ -175,16 +302,24 @@ class Review(models.Model):
     def __str__(self):
         return f"Review by {self.appointment.client.get_full_name()} - {self.rating}⭐"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored rating so an edit only applies the difference
+        instance._stored_rating = instance.__dict__.get('rating')
+        return instance
+
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # Update doctor's rating
-        doctor = self.appointment.doctor
-        reviews = Review.objects.filter(appointment__doctor=doctor)
-        if reviews.exists():
-            avg_rating = reviews.aggregate(models.Avg('rating'))['rating__avg']
-            doctor.rating = round(avg_rating, 2)
-            doctor.total_reviews = reviews.count()
-            doctor.save()
+        adding = self._state.adding
+        previous = getattr(self, '_stored_rating', None)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Keep the doctor's rating current incrementally (deletes are handled in signals.py)
+            if adding:
+                Doctor.apply_review_change(self.appointment.doctor_id, self.rating, 1)
+            elif previous is not None and previous != self.rating:
+                Doctor.apply_review_change(self.appointment.doctor_id, self.rating - previous, 0)
+        self._stored_rating = self.rating
 
 
 class Notification(models.Model):
@@ -206,6 +341,23 @@ class Notification(models.Model):
     class Meta:
         db_table = 'notifications'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'is_read', '-created_at'], name='notif_user_read_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.user.username}"
+
+
+class StatCounter(models.Model):
+    """Rollup counters for the admin dashboard, updated incrementally by signals (see stats.py)"""
+    
+    key = models.CharField(max_length=100, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'stat_counters'
+    
+    def __str__(self):
+        return f"{self.key} = {self.value}"
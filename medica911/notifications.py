@@ -0,0 +1,114 @@
+"""
+Notification service.
+
+Notifications are written with bulk_create and each recipient's
+User.unread_notifications counter is bumped in the same transaction, so
+the navbar badge reads a column of the already loaded user instead of
+running a COUNT on every page. Each new notification is also pushed to
+the recipient's live stream once the transaction commits (see events.py).
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from . import auth_cache, events
+from .models import Notification, User
+
+BATCH_SIZE = 1000
+
+
+def notify(notifications):
+    """Save unsaved Notification objects in bulk and bump their recipients' unread counters"""
+    notifications = list(notifications)
+    if not notifications:
+        return []
+
+    # One UPDATE per distinct increment, usually a single statement for the whole batch
+    users_by_increment = defaultdict(list)
+    for user_id, count in Counter(notification.user_id for notification in notifications).items():
+        users_by_increment[count].append(user_id)
+
+    with transaction.atomic():
+        created = Notification.objects.bulk_create(notifications, batch_size=BATCH_SIZE)
+        for increment, user_ids in users_by_increment.items():
+            User.objects.filter(pk__in=user_ids).update(
+                unread_notifications=F('unread_notifications') + increment
+            )
+            auth_cache.forget_users(user_ids)
+        for notification in created:
+            events.publish_on_commit(notification.user_id, events.notification_event(notification))
+    return created
+
+
+def mark_all_read(user):
+    """Mark every unread notification of a user as read with a single UPDATE"""
+    with transaction.atomic():
+        updated = Notification.objects.filter(user=user, is_read=False).update(is_read=True)
+        if updated:
+            # Not a reset to 0: a notification committed since the first UPDATE is still unread
+            User.objects.filter(pk=user.pk).update(
+                unread_notifications=Greatest(F('unread_notifications') - updated, 0)
+            )
+            auth_cache.forget_users([user.pk])
+    user.unread_notifications = max(user.unread_notifications - updated, 0)
+    return updated
+
+
+def mark_read(user, notification_ids):
+    """Mark some notifications as read and take them off the counter"""
+    with transaction.atomic():
+        updated = Notification.objects.filter(
+            user=user, pk__in=notification_ids, is_read=False
+        ).update(is_read=True)
+        if updated:
+            User.objects.filter(pk=user.pk).update(
+                unread_notifications=Greatest(F('unread_notifications') - updated, 0)
+            )
+            auth_cache.forget_users([user.pk])
+    user.unread_notifications = max(user.unread_notifications - updated, 0)
+    return updated
+
+
+# --- Appointment and review events ---
+
+def appointment_requested(appointment):
+    client = appointment.client
+    return notify([Notification(
+        user_id=appointment.doctor.user_id,
+        notification_type='appointment',
+        title="New appointment request",
+        message=(
+            f"{client.get_full_name() or client.username} requested an appointment on "
+            f"{appointment.appointment_date:%d %b %Y} at {appointment.appointment_time:%H:%M}."
+        ),
+    )])
+
+
+def appointment_status_changed(appointment):
+    events.publish_on_commit(appointment.client_id, events.Event('appointment', {
+        'id': appointment.pk,
+        'status': appointment.status,
+        'status_display': appointment.get_status_display(),
+    }))
+    return notify([Notification(
+        user_id=appointment.client_id,
+        notification_type='appointment',
+        title=f"Appointment {appointment.get_status_display().lower()}",
+        message=(
+            f"Your appointment with {appointment.doctor.full_name} on "
+            f"{appointment.appointment_date:%d %b %Y} at {appointment.appointment_time:%H:%M} "
+            f"is now {appointment.get_status_display().lower()}."
+        ),
+    )])
+
+
+def review_posted(review):
+    appointment = review.appointment
+    return notify([Notification(
+        user_id=appointment.doctor.user_id,
+        notification_type='system',
+        title="New review",
+        message=f"You received a {review.rating} star review for your appointment on {appointment.appointment_date:%d %b %Y}.",
+    )])
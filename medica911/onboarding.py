@@ -0,0 +1,267 @@
+"""
+Bulk doctor onboarding from CSV.
+
+import_doctors() makes a single streaming pass over the file. Each row is
+validated on its own (forms.DoctorImportRowForm) and checked against the
+rows before it, and valid rows are gathered into chunks. Each chunk is
+written in one transaction with a fixed handful of statements whatever
+its size:
+
+- users are matched on email (case-insensitive, through the users_email_lower_idx
+  index), then updated with one bulk_update and created with one bulk_create;
+- doctor profiles are matched on license_number, or on their user for
+  the PENDING-* placeholder profiles made at signup, and written the same way;
+- listed weekly availability replaces the doctor's previous windows;
+- speciality names not seen before are created once.
+
+Empty optional columns leave the stored value of an existing doctor
+alone, as an empty availability leaves the schedule alone.
+
+Rows that clash with existing data are reported with their line number
+and skipped, and the rest of their chunk still goes in. Examples are an
+email used by a client account or a license number held by another
+doctor. Bulk writes send no model signals, so clinics are geocoded as
+rows are written, and each chunk refreshes the search index and dashboard
+counters itself and drops each existing doctor's cached schedule and
+request user snapshot.
+
+A malformed line, or a chunk clashing with rows another import wrote in
+the meantime, stops the import with InvalidImportFile. The chunks before
+it are kept, and importing the file again is safe since rows are matched
+on their email and license number.
+"""
+import csv
+from dataclasses import dataclass, field
+
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from . import auth_cache, availability, fragments, geo, stats
+from .forms import DoctorImportRowForm
+from .models import Doctor, DoctorAvailability, Speciality, User
+from .search import refresh_search_index
+
+CHUNK_SIZE = 1000
+REQUIRED_COLUMNS = {'email', 'first_name', 'last_name', 'license_number'}
+
+# bulk_update() leaves auto_now fields alone, updated_at is set by hand (it keys the cached doctor cards)
+USER_FIELDS = ['first_name', 'last_name', 'phone', 'city', 'updated_at']
+DOCTOR_FIELDS = [
+    'license_number', 'speciality_id', 'experience_years', 'consultation_fee',
+    'clinic_name', 'clinic_address', 'bio', 'education', 'is_available', 'updated_at',
+    'latitude', 'longitude', 'geo_cell',
+]
+
+
+class InvalidImportFile(ValueError):
+    """The file cannot be imported (missing columns) or the import stopped part way"""
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    created_users: int = 0
+    updated_users: int = 0
+    created_doctors: int = 0
+    updated_doctors: int = 0
+    availabilities: int = 0
+    created_specialities: int = 0
+    # [(line, message)]
+    errors: list = field(default_factory=list)
+
+    @property
+    def imported(self):
+        return self.created_doctors + self.updated_doctors
+
+
+def import_doctors(lines, chunk_size=CHUNK_SIZE, dry_run=False, progress=None):
+    """Import the doctors of a CSV file (any iterable of text lines) and return an ImportReport"""
+    reader = csv.DictReader(lines)
+    missing = REQUIRED_COLUMNS - set(reader.fieldnames or ())
+    if missing:
+        raise InvalidImportFile(f"Missing columns: {', '.join(sorted(missing))}")
+
+    report = ImportReport()
+    writer = ChunkWriter(report, dry_run)
+    seen = {'email': {}, 'license_number': {}, 'username': {}}
+    chunk = []
+    try:
+        for row in reader:
+            line = reader.line_num
+            report.rows += 1
+            form = DoctorImportRowForm({key: (value or '').strip() for key, value in row.items() if key})
+            if not form.is_valid():
+                report.errors.append((line, '; '.join(
+                    f"{name}: {' '.join(messages)}" for name, messages in form.errors.items()
+                )))
+                continue
+            data = form.cleaned_data
+            duplicate = next((key for key, values in seen.items() if data[key] in values), None)
+            if duplicate:
+                report.errors.append((line, f"{duplicate} {data[duplicate]} already on line {seen[duplicate][data[duplicate]]}"))
+                continue
+            for key, values in seen.items():
+                values[data[key]] = line
+            chunk.append((line, data))
+            if len(chunk) >= chunk_size:
+                writer.write(chunk)
+                chunk = []
+                if progress:
+                    progress(report)
+        if chunk:
+            writer.write(chunk)
+    except csv.Error as exc:
+        # line_num still counts the lines before the one that failed
+        line = reader.line_num + 1
+        raise InvalidImportFile(
+            f"Line {line}: {exc}. The rows from line {chunk[0][0] if chunk else line} on were not imported."
+        ) from exc
+    except IntegrityError as exc:
+        raise InvalidImportFile(
+            f"The rows from line {chunk[0][0]} clash with doctors written meanwhile, probably by another "
+            f"import. The rows before them were imported, import the file again."
+        ) from exc
+    if report.imported and not dry_run:
+        fragments.invalidate_fragments(fragments.HOME_TOP_DOCTORS)
+    report.errors.sort()
+    if progress:
+        progress(report)
+    return report
+
+
+class ChunkWriter:
+
+    def __init__(self, report, dry_run):
+        self.report = report
+        self.dry_run = dry_run
+        self.specialities = {name.lower(): pk for pk, name in Speciality.objects.values_list('pk', 'name')}
+        # Imported users cannot log in with a password until they reset it (or use Google)
+        self.password = make_password(None)
+
+    def write(self, chunk):
+        with transaction.atomic():
+            rows = self._match(chunk)
+            self._specialities(rows)
+            doctor_ids = self._write_rows(rows)
+            refresh_search_index(doctor_ids)
+            if self.dry_run:
+                transaction.set_rollback(True)
+
+    def _match(self, chunk):
+        """[(line, data, user, doctor)] of the rows that fit existing data, reporting the others"""
+        users = {}
+        emails = [data['email'] for _, data in chunk]
+        for user in User.objects.annotate(email_lower=Lower('email')).filter(email_lower__in=emails):
+            users.setdefault(user.email_lower, []).append(user)
+        taken_usernames = set(
+            User.objects.filter(username__in=[data['username'] for _, data in chunk])
+            .values_list('username', flat=True)
+        )
+        by_license = {
+            doctor.license_number: doctor
+            for doctor in Doctor.objects.filter(license_number__in=[data['license_number'] for _, data in chunk])
+        }
+        user_ids = [user.pk for matches in users.values() for user in matches]
+        by_user = {doctor.user_id: doctor for doctor in Doctor.objects.filter(user_id__in=user_ids)}
+
+        rows = []
+        for line, data in chunk:
+            matches = users.get(data['email'], [])
+            user = matches[0] if len(matches) == 1 else None
+            doctor = by_license.get(data['license_number'])
+            if len(matches) > 1:
+                error = f"{len(matches)} accounts use {data['email']}"
+            elif user is not None and user.role != 'doctor':
+                error = f"{data['email']} belongs to a {user.role} account"
+            elif doctor is not None and (user is None or doctor.user_id != user.pk):
+                error = f"license {data['license_number']} belongs to another doctor"
+            elif user is None and data['username'] in taken_usernames:
+                error = f"username {data['username']} is taken"
+            else:
+                error = None
+            if error:
+                self.report.errors.append((line, error))
+                continue
+            if doctor is None and user is not None:
+                doctor = by_user.get(user.pk)
+            rows.append((line, data, user, doctor))
+        return rows
+
+    def _specialities(self, rows):
+        names = {data['speciality'] for _, data, _, _ in rows if data['speciality']}
+        new = {name for name in names if name.lower() not in self.specialities}
+        if not new:
+            return
+        created = Speciality.objects.bulk_create([Speciality(name=name) for name in new], ignore_conflicts=True)
+        self.report.created_specialities += len(created)
+        self.specialities.update(
+            (name.lower(), pk) for pk, name in Speciality.objects.filter(name__in=new).values_list('pk', 'name')
+        )
+
+    def _write_rows(self, rows):
+        now = timezone.now()
+        new_users, changed_users = [], []
+        for _, data, user, _ in rows:
+            if user is None:
+                user = User(
+                    username=data['username'], email=data['email'], password=self.password, role='doctor'
+                )
+                new_users.append(user)
+            else:
+                changed_users.append(user)
+                user.updated_at = now
+            user.first_name, user.last_name = data['first_name'], data['last_name']
+            for name in ('phone', 'city'):
+                if data[name]:
+                    setattr(user, name, data[name])
+        User.objects.bulk_create(new_users)
+        User.objects.bulk_update(changed_users, USER_FIELDS)
+        # Their names, and maybe their doctor profile, are in cached request users
+        auth_cache.forget_users([user.pk for user in changed_users])
+        users = iter(new_users)
+
+        new_doctors, changed_doctors, schedules, replaced = [], [], [], []
+        for _, data, user, doctor in rows:
+            user = user or next(users)
+            if doctor is None:
+                doctor = Doctor(user=user)
+                new_doctors.append(doctor)
+            else:
+                changed_doctors.append(doctor)
+                doctor.updated_at = now
+            doctor.license_number = data['license_number']
+            # Empty columns keep the stored values (the model defaults for new doctors)
+            if data['speciality']:
+                doctor.speciality_id = self.specialities.get(data['speciality'].lower())
+            for name in ('experience_years', 'consultation_fee', 'is_available'):
+                if data[name] is not None:
+                    setattr(doctor, name, data[name])
+            for name in ('clinic_name', 'clinic_address', 'bio', 'education'):
+                if data[name]:
+                    setattr(doctor, name, data[name])
+            geo.set_location(doctor, doctor.clinic_address, user.city)
+            if data['availability'] is not None:
+                schedules.append((doctor, data['availability']))
+                if doctor.pk is not None:
+                    replaced.append(doctor.pk)
+        Doctor.objects.bulk_create(new_doctors)
+        Doctor.objects.bulk_update(changed_doctors, DOCTOR_FIELDS)
+
+        # Listed windows replace the old ones
+        DoctorAvailability.objects.filter(doctor_id__in=replaced).delete()
+        created_windows = DoctorAvailability.objects.bulk_create([
+            DoctorAvailability(doctor=doctor, day_of_week=day, start_time=start, end_time=end)
+            for doctor, windows in schedules for day, start, end in windows
+        ])
+        # Both are rolled back with a dry run
+        transaction.on_commit(lambda: [availability.invalidate_schedule(pk) for pk in replaced])
+        stats.bump({stats.role_key('doctor'): len(new_users)})
+
+        self.report.created_users += len(new_users)
+        self.report.updated_users += len(changed_users)
+        self.report.created_doctors += len(new_doctors)
+        self.report.updated_doctors += len(changed_doctors)
+        self.report.availabilities += len(created_windows)
+        return [doctor.pk for doctor in new_doctors + changed_doctors]
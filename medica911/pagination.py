@@ -0,0 +1,156 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder keeping microseconds, rows created in the same millisecond would be skipped otherwise"""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPage:
+    """A single page of results produced by KeysetPaginator"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class KeysetPaginator:
+    """
+    Cursor based pagination over a fixed ordering.
+
+    Instead of OFFSET, each page filters on the ordering values of the last
+    row seen, so every page costs the same single indexed query however deep
+    the user scrolls. The last ordering field must be unique (usually 'id')
+    so that rows with equal sort keys are never skipped or repeated.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.fields = [(field.lstrip('-'), field.startswith('-')) for field in self.ordering]
+
+    def page(self, after=None, before=None):
+        """Return the page following `after` or preceding `before` (first page if neither)"""
+        try:
+            return self._page(self._decode(after), self._decode(before))
+        except (ValidationError, ValueError, TypeError):
+            # Cursor values that don't fit the ordering fields are treated as no cursor
+            return self._page(None, None)
+
+    async def apage(self, after=None, before=None):
+        """page() for async views, the rows are fetched through the async ORM"""
+        try:
+            return await self._apage(self._decode(after), self._decode(before))
+        except (ValidationError, ValueError, TypeError):
+            return await self._apage(None, None)
+
+    def _page(self, after_values, before_values):
+        queryset, backwards = self._page_queryset(after_values, before_values)
+        return self._make_page(list(queryset), after_values, backwards)
+
+    async def _apage(self, after_values, before_values):
+        queryset, backwards = self._page_queryset(after_values, before_values)
+        return self._make_page([row async for row in queryset], after_values, backwards)
+
+    def _page_queryset(self, after_values, before_values):
+        # One extra row tells whether there is more in the direction of travel
+        if after_values is None and before_values is not None:
+            queryset = (
+                self.queryset
+                .filter(self._seek(before_values, backwards=True))
+                .order_by(*self._reversed_ordering())
+            )
+            return queryset[:self.per_page + 1], True
+
+        queryset = self.queryset.order_by(*self.ordering)
+        if after_values is not None:
+            queryset = queryset.filter(self._seek(after_values))
+        return queryset[:self.per_page + 1], False
+
+    def _make_page(self, rows, after_values, backwards):
+        has_more = len(rows) > self.per_page
+        if backwards:
+            rows = rows[:self.per_page][::-1]
+            return KeysetPage(
+                rows,
+                next_cursor=self._encode(rows[-1]) if rows else None,
+                previous_cursor=self._encode(rows[0]) if has_more else None,
+            )
+        rows = rows[:self.per_page]
+        return KeysetPage(
+            rows,
+            next_cursor=self._encode(rows[-1]) if has_more else None,
+            previous_cursor=self._encode(rows[0]) if rows and after_values is not None else None,
+        )
+
+    def _reversed_ordering(self):
+        return [name if descending else f'-{name}' for name, descending in self.fields]
+
+    def _seek(self, values, backwards=False):
+        # Builds (a > x) OR (a = x AND (b > y OR (b = y AND c > z))) for the ordering
+        condition = None
+        for (name, descending), value in reversed(list(zip(self.fields, values))):
+            lookup = 'lt' if descending != backwards else 'gt'
+            strictly_past = Q(**{f'{name}__{lookup}': value})
+            if condition is None:
+                condition = strictly_past
+            else:
+                condition = strictly_past | (Q(**{name: value}) & condition)
+        return condition
+
+    def _values(self, obj):
+        values = []
+        for name, _ in self.fields:
+            value = obj
+            for attr in name.split('__'):
+                value = getattr(value, attr)
+            values.append(value)
+        return values
+
+    def _encode(self, obj):
+        payload = json.dumps(self._values(obj), cls=CursorEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def _decode(self, cursor):
+        # A malformed or stale cursor simply falls back to the first page
+        if not cursor:
+            return None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (ValueError, TypeError, binascii.Error):
+            return None
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            return None
+        return values
@@ -0,0 +1,160 @@
+"""
+Appointment reminders.
+
+Each reminder has a lead time and a level. An open appointment starting
+within the lead time whose Appointment.reminder_level is still below the
+reminder's level gets a 'reminder' notification, and its level is raised
+in the same transaction, so a reminder is never sent twice. The closest
+reminder runs first: an appointment booked 40 minutes ahead only gets the
+one hour reminder, not both.
+
+Candidates are scanned with async ORM queries in keyset batches on
+(date, time, id), which the partial appt_open_date_idx index serves.
+Each batch is then claimed and notified in one transaction: one SELECT,
+one UPDATE, and the bulk writes of notify().
+"""
+import asyncio
+from dataclasses import dataclass
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Appointment, Notification
+from .notifications import notify
+
+OPEN_STATUSES = ['pending', 'confirmed']
+BATCH_SIZE = 1000
+CONCURRENCY = 4
+
+
+@dataclass(frozen=True)
+class Reminder:
+    level: int
+    lead: timedelta
+    title: str
+
+
+# Closest first, see the module docstring
+REMINDERS = [
+    Reminder(level=2, lead=timedelta(hours=1), title="Appointment in one hour"),
+    Reminder(level=1, lead=timedelta(hours=24), title="Appointment tomorrow"),
+]
+
+
+def window_filter(start, end):
+    """Q matching appointments whose date and time fall in [start, end)"""
+    if start.date() == end.date():
+        return Q(appointment_date=start.date(), appointment_time__gte=start.time(), appointment_time__lt=end.time())
+    return (
+        Q(appointment_date=start.date(), appointment_time__gte=start.time())
+        | Q(appointment_date__gt=start.date(), appointment_date__lt=end.date())
+        | Q(appointment_date=end.date(), appointment_time__lt=end.time())
+    )
+
+
+def due_appointments(reminder, now):
+    return Appointment.objects.filter(
+        window_filter(now, now + reminder.lead),
+        status__in=OPEN_STATUSES,
+        reminder_level__lt=reminder.level,
+    )
+
+
+def _after(row):
+    day, slot, pk = row
+    return (
+        Q(appointment_date__gt=day)
+        | Q(appointment_date=day, appointment_time__gt=slot)
+        | Q(appointment_date=day, appointment_time=slot, pk__gt=pk)
+    )
+
+
+async def candidate_batches(queryset, batch_size=BATCH_SIZE):
+    """Yield lists of appointment ids in (date, time, id) order, one indexed query per batch"""
+    last = None
+    while True:
+        page = queryset if last is None else queryset.filter(_after(last))
+        rows = [
+            row async for row in
+            page.order_by('appointment_date', 'appointment_time', 'pk')
+            .values_list('appointment_date', 'appointment_time', 'pk')[:batch_size]
+        ]
+        if not rows:
+            return
+        yield [pk for _, _, pk in rows]
+        if len(rows) < batch_size:
+            return
+        last = rows[-1]
+
+
+def send_batch(reminder, appointment_ids):
+    """Claim the still unreminded appointments among `appointment_ids` and notify their clients"""
+    with transaction.atomic():
+        claimed = Appointment.objects.filter(
+            pk__in=appointment_ids, status__in=OPEN_STATUSES, reminder_level__lt=reminder.level
+        )
+        if connection.features.has_select_for_update_skip_locked:
+            # Another scheduler instance working on the same rows simply skips them
+            claimed = claimed.select_for_update(skip_locked=True, of=('self',))
+        rows = list(claimed.values_list(
+            'pk', 'client_id', 'appointment_date', 'appointment_time',
+            'doctor__user__first_name', 'doctor__user__last_name',
+        ))
+        if not rows:
+            return 0
+        Appointment.objects.filter(pk__in=[row[0] for row in rows]).update(reminder_level=reminder.level)
+        notify(
+            Notification(
+                user_id=client_id,
+                notification_type='reminder',
+                title=reminder.title,
+                message=(
+                    f"Your appointment with Dr. {first_name} {last_name} is on "
+                    f"{day:%d %b %Y} at {slot:%H:%M}."
+                ),
+            )
+            for _, client_id, day, slot, first_name, last_name in rows
+        )
+    return len(rows)
+
+
+async def run_reminders(now=None, batch_size=BATCH_SIZE, concurrency=CONCURRENCY, stop=None):
+    """
+    Send every due reminder once and return {level: notifications sent}.
+
+    Up to `concurrency` batches are written at the same time, each on its
+    own thread and connection (one at a time on SQLite). Setting the `stop` event ends the run after
+    the batches already in flight, which always commit or roll back whole.
+    """
+    now = now or timezone.localtime().replace(tzinfo=None)
+    # SQLite takes a single writer, so batches are written one at a time on the scanning connection
+    parallel = connection.vendor != 'sqlite'
+    if not parallel:
+        concurrency = 1
+    send = sync_to_async(send_batch, thread_sensitive=not parallel)
+    semaphore = asyncio.Semaphore(concurrency)
+    sent = {}
+
+    async def worker(reminder, ids):
+        try:
+            sent[reminder.level] += await send(reminder, ids)
+        finally:
+            semaphore.release()
+
+    for reminder in REMINDERS:
+        sent[reminder.level] = 0
+        tasks = []
+        async for ids in candidate_batches(due_appointments(reminder, now), batch_size):
+            await semaphore.acquire()
+            if stop is not None and stop.is_set():
+                semaphore.release()
+                break
+            tasks.append(asyncio.create_task(worker(reminder, ids)))
+        # A reminder level has to be finished before the next, longer one scans
+        await asyncio.gather(*tasks)
+        if stop is not None and stop.is_set():
+            break
+    return sent
@@ -0,0 +1,123 @@
+"""
+Read replica routing.
+
+ReplicaRouter sends reads to one of settings.DATABASE_REPLICAS, picked at
+random, and everything else to the primary ('default'). Reads stay on the
+primary in these cases:
+
+- inside a transaction.atomic() block, which runs on the primary, so
+  SELECT ... FOR UPDATE and read-modify-write code see their own rows;
+- once the current request (or command) has written anything;
+- for the rest of the request when it is not a GET/HEAD/OPTIONS;
+- for REPLICA_STICKY_SECONDS after a request that wrote, so a user who
+  has just booked or reviewed never reads their own write back from a
+  replica that is still catching up. ReplicaStickinessMiddleware keeps
+  that window in a cookie;
+- for sessions, which are written on login and read on the very next
+  request;
+- inside reading_primary(), around reads whose result is cached (the
+  request user snapshots), which would otherwise keep a replica's lag,
+  and someone else's write it has not applied yet, for as long as they
+  are cached.
+
+With no replica configured every query goes to the primary.
+"""
+import math
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_STICKY_SECONDS = 10
+STICKY_COOKIE = 'db_primary_until'
+PRIMARY_APPS = {'sessions'}
+
+
+class _Pin:
+    """Routing state of one request: reads pinned to the primary, and whether it wrote"""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+_pin = ContextVar('replica_pin', default=None)
+
+
+def pin_to_primary():
+    """Send the remaining reads of the current request (or command) to the primary"""
+    state = _pin.get()
+    if state is None:
+        state = _Pin()
+        _pin.set(state)
+    state.pinned = True
+    return state
+
+
+@contextmanager
+def reading_primary():
+    """Send the reads inside the block to the primary, for data that is cached once read"""
+    token = _pin.set(_Pin(pinned=True))
+    try:
+        yield
+    finally:
+        wrote = _pin.get().wrote
+        _pin.reset(token)
+        if wrote:
+            pin_to_primary().wrote = True
+
+
+def begin_request(pinned):
+    return _pin.set(_Pin(pinned))
+
+
+def end_request(token):
+    """Whether the request that begin_request() returned the token for has written"""
+    state = _pin.get()
+    _pin.reset(token)
+    return state.wrote
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', None)
+        if not replicas or model._meta.app_label in PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+        state = _pin.get()
+        if (state is not None and state.pinned) or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary().wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+def sticky_until(request):
+    try:
+        return float(request.COOKIES.get(STICKY_COOKIE, 0))
+    except ValueError:
+        return 0
+
+
+def sticky_seconds():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', REPLICA_STICKY_SECONDS)
+
+
+def stick(response):
+    """Keep the browser's reads on the primary for the sticky window"""
+    seconds = sticky_seconds()
+    response.set_cookie(
+        STICKY_COOKIE, str(math.ceil(time.time() + seconds)), max_age=seconds, httponly=True, samesite='Lax',
+    )
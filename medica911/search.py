@@ -0,0 +1,184 @@
+"""
+Doctor search backends.
+
+Each doctor carries a denormalized `search_document` (name, city, clinic,
+speciality and bio) that is kept up to date by the signals in signals.py.
+On Postgres that document feeds a stored tsvector and a trigram index, on
+SQLite an FTS5 table. The icontains backend is the old behaviour and is
+kept for other databases and for benchmarking.
+"""
+from django.db import connection
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+
+from .models import Doctor
+
+SEARCH_CONFIG = 'simple'
+SQLITE_FTS_TABLE = 'doctor_search'
+INDEX_BATCH_SIZE = 1000
+
+
+def build_search_document(doctor):
+    """Flatten the searchable fields of a doctor (with user and speciality) into one string"""
+    user = doctor.user
+    parts = [
+        user.first_name,
+        user.last_name,
+        user.city,
+        doctor.clinic_name,
+        doctor.speciality.name if doctor.speciality_id else None,
+        doctor.bio,
+    ]
+    return ' '.join(part.strip() for part in parts if part and part.strip())
+
+
+def search_terms(query):
+    return [term for term in query.split() if term]
+
+
+class IcontainsSearchBackend:
+    """Unindexed substring matching, every term must appear in one of the fields"""
+
+    fields = [
+        'user__first_name', 'user__last_name', 'user__city',
+        'clinic_name', 'speciality__name', 'bio',
+    ]
+
+    def search(self, queryset, query):
+        for term in search_terms(query):
+            match = Q()
+            for field in self.fields:
+                match |= Q(**{f'{field}__icontains': term})
+            queryset = queryset.filter(match)
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    def index(self, doctor_ids):
+        pass
+
+    def remove(self, doctor_ids):
+        pass
+
+
+class PostgresSearchBackend:
+    """
+    Ranked full-text search on the stored tsvector, OR'ed with trigram word
+    similarity per term so that misspelled names and cities still match.
+    Both predicates are served by GIN indexes (see migration 0002).
+    """
+
+    def search(self, queryset, query):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+
+        terms = search_terms(query)
+        if not terms:
+            return IcontainsSearchBackend().search(queryset, query)
+
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+        fuzzy = Q()
+        for term in terms:
+            fuzzy &= Q(search_document__trigram_word_similar=term)
+
+        # Cast to double precision so rank values survive a round trip through a cursor
+        rank = Cast(
+            SearchRank(F('search_vector'), search_query) + TrigramWordSimilarity(query, 'search_document'),
+            output_field=FloatField(),
+        )
+        return queryset.filter(Q(search_vector=search_query) | fuzzy).annotate(search_rank=rank)
+
+    def index(self, doctor_ids):
+        from django.contrib.postgres.search import SearchVector
+
+        Doctor.objects.filter(pk__in=doctor_ids).update(
+            search_vector=SearchVector('search_document', config=SEARCH_CONFIG)
+        )
+
+    def remove(self, doctor_ids):
+        # The vector lives on the doctors row and goes away with it
+        pass
+
+
+class SqliteSearchBackend:
+    """
+    FTS5 with the trigram tokenizer for local runs. Each term is matched
+    through its trigrams, so a doctor sharing most trigrams with a
+    misspelled term still matches and bm25 ranks closer spellings first.
+    """
+
+    def search(self, queryset, query):
+        groups = []
+        for term in search_terms(query):
+            grams = self._trigrams(term)
+            if grams:
+                groups.append('(' + ' OR '.join(grams) + ')')
+        if not groups:
+            return IcontainsSearchBackend().search(queryset, query)
+
+        match = ' AND '.join(groups)
+        table = Doctor._meta.db_table
+        return queryset.filter(
+            pk__in=RawSQL(f'SELECT rowid FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH %s', [match])
+        ).annotate(search_rank=RawSQL(
+            f'SELECT -bm25({SQLITE_FTS_TABLE}) FROM {SQLITE_FTS_TABLE} '
+            f'WHERE {SQLITE_FTS_TABLE} MATCH %s AND rowid = "{table}"."id"',
+            [match],
+            output_field=FloatField(),
+        ))
+
+    def index(self, doctor_ids):
+        rows = Doctor.objects.filter(pk__in=doctor_ids).values_list('pk', 'search_document')
+        with connection.cursor() as cursor:
+            self._delete(cursor, doctor_ids)
+            cursor.executemany(
+                f'INSERT INTO {SQLITE_FTS_TABLE} (rowid, document) VALUES (%s, %s)',
+                list(rows),
+            )
+
+    def remove(self, doctor_ids):
+        with connection.cursor() as cursor:
+            self._delete(cursor, doctor_ids)
+
+    def _delete(self, cursor, doctor_ids):
+        doctor_ids = list(doctor_ids)
+        if doctor_ids:
+            placeholders = ', '.join(['%s'] * len(doctor_ids))
+            cursor.execute(f'DELETE FROM {SQLITE_FTS_TABLE} WHERE rowid IN ({placeholders})', doctor_ids)
+
+    def _trigrams(self, term):
+        term = term.lower()
+        grams = {term[i:i + 3] for i in range(len(term) - 2)}
+        return ['"' + gram.replace('"', '""') + '"' for gram in sorted(grams)]
+
+
+SEARCH_BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SqliteSearchBackend,
+}
+
+
+def get_search_backend():
+    """Return the search backend for the default database"""
+    return SEARCH_BACKENDS.get(connection.vendor, IcontainsSearchBackend)()
+
+
+def refresh_search_index(doctor_ids=None):
+    """Rebuild search documents and the backend index for the given doctors (all if None)"""
+    doctors = Doctor.objects.select_related('user', 'speciality').order_by('pk')
+    if doctor_ids is not None:
+        doctors = doctors.filter(pk__in=doctor_ids)
+
+    backend = get_search_backend()
+    batch = []
+    for doctor in doctors.iterator(chunk_size=INDEX_BATCH_SIZE):
+        doctor.search_document = build_search_document(doctor)
+        batch.append(doctor)
+        if len(batch) >= INDEX_BATCH_SIZE:
+            _write_batch(backend, batch)
+            batch = []
+    if batch:
+        _write_batch(backend, batch)
+
+
+def _write_batch(backend, doctors):
+    Doctor.objects.bulk_update(doctors, ['search_document'])
+    backend.index([doctor.pk for doctor in doctors])
@@ -0,0 +1,171 @@
+from django.db import transaction
+from django.db.models import Subquery
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import auth_cache, availability, fragments, geo, metrics, stats
+from .models import Appointment, Doctor, DoctorAvailability, Review, Speciality, User
+from .search import get_search_backend, refresh_search_index
+
+SEARCH_FIELDS = {'clinic_name', 'bio', 'speciality', 'speciality_id'}
+USER_SEARCH_FIELDS = {'first_name', 'last_name', 'city'}
+# User columns shown in the home page's top doctor cards
+USER_FRAGMENT_FIELDS = {'first_name', 'last_name', 'city', 'profile_picture'}
+LOCATION_FIELDS = {'clinic_address'}
+USER_LOCATION_FIELDS = {'city'}
+
+
+def _touches(update_fields, fields):
+    return update_fields is None or bool(fields.intersection(update_fields))
+
+
+# --- Search index ---
+
+@receiver(post_save, sender=Doctor)
+def index_doctor(sender, instance, created, update_fields=None, **kwargs):
+    if created or _touches(update_fields, SEARCH_FIELDS):
+        refresh_search_index([instance.pk])
+
+
+@receiver(post_delete, sender=Doctor)
+def unindex_doctor(sender, instance, **kwargs):
+    get_search_backend().remove([instance.pk])
+
+
+@receiver(post_save, sender=User)
+def index_doctor_user(sender, instance, update_fields=None, **kwargs):
+    if instance.role == 'doctor' and _touches(update_fields, USER_SEARCH_FIELDS):
+        refresh_search_index(Doctor.objects.filter(user=instance).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Speciality)
+def index_speciality_doctors(sender, instance, created, **kwargs):
+    if not created:
+        refresh_search_index(instance.doctors.values_list('pk', flat=True))
+
+
+# --- Doctor locations ---
+
+@receiver(post_save, sender=Doctor)
+def locate_doctor(sender, instance, created, update_fields=None, **kwargs):
+    if created or _touches(update_fields, LOCATION_FIELDS):
+        geo.refresh_locations([instance.pk])
+
+
+@receiver(post_save, sender=User)
+def locate_doctor_user(sender, instance, update_fields=None, **kwargs):
+    if instance.role == 'doctor' and _touches(update_fields, USER_LOCATION_FIELDS):
+        geo.refresh_locations(Doctor.objects.filter(user=instance).values_list('pk', flat=True))
+
+
+# --- Slot availability cache ---
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def invalidate_appointment_day(sender, instance, **kwargs):
+    days = {(instance.doctor_id, instance.appointment_date)}
+    # A rescheduled appointment also frees its slot on the day (or doctor) it was moved from
+    stored = getattr(instance, '_stored_day', None)
+    if stored is not None and None not in stored:
+        days.add(stored)
+    instance._stored_day = (instance.doctor_id, instance.appointment_date)
+
+    def invalidate():
+        for doctor_id, day in days:
+            availability.invalidate_days(doctor_id, [day])
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=DoctorAvailability)
+@receiver(post_delete, sender=DoctorAvailability)
+def invalidate_doctor_schedule(sender, instance, **kwargs):
+    transaction.on_commit(lambda: availability.invalidate_schedule(instance.doctor_id))
+
+
+# --- Doctor rating ---
+
+@receiver(post_delete, sender=Review)
+def remove_review_rating(sender, instance, **kwargs):
+    # Also runs for reviews removed by cascade, where the appointment may not be loaded
+    doctor_id = Subquery(Appointment.objects.filter(pk=instance.appointment_id).values('doctor_id')[:1])
+    Doctor.apply_review_change(doctor_id, -instance.rating, -1)
+
+
+# --- Cached request users ---
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_user(sender, instance, **kwargs):
+    auth_cache.forget_users([instance.pk])
+
+
+@receiver(post_save, sender=Doctor)
+def forget_new_doctor_user(sender, instance, created, **kwargs):
+    # The snapshot holds the doctor profile id
+    if created:
+        auth_cache.forget_users([instance.user_id])
+
+
+@receiver(post_delete, sender=Doctor)
+def forget_doctor_user(sender, instance, **kwargs):
+    auth_cache.forget_users([instance.user_id])
+
+
+# --- Admin dashboard counters ---
+
+@receiver(post_save, sender=User)
+def count_user(sender, instance, created, **kwargs):
+    stats.user_saved(instance, created)
+
+
+@receiver(post_delete, sender=User)
+def uncount_user(sender, instance, **kwargs):
+    stats.user_deleted(instance)
+
+
+@receiver(post_save, sender=Appointment)
+def count_appointment(sender, instance, created, **kwargs):
+    stats.appointment_saved(instance, created)
+
+
+@receiver(post_delete, sender=Appointment)
+def uncount_appointment(sender, instance, **kwargs):
+    stats.appointment_deleted(instance)
+
+
+# --- Home page fragments ---
+
+def _invalidate_on_commit(*names):
+    transaction.on_commit(lambda: fragments.invalidate_fragments(*names))
+
+
+@receiver(post_save, sender=Speciality)
+@receiver(post_delete, sender=Speciality)
+def invalidate_speciality_fragments(sender, **kwargs):
+    # Top doctor cards show the speciality name too
+    _invalidate_on_commit(fragments.HOME_SPECIALITIES, fragments.HOME_TOP_DOCTORS)
+
+
+@receiver(post_save, sender=Doctor)
+@receiver(post_delete, sender=Doctor)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_top_doctors_fragment(sender, **kwargs):
+    _invalidate_on_commit(fragments.HOME_TOP_DOCTORS)
+
+
+@receiver(post_save, sender=User)
+def invalidate_doctor_user_fragment(sender, instance, update_fields=None, **kwargs):
+    # Not on the last_login update of every login
+    if instance.role == 'doctor' and _touches(update_fields, USER_FRAGMENT_FIELDS):
+        _invalidate_on_commit(fragments.HOME_TOP_DOCTORS)
+
+
+# --- Performance metrics ---
+
+@receiver(connection_created)
+def install_sql_timer(sender, connection, **kwargs):
+    # First in line, so connection.execute_wrapper() blocks still pop their own wrapper
+    if metrics.time_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, metrics.time_sql)
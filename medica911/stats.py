@@ -0,0 +1,203 @@
+"""
+Admin dashboard statistics.
+
+Totals live in StatCounter rows that signals shift by +/-1 on every user
+and appointment write, plus one counter per creation day for the
+"last 7 days" figure. Reading the dashboard is then a single query on a
+handful of rows, whatever the size of the appointments table.
+rebuild_stats() recomputes everything with conditional aggregation and
+is used to seed the counters and to repair them after bulk writes.
+
+Counters must not make concurrent bookings wait on each other, so:
+
+- deltas are applied once the writing transaction commits, each in its
+  own single-statement UPDATE, instead of holding the counter rows
+  locked until the booking commits;
+- each counter is spread over SHARDS rows ('key', 'key#1', ...) and a
+  delta goes to one picked at random, reads sum them;
+- per-day counters older than the dashboard window are deleted when the
+  first counter of a new day is created.
+"""
+import random
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Appointment, StatCounter, User
+
+RECENT_DAYS = 7
+SHARDS = 8
+INITIALIZED_KEY = 'stats:initialized'
+CREATED_PREFIX = 'appointments:created:'
+
+
+def role_key(role):
+    return f'users:{role}'
+
+
+def created_key(day):
+    return f'{CREATED_PREFIX}{day.isoformat()}'
+
+
+def first_recent_day(today):
+    """Oldest day counted in the "last 7 days" figure"""
+    return today - timedelta(days=RECENT_DAYS - 1)
+
+
+TOTAL_APPOINTMENTS_KEY = 'appointments:total'
+PENDING_APPOINTMENTS_KEY = 'appointments:pending'
+
+
+def shard_keys(key):
+    """Keys of the rows a counter is spread over"""
+    return [key] + [f'{key}#{shard}' for shard in range(1, SHARDS)]
+
+
+def read_counters(keys):
+    """{key: value} of these counters, summed over their shards, in one query"""
+    counters = {}
+    rows = StatCounter.objects.filter(key__in=[shard for key in keys for shard in shard_keys(key)])
+    for shard, value in rows.values_list('key', 'value'):
+        key = shard.partition('#')[0]
+        counters[key] = counters.get(key, 0) + value
+    return counters
+
+
+def bump(deltas):
+    """Add each delta to its counter once the current transaction commits (at once outside one)"""
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if deltas:
+        transaction.on_commit(lambda: _apply(deltas))
+
+
+def _apply(deltas):
+    for key, delta in deltas.items():
+        shard = random.choice(shard_keys(key))
+        if StatCounter.objects.filter(key=shard).update(value=F('value') + delta):
+            continue
+        try:
+            with transaction.atomic():
+                StatCounter.objects.create(key=shard, value=delta)
+        except IntegrityError:
+            # Another writer created it first
+            StatCounter.objects.filter(key=shard).update(value=F('value') + delta)
+        else:
+            if key.startswith(CREATED_PREFIX):
+                prune_days()
+
+
+def prune_days():
+    """Delete the per-day counters of days the dashboard no longer shows"""
+    # ISO dates sort as strings, and so do their shards ('...-10-10#3' < '...-10-11')
+    oldest = created_key(first_recent_day(timezone.localdate()))
+    StatCounter.objects.filter(key__startswith=CREATED_PREFIX, key__lt=oldest).delete()
+
+
+def rebuild_stats():
+    """Recompute every counter from the users and appointments tables"""
+    users = User.objects.aggregate(
+        doctors=Count('id', filter=Q(role='doctor')),
+        clients=Count('id', filter=Q(role='client')),
+        admins=Count('id', filter=Q(role='admin')),
+    )
+    appointments = Appointment.objects.aggregate(
+        total=Count('id'),
+        pending=Count('id', filter=Q(status='pending')),
+    )
+    since = timezone.now() - timedelta(days=RECENT_DAYS + 1)
+    oldest = first_recent_day(timezone.localdate())
+    per_day = (
+        Appointment.objects.filter(created_at__gte=since)
+        .annotate(day=TruncDate('created_at')).order_by()
+        .values('day').annotate(count=Count('id'))
+    )
+
+    values = {
+        role_key('doctor'): users['doctors'],
+        role_key('client'): users['clients'],
+        role_key('admin'): users['admins'],
+        TOTAL_APPOINTMENTS_KEY: appointments['total'],
+        PENDING_APPOINTMENTS_KEY: appointments['pending'],
+        INITIALIZED_KEY: 1,
+    }
+    for row in per_day:
+        if row['day'] >= oldest:
+            values[created_key(row['day'])] = row['count']
+
+    with transaction.atomic():
+        # Each counter is rewritten whole in its first shard
+        StatCounter.objects.filter(Q(key__startswith=CREATED_PREFIX) | Q(key__contains='#')).delete()
+        StatCounter.objects.bulk_create(
+            [StatCounter(key=key, value=value) for key, value in values.items()],
+            update_conflicts=True,
+            unique_fields=['key'],
+            update_fields=['value', 'updated_at'],
+        )
+    return values
+
+
+def dashboard_stats():
+    """Counters needed by the admin dashboard, read in one query"""
+    today = timezone.localdate()
+    recent_keys = [created_key(today - timedelta(days=offset)) for offset in range(RECENT_DAYS)]
+    keys = [
+        INITIALIZED_KEY, role_key('doctor'), role_key('client'),
+        TOTAL_APPOINTMENTS_KEY, PENDING_APPOINTMENTS_KEY, *recent_keys,
+    ]
+    counters = read_counters(keys)
+    if INITIALIZED_KEY not in counters:
+        counters = rebuild_stats()
+
+    return {
+        'total_doctors': counters.get(role_key('doctor'), 0),
+        'total_clients': counters.get(role_key('client'), 0),
+        'total_appointments': counters.get(TOTAL_APPOINTMENTS_KEY, 0),
+        'pending_appointments': counters.get(PENDING_APPOINTMENTS_KEY, 0),
+        'recent_appointments': sum(counters.get(key, 0) for key in recent_keys),
+    }
+
+
+# --- Deltas applied by signals.py ---
+
+def user_saved(user, created):
+    previous = None if created else getattr(user, '_stored_role', user.role)
+    if previous != user.role:
+        deltas = {role_key(user.role): 1}
+        if previous:
+            deltas[role_key(previous)] = -1
+        bump(deltas)
+    user._stored_role = user.role
+
+
+def user_deleted(user):
+    bump({role_key(user.role): -1})
+
+
+def appointment_saved(appointment, created):
+    deltas = {}
+    if created:
+        deltas[TOTAL_APPOINTMENTS_KEY] = 1
+        deltas[created_key(timezone.localdate(appointment.created_at))] = 1
+        previous = None
+    else:
+        previous = getattr(appointment, '_stored_status', appointment.status)
+    was_pending = previous == 'pending'
+    is_pending = appointment.status == 'pending'
+    if was_pending != is_pending:
+        deltas[PENDING_APPOINTMENTS_KEY] = 1 if is_pending else -1
+    bump(deltas)
+    appointment._stored_status = appointment.status
+
+
+def appointment_deleted(appointment):
+    deltas = {TOTAL_APPOINTMENTS_KEY: -1}
+    created = timezone.localdate(appointment.created_at)
+    # Older days are no longer counted, their counters may be pruned already
+    if created >= first_recent_day(timezone.localdate()):
+        deltas[created_key(created)] = -1
+    if appointment.status == 'pending':
+        deltas[PENDING_APPOINTMENTS_KEY] = -1
+    bump(deltas)
@@ -0,0 +1,367 @@
+"""
+Synthetic data for benchmarks.
+
+SyntheticDataset generates doctors with users and weekly availability,
+clients, appointments spread over a history and a booking horizon, reviews
+of completed visits and notifications. Every value comes from one
+random.Random(seed) consumed in a fixed order and primary keys are
+assigned up front, so the same seed and anchor date always give the same
+rows and no insert has to read ids back.
+
+Rows are streamed to the database in large batches: COPY FROM STDIN on
+Postgres, bulk_create elsewhere. Denormalized columns (doctor ratings,
+unread counters, search documents, dashboard counters) are filled at the
+end the same way the app maintains them.
+"""
+import csv
+import io
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, time as dtime, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+
+from .availability import SLOT_MINUTES, slot_index, slot_time
+from .geo import cell_of, geocode
+from .models import Appointment, Doctor, DoctorAvailability, Notification, Review, Speciality, User
+from .search import refresh_search_index
+from .stats import rebuild_stats
+
+PASSWORD = 'synthetic'
+
+SPECIALITIES = [
+    ('Cardiology', 'fa-heart-pulse'),
+    ('Dermatology', 'fa-allergies'),
+    ('Neurology', 'fa-brain'),
+    ('Pediatrics', 'fa-baby'),
+    ('Psychiatry', 'fa-user-nurse'),
+    ('Orthopedics', 'fa-bone'),
+    ('Ophthalmology', 'fa-eye'),
+    ('Dentistry', 'fa-tooth'),
+]
+FIRST_NAMES = [
+    'Mohamed', 'Ahmed', 'Ali', 'Youssef', 'Omar', 'Karim', 'Sami', 'Hamza', 'Mehdi', 'Anis',
+    'Amira', 'Fatma', 'Mariem', 'Sarra', 'Ines', 'Yasmine', 'Nour', 'Rania', 'Salma', 'Leila',
+]
+LAST_NAMES = [
+    'Ben Ali', 'Trabelsi', 'Gharbi', 'Jebali', 'Hammami', 'Ben Salah', 'Mejri', 'Bouazizi',
+    'Chaabane', 'Khelifi', 'Ayari', 'Sassi', 'Baccouche', 'Dridi', 'Mansouri', 'Zouari',
+]
+CITIES = [
+    'Tunis', 'Sfax', 'Sousse', 'Kairouan', 'Bizerte', 'Gabes', 'Ariana', 'Gafsa',
+    'Monastir', 'Ben Arous', 'Nabeul', 'Medenine', 'Kasserine', 'Mahdia', 'Beja', 'Tozeur',
+]
+REASONS = ['Check-up', 'Follow-up visit', 'Chest pain', 'Skin rash', 'Headaches', 'Back pain', 'Vaccination']
+COMMENTS = ['Very professional.', 'Long wait but good care.', 'Clear explanations.', 'Would recommend.', None]
+# (status, weight) of past and upcoming visits
+PAST_STATUSES = [('completed', 80), ('cancelled', 12), ('no_show', 8)]
+UPCOMING_STATUSES = [('pending', 40), ('confirmed', 50), ('cancelled', 10)]
+RATING_WEIGHTS = [3, 5, 12, 35, 45]
+# Clinics are spread this many degrees (about 10 km) around their city centre
+LOCATION_JITTER = 0.09
+
+
+@contextmanager
+def keep_timestamps(*models):
+    """Let generated created_at/updated_at values through instead of auto_now(_add) overwriting them"""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class TableWriter:
+    """Buffer generated rows of one model and insert them a batch at a time"""
+
+    def __init__(self, model, batch_size, use_copy, depends_on=()):
+        self.model = model
+        self.batch_size = batch_size
+        self.use_copy = use_copy
+        # Writers whose rows ours reference, flushed first so foreign keys are satisfied
+        self.depends_on = depends_on
+        self.rows = []
+        self.written = 0
+        self.seconds = 0.0
+
+    def add(self, **row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        for writer in self.depends_on:
+            writer.flush()
+        if not self.rows:
+            return
+        start = time.perf_counter()
+        if self.use_copy:
+            self._copy(self.rows)
+        else:
+            self.model.objects.bulk_create([self.model(**row) for row in self.rows])
+        self.seconds += time.perf_counter() - start
+        self.written += len(self.rows)
+        self.rows = []
+
+    def _copy(self, rows):
+        fields = [field for field in self.model._meta.concrete_fields if field.attname in rows[0]]
+        buffer = io.StringIO()
+        # Quoted "" is an empty string, an unquoted empty field is NULL
+        writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+        for row in rows:
+            writer.writerow([field.get_db_prep_save(row[field.attname], connection) for field in fields])
+        buffer.seek(0)
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        sql = f'COPY {connection.ops.quote_name(self.model._meta.db_table)} ({columns}) FROM STDIN WITH (FORMAT csv)'
+        with connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, 'copy_expert'):
+                # psycopg2
+                raw.copy_expert(sql, buffer)
+            else:
+                with raw.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+
+
+class SyntheticDataset:
+
+    def __init__(self, doctors=1000, clients=50000, appointments=1000000, notifications=500000,
+                 review_rate=0.4, history_days=365, future_days=30, seed=42, anchor=None,
+                 batch_size=10000, use_copy=None, prefix='synthetic'):
+        self.doctors = doctors
+        self.clients = clients
+        self.appointments = appointments
+        self.notifications = notifications
+        self.review_rate = review_rate
+        self.history_days = history_days
+        self.future_days = future_days
+        self.anchor = anchor or timezone.localdate()
+        self.batch_size = batch_size
+        self.use_copy = connection.vendor == 'postgresql' if use_copy is None else use_copy
+        self.prefix = prefix
+        self.rng = random.Random(seed)
+        # Midnight of the anchor day stands in for "now", so timestamps do not depend on when we run
+        self.now = timezone.make_aware(datetime.combine(self.anchor, dtime(0)))
+
+    def exists(self):
+        return User.objects.filter(username__startswith=f'{self.prefix}-').exists()
+
+    def generate(self, log=print):
+        """Insert the whole dataset and return {table: (rows, seconds)}"""
+        self.log = log
+        self._start_ids()
+        self.password = make_password(PASSWORD, salt=self.prefix)
+        self.writers = {}
+        with keep_timestamps(User, Doctor, DoctorAvailability, Appointment, Review, Notification):
+            specialities = self._specialities()
+            users = self._writer(User)
+            self._users(users)
+            doctors = self._writer(Doctor, users)
+            self._doctors(doctors, specialities)
+            availabilities = self._writer(DoctorAvailability, doctors)
+            self._availabilities(availabilities)
+            appointments = self._writer(Appointment, doctors)
+            reviews = self._writer(Review, appointments)
+            self._appointments(appointments, reviews)
+            notifications = self._writer(Notification, users)
+            self._notifications(notifications)
+            for writer in self.writers.values():
+                writer.flush()
+        self._reset_sequences()
+        self._denormalize()
+        return {
+            writer.model._meta.db_table: (writer.written, writer.seconds)
+            for writer in self.writers.values()
+        }
+
+    # --- Plumbing ---
+
+    def _writer(self, model, *depends_on):
+        writer = TableWriter(model, self.batch_size, self.use_copy, depends_on)
+        self.writers[model] = writer
+        return writer
+
+    def _start_ids(self):
+        self.first_id = {
+            model: (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+            for model in (User, Doctor, DoctorAvailability, Appointment, Review, Notification)
+        }
+        self.doctor_user_ids = range(self.first_id[User], self.first_id[User] + self.doctors)
+        self.client_ids = range(self.doctor_user_ids.stop, self.doctor_user_ids.stop + self.clients)
+        self.doctor_ids = range(self.first_id[Doctor], self.first_id[Doctor] + self.doctors)
+
+    def _reset_sequences(self):
+        # Explicit ids leave Postgres sequences behind
+        statements = connection.ops.sequence_reset_sql(no_style(), list(self.writers))
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+    def _moment(self, day, hour=None):
+        hour = self.rng.randint(7, 21) if hour is None else hour
+        return timezone.make_aware(datetime.combine(day, dtime(hour, self.rng.randrange(60))))
+
+    def _name(self):
+        return self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+
+    # --- Tables ---
+
+    def _specialities(self):
+        Speciality.objects.bulk_create(
+            [Speciality(name=name, icon=icon) for name, icon in SPECIALITIES], ignore_conflicts=True
+        )
+        return list(Speciality.objects.order_by('pk').values_list('pk', flat=True))
+
+    def _users(self, writer):
+        joined = self.anchor - timedelta(days=self.history_days)
+        people = [('doctor', pk, index) for index, pk in enumerate(self.doctor_user_ids)]
+        people += [('client', pk, index) for index, pk in enumerate(self.client_ids)]
+        for role, pk, index in people:
+            first_name, last_name = self._name()
+            created = self._moment(joined + timedelta(days=self.rng.randrange(self.history_days)))
+            writer.add(
+                id=pk, username=f'{self.prefix}-{role}-{index}', password=self.password,
+                email=f'{self.prefix}-{role}-{index}@example.com',
+                first_name=first_name, last_name=last_name, role=role,
+                phone=f'+216 {self.rng.randint(20, 99)} {self.rng.randint(100, 999)} {self.rng.randint(100, 999)}',
+                city=self.rng.choice(CITIES), is_active=True, is_staff=False, is_superuser=False,
+                date_joined=created, created_at=created, updated_at=created, unread_notifications=0,
+            )
+        admin_created = self._moment(joined)
+        writer.add(
+            id=self.client_ids.stop, username=f'{self.prefix}-admin', password=self.password,
+            email=f'{self.prefix}-admin@example.com', first_name='Synthetic', last_name='Admin',
+            role='admin', is_active=True, is_staff=True, is_superuser=True,
+            date_joined=admin_created, created_at=admin_created, updated_at=admin_created, unread_notifications=0,
+        )
+
+    def _doctors(self, writer, specialities):
+        for index, (pk, user_id) in enumerate(zip(self.doctor_ids, self.doctor_user_ids)):
+            created = self._moment(self.anchor - timedelta(days=self.history_days))
+            city = self.rng.choice(CITIES)
+            latitude, longitude = geocode(city)
+            latitude += self.rng.uniform(-LOCATION_JITTER, LOCATION_JITTER)
+            longitude += self.rng.uniform(-LOCATION_JITTER, LOCATION_JITTER)
+            writer.add(
+                id=pk, user_id=user_id, speciality_id=self.rng.choice(specialities),
+                license_number=f'{self.prefix.upper()}-{index:07d}',
+                experience_years=self.rng.randint(1, 35),
+                consultation_fee=Decimal(self.rng.randrange(30, 150, 5)),
+                bio=f"Practising in {city} since {self.anchor.year - self.rng.randint(1, 30)}.",
+                clinic_name=f"Clinique {self.rng.choice(LAST_NAMES)}",
+                clinic_address=f"{self.rng.randint(1, 200)} Avenue Habib Bourguiba, {city}",
+                is_available=self.rng.random() > 0.05,
+                rating=Decimal('0.00'), total_reviews=0, rating_sum=0, search_document='',
+                latitude=latitude, longitude=longitude, geo_cell=cell_of(latitude, longitude),
+                created_at=created, updated_at=created,
+            )
+
+    def _availabilities(self, writer):
+        # {doctor_id: {weekday: slot indexes}}, appointments are only booked inside these windows
+        self.schedules = {}
+        pk = self.first_id[DoctorAvailability]
+        for doctor_id in self.doctor_ids:
+            schedule = self.schedules[doctor_id] = {}
+            # Weekdays, sometimes Saturday morning too
+            days = list(range(5)) + ([5] if self.rng.random() < 0.3 else [])
+            for day in days:
+                start = dtime(self.rng.choice([8, 9]), 0)
+                end = dtime(12, 0) if day == 5 else dtime(self.rng.choice([16, 17, 18]), 0)
+                writer.add(id=pk, doctor_id=doctor_id, day_of_week=day, start_time=start, end_time=end, is_active=True)
+                schedule[day] = range(slot_index(start), (end.hour * 60 + end.minute) // SLOT_MINUTES)
+                pk += 1
+
+    def _appointments(self, writer, reviews):
+        first_day = self.anchor - timedelta(days=self.history_days)
+        days = [first_day + timedelta(days=offset) for offset in range(self.history_days + self.future_days)]
+        per_doctor, extra = divmod(self.appointments, self.doctors)
+        self.rating_totals = {}
+        pk = self.first_id[Appointment]
+        review_pk = self.first_id[Review]
+        past_statuses, past_weights = zip(*PAST_STATUSES)
+        upcoming_statuses, upcoming_weights = zip(*UPCOMING_STATUSES)
+
+        for index, doctor_id in enumerate(self.doctor_ids):
+            schedule = self.schedules[doctor_id]
+            slots = [(day, slot) for day in days for slot in schedule.get(day.weekday(), ())]
+            count = min(per_doctor + (index < extra), len(slots))
+            # Distinct slots, so the open-slot unique constraint always holds
+            for position in sorted(self.rng.sample(range(len(slots)), count)):
+                day, slot = slots[position]
+                if day < self.anchor:
+                    status = self.rng.choices(past_statuses, past_weights)[0]
+                else:
+                    status = self.rng.choices(upcoming_statuses, upcoming_weights)[0]
+                created = min(self._moment(day - timedelta(days=self.rng.randint(1, 30))), self.now)
+                writer.add(
+                    id=pk, client_id=self.client_ids[self.rng.randrange(self.clients)], doctor_id=doctor_id,
+                    appointment_date=day, appointment_time=slot_time(slot), status=status,
+                    reason=self.rng.choice(REASONS), reminder_level=0,
+                    created_at=created, updated_at=created,
+                )
+                if status == 'completed' and self.rng.random() < self.review_rate:
+                    rating = self.rng.choices(range(1, 6), RATING_WEIGHTS)[0]
+                    reviewed = min(self._moment(day + timedelta(days=self.rng.randint(0, 7))), self.now)
+                    reviews.add(
+                        id=review_pk, appointment_id=pk, rating=rating, comment=self.rng.choice(COMMENTS),
+                        created_at=reviewed, updated_at=reviewed,
+                    )
+                    total, reviews_count = self.rating_totals.get(doctor_id, (0, 0))
+                    self.rating_totals[doctor_id] = (total + rating, reviews_count + 1)
+                    review_pk += 1
+                pk += 1
+
+    def _notifications(self, writer):
+        titles = {
+            'appointment': "Appointment update",
+            'reminder': "Appointment tomorrow",
+            'system': "Welcome to Medica",
+        }
+        recipients = list(self.client_ids) + list(self.doctor_user_ids)
+        self.unread = {}
+        pk = self.first_id[Notification]
+        for _ in range(self.notifications):
+            user_id = self.rng.choice(recipients)
+            kind = self.rng.choice(list(titles))
+            # Only the last few days are still unread
+            age = self.rng.randint(0, 90)
+            is_read = age > 3 or self.rng.random() < 0.5
+            created = self.now - timedelta(days=age, minutes=self.rng.randrange(1440))
+            writer.add(
+                id=pk, user_id=user_id, notification_type=kind, title=titles[kind],
+                message="Generated notification.", is_read=is_read, created_at=created,
+            )
+            if not is_read:
+                self.unread[user_id] = self.unread.get(user_id, 0) + 1
+            pk += 1
+
+    def _denormalize(self):
+        started = time.perf_counter()
+        doctors = []
+        for doctor_id, (total, count) in self.rating_totals.items():
+            rating = (Decimal(total) / count).quantize(Decimal('0.01'), ROUND_HALF_UP)
+            doctors.append(Doctor(pk=doctor_id, rating=rating, rating_sum=total, total_reviews=count))
+        Doctor.objects.bulk_update(doctors, ['rating', 'rating_sum', 'total_reviews'], batch_size=1000)
+        User.objects.bulk_update(
+            [User(pk=user_id, unread_notifications=count) for user_id, count in self.unread.items()],
+            ['unread_notifications'], batch_size=1000,
+        )
+        refresh_search_index(list(self.doctor_ids))
+        rebuild_stats()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.log(f"ratings, counters, search index and statistics refreshed in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,122 @@
+import csv
+import io
+import json
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from medica911 import exports, views
+from medica911.forms import UserFilterForm
+from medica911.models import Appointment, Doctor, Speciality, User
+
+
+class ManageUsersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', role='admin', is_staff=True)
+        User.objects.bulk_create([
+            User(
+                username=f'client-{index:03d}', email=f'client-{index:03d}@example.com',
+                first_name=f'First{index % 7}', last_name=f'Last{index % 5}', role='client',
+                city='Sfax' if index % 3 else 'Tunis', is_active=index % 10 != 0,
+            )
+            for index in range(120)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def _walk(self, query=''):
+        """Usernames of every page, following the next cursors"""
+        usernames = []
+        url = reverse('manage_users', args=['client']) + query
+        while url:
+            response = self.client.get(url)
+            usernames += [user.username for user in response.context['users']]
+            page = response.context['page']
+            url = response.wsgi_request.path + f'?{query.lstrip("?")}&after={page.next_cursor}' if page.has_next else None
+        return usernames
+
+    def test_pages_cover_every_user_once_in_each_sort(self):
+        for sort in UserFilterForm.SORTS:
+            usernames = self._walk(f'?sort={sort}')
+            self.assertEqual(len(usernames), 120, sort)
+            self.assertEqual(len(set(usernames)), 120, sort)
+
+    def test_first_page_is_bounded(self):
+        response = self.client.get(reverse('manage_users', args=['client']))
+        self.assertEqual(len(response.context['users']), views.USERS_PER_PAGE)
+        self.assertTrue(response.context['page'].has_next)
+
+    def test_filters(self):
+        usernames = self._walk('?city=tunis&status=active&q=first1')
+        expected = User.objects.filter(
+            role='client', city='Tunis', is_active=True, first_name='First1'
+        ).values_list('username', flat=True)
+        self.assertEqual(sorted(usernames), sorted(expected))
+
+    def test_requires_admin(self):
+        self.client.force_login(User.objects.get(username='client-001'))
+        response = self.client.get(reverse('export_users', args=['client']))
+        self.assertEqual(response.status_code, 302)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', role='admin', is_staff=True)
+        cls.patient = User.objects.create_user(
+            'patient', role='client', first_name='=HYPERLINK("x")', phone='+216 20 123 456', city='Tunis'
+        )
+        doctor_user = User.objects.create_user('doc', role='doctor')
+        doctor = Doctor.objects.create(
+            user=doctor_user, speciality=Speciality.objects.create(name='Cardiology'), license_number='L-1'
+        )
+        Appointment.objects.create(
+            client=cls.patient, doctor=doctor, appointment_date='2026-03-02', appointment_time='09:00',
+            status='confirmed', reason='Check-up',
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def _body(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_users_csv(self):
+        response = self.client.get(reverse('export_users', args=['client']) + '?format=csv')
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="clients-', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(self._body(response))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['username'], 'patient')
+        # Formulas are neutralised, phone numbers are left alone
+        self.assertEqual(rows[0]['first_name'], '\'=HYPERLINK("x")')
+        self.assertEqual(rows[0]['phone'], '+216 20 123 456')
+
+    def test_users_export_applies_filters(self):
+        response = self.client.get(reverse('export_users', args=['client']) + '?city=Sfax')
+        self.assertEqual(len(self._body(response).splitlines()), 1)
+
+    def test_appointments_ndjson(self):
+        response = self.client.get(reverse('export_appointments') + '?format=ndjson&status=confirmed')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in self._body(response).splitlines()]
+        self.assertEqual(rows, [{
+            'id': Appointment.objects.get().pk, 'date': '2026-03-02', 'time': '09:00:00', 'status': 'confirmed',
+            'client': 'patient', 'doctor': 'doc', 'speciality': 'Cardiology', 'reason': 'Check-up',
+            'created_at': rows[0]['created_at'],
+        }])
+        response = self.client.get(reverse('export_appointments') + '?format=ndjson&status=cancelled')
+        self.assertEqual(self._body(response), '')
+
+    def test_keyset_pages_without_server_side_cursors(self):
+        User.objects.bulk_create([User(username=f'extra-{index}', role='client') for index in range(7)])
+        clients = User.objects.filter(role='client').order_by('-date_joined', '-id')
+        expected = list(clients.values_list('username'))
+        with mock.patch.dict(connection.settings_dict, DISABLE_SERVER_SIDE_CURSORS=True), \
+                mock.patch.object(exports, 'EXPORT_CHUNK_SIZE', 3), self.assertNumQueries(3):
+            rows = list(exports.export_rows(clients, ['username']))
+        self.assertEqual(rows, expected)
@@ -0,0 +1,62 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage.fallback import FallbackStorage
+
+from medica911.decorators import client_required, doctor_required
+from medica911.models import Doctor, Speciality, User
+
+
+class AsyncDecoratorTests(TestCase):
+    def _request(self, user):
+        request = RequestFactory().get('/')
+        request.session = {}
+        request._messages = FallbackStorage(request)
+
+        async def auser():
+            return user
+        request.auser = auser
+        request.user = None
+        return request
+
+    async def test_async_view_stays_async(self):
+        @client_required
+        async def view(request):
+            return HttpResponse('ok')
+
+        client = await User.objects.acreate(username='async-client', role='client')
+        response = await view(self._request(client))
+        self.assertEqual(response.content, b'ok')
+
+    async def test_async_view_redirects(self):
+        @doctor_required
+        async def view(request):
+            return HttpResponse('ok')
+
+        response = await view(self._request(AnonymousUser()))
+        self.assertEqual(response.url, '/login/')
+        client = await User.objects.acreate(username='async-client', role='client')
+        response = await view(self._request(client))
+        self.assertEqual(response.url, '/dashboard/')
+
+
+class AsyncReadViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.speciality = Speciality.objects.create(name='Cardiology')
+        user = User.objects.create_user('async-doctor', first_name='Amel', role='doctor', city='Sfax')
+        cls.doctor = Doctor.objects.create(user=user, speciality=cls.speciality, license_number='ASYNC-1')
+
+    async def test_public_pages(self):
+        for url in ['/', '/doctors/browse/', f'/doctors/{self.doctor.pk}/']:
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+
+    async def test_browse_filters_by_speciality(self):
+        response = await self.async_client.get('/doctors/browse/', {'speciality': self.speciality.pk})
+        self.assertEqual(list(response.context['doctors']), [self.doctor])
+        self.assertContains(response, f'<option value="{self.speciality.pk}" selected>Cardiology</option>')
+
+    async def test_browse_ignores_unknown_speciality(self):
+        response = await self.async_client.get('/doctors/browse/', {'speciality': 'nope'})
+        self.assertEqual(list(response.context['doctors']), [self.doctor])
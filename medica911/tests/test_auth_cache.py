@@ -0,0 +1,86 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from medica911 import auth_cache, notifications
+from medica911.models import Doctor, Notification, User
+
+
+# The test cache is local memory, shared by the single test process
+@override_settings(AUTH_USER_SNAPSHOTS=True)
+class CachedAuthTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('amira', password='secret', role='doctor', first_name='Amira')
+        self.doctor = Doctor.objects.create(user=self.user, license_number='LIC-1')
+        self.client.force_login(self.user)
+
+    def _request_user(self):
+        return self.client.get(reverse('dashboard')).wsgi_request.user
+
+    def test_warm_requests_run_no_queries(self):
+        self._request_user()
+        with self.assertNumQueries(0):
+            user = self._request_user()
+            # The role decorators and the navbar only read snapshot columns
+            self.assertTrue(user.is_doctor)
+            self.assertEqual((user.get_full_name(), user.unread_notifications), ('Amira', 0))
+            self.assertEqual(user.doctor_profile_id, self.doctor.pk)
+        with self.assertNumQueries(1):
+            self.assertIsNone(user.address)
+
+    def test_saves_replace_the_snapshot(self):
+        self._request_user()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Amina'
+            self.user.save()
+        self.assertEqual(self._request_user().first_name, 'Amina')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notifications.notify([
+                Notification(user=self.user, notification_type='system', title='Hello', message='...')
+            ])
+        self.assertEqual(self._request_user().unread_notifications, 1)
+
+    def test_password_change_ends_the_session(self):
+        self._request_user()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('changed')
+            self.user.save()
+        self.assertFalse(self._request_user().is_authenticated)
+
+    def test_deactivated_users_are_logged_out(self):
+        self._request_user()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertFalse(self._request_user().is_authenticated)
+
+    def test_superuser_without_doctor_profile(self):
+        admin = User.objects.create_superuser('root', password='secret')
+        self.client.force_login(admin)
+        self.assertEqual(self.client.get(reverse('doctor_profile_edit')).status_code, 404)
+
+    def test_full_save_of_a_snapshot_user_leaves_other_columns(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(phone='+216 20 123 456')
+        user = self._request_user()
+        with self.captureOnCommitCallbacks(execute=True):
+            user.first_name = 'Amina'
+            user.save()
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.first_name, self.user.phone), ('Amina', '+216 20 123 456'))
+
+
+class LocalCacheTests(TestCase):
+    def test_per_process_caches_load_the_user_every_request(self):
+        cache.clear()
+        user = User.objects.create_user('amira', role='client')
+        self.client.force_login(user)
+        with override_settings(AUTH_USER_SNAPSHOTS=None):
+            self.assertFalse(auth_cache.snapshots_enabled())
+            for _ in range(2):
+                request_user = self.client.get(reverse('notification_list')).wsgi_request.user
+                # Loaded whole by django.contrib.auth, not restored from a snapshot
+                self.assertEqual((request_user.pk, request_user.get_deferred_fields()), (user.pk, set()))
+        self.assertIsNone(cache.get(auth_cache._key(user.pk)))
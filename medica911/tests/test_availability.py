@@ -0,0 +1,78 @@
+from datetime import time, timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from medica911 import availability
+from medica911.models import Appointment, Doctor, DoctorAvailability, User
+
+
+class AvailabilityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = Doctor.objects.create(
+            user=User.objects.create_user('doc', role='doctor'), license_number='LIC-1',
+        )
+        self.client_user = User.objects.create_user('amira', role='client')
+        today = timezone.localdate()
+        # A Monday at least a week ahead
+        self.monday = today + timedelta(days=7 - today.weekday())
+
+    def _free(self, day):
+        return availability.free_slots(self.doctor.pk, day, day)[day]
+
+    def _book(self, slot, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Appointment.objects.create(
+                client=self.client_user, doctor=self.doctor,
+                appointment_date=self.monday, appointment_time=slot, **fields,
+            )
+
+    def test_windows_make_the_weekly_template(self):
+        self.assertEqual(len(self._free(self.monday)), 20)  # the default 08:00 - 18:00
+
+        with self.captureOnCommitCallbacks(execute=True):
+            DoctorAvailability.objects.create(
+                doctor=self.doctor, day_of_week=0, start_time=time(9, 0), end_time=time(10, 15),
+            )
+        self.assertEqual(self._free(self.monday), [time(9, 0), time(9, 30)])
+        # No window on Tuesday
+        self.assertEqual(self._free(self.monday + timedelta(days=1)), [])
+        self.assertEqual(availability.slot_choices(self.doctor.pk), [time(9, 0), time(9, 30)])
+
+    def test_bookings_and_cancellations_update_the_cached_day(self):
+        self.assertIn(time(10, 0), self._free(self.monday))
+        appointment = self._book(time(10, 0))
+        self.assertNotIn(time(10, 0), self._free(self.monday))
+        self.assertFalse(availability.is_slot_free(self.doctor.pk, self.monday, time(10, 0)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment.status = 'cancelled'
+            appointment.save()
+        self.assertIn(time(10, 0), self._free(self.monday))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._book(time(10, 0)).delete()
+        self.assertIn(time(10, 0), self._free(self.monday))
+
+    def test_rescheduling_frees_the_old_day(self):
+        tuesday = self.monday + timedelta(days=1)
+        self._free(tuesday)
+        appointment = Appointment.objects.get(pk=self._book(time(10, 0)).pk)
+        self.assertNotIn(time(10, 0), self._free(self.monday))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment.appointment_date = tuesday
+            appointment.save()
+        self.assertIn(time(10, 0), self._free(self.monday))
+        self.assertNotIn(time(10, 0), self._free(tuesday))
+
+    def test_warm_days_run_no_queries(self):
+        self._free(self.monday)
+        with self.assertNumQueries(0):
+            self._free(self.monday)
+
+    def test_past_days_offer_nothing(self):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        self.assertEqual(self._free(yesterday), [])
@@ -0,0 +1,55 @@
+from datetime import date
+
+from django.test import TestCase
+
+from medica911 import benchmarks
+from medica911.synthetic import SyntheticDataset
+
+
+class BenchmarkHarnessTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        SyntheticDataset(
+            doctors=2, clients=4, appointments=60, notifications=10, history_days=30, future_days=5,
+            anchor=date(2026, 1, 15), prefix=benchmarks.BENCHMARK_PREFIX,
+        ).generate(log=lambda message: None)
+
+    def test_every_route_is_measured_or_skipped_with_a_reason(self):
+        actors = benchmarks.Actors()
+        measured = {name for name, path, method in actors.paths()}
+        for name in benchmarks.route_names():
+            self.assertTrue(name in measured or name in benchmarks.SKIPPED, name)
+
+    def test_run_records_every_role(self):
+        results = benchmarks.run_benchmarks(
+            benchmarks.Actors(), requests=2, warmup=0, only=['doctor_detail', 'client_dashboard']
+        )
+        self.assertEqual(len(results), 2 * len(benchmarks.ROLES))
+        self.assertEqual(results['client_dashboard [client]']['status'], 200)
+        self.assertEqual(results['client_dashboard [anonymous]']['status'], 302)
+        self.assertGreater(results['doctor_detail [anonymous]']['queries'], 0)
+
+
+class CompareTests(TestCase):
+    baseline = {
+        'index [anonymous]': {'status': 200, 'queries': 2, 'p50_ms': 10.0, 'memory_kib': 100.0},
+    }
+
+    def _result(self, **changes):
+        return {'index [anonymous]': {**self.baseline['index [anonymous]'], **changes}}
+
+    def test_within_threshold(self):
+        self.assertEqual(benchmarks.compare(self.baseline, self._result(p50_ms=12.0, memory_kib=150.0)), [])
+
+    def test_extra_query_is_a_regression(self):
+        self.assertEqual(len(benchmarks.compare(self.baseline, self._result(queries=3))), 1)
+
+    def test_slower_beyond_threshold(self):
+        self.assertEqual(len(benchmarks.compare(self.baseline, self._result(p50_ms=20.0))), 1)
+
+    def test_noise_floor_on_fast_views(self):
+        baseline = {'index [anonymous]': {**self.baseline['index [anonymous]'], 'p50_ms': 1.0}}
+        self.assertEqual(benchmarks.compare(baseline, self._result(p50_ms=2.5)), [])
+
+    def test_new_routes_are_not_regressions(self):
+        self.assertEqual(benchmarks.compare({}, self._result(queries=50)), [])
@@ -0,0 +1,91 @@
+from datetime import time, timedelta
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from medica911 import availability
+from medica911.booking import SlotUnavailable, book_slot
+from medica911.models import Appointment, Doctor, User
+
+
+class BookSlotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = Doctor.objects.create(
+            user=User.objects.create_user('doc', role='doctor'), license_number='LIC-1',
+        )
+        self.first = User.objects.create_user('amira', role='client')
+        self.second = User.objects.create_user('sami', role='client')
+        # Doctors without a schedule are open 08:00 - 18:00 every day
+        self.day = timezone.localdate() + timedelta(days=7)
+        self.slot = time(10, 0)
+
+    def test_the_slot_goes_to_the_first_booking(self):
+        appointment = book_slot(self.first, self.doctor, self.day, self.slot)
+        self.assertEqual(appointment.status, 'pending')
+
+        with self.assertRaises(SlotUnavailable) as caught:
+            book_slot(self.second, self.doctor, self.day, self.slot)
+        alternatives = caught.exception.alternatives
+        self.assertEqual(len(alternatives), 3)
+        self.assertNotIn((self.day, self.slot), alternatives)
+        # The nearest free slots come first
+        self.assertIn((self.day, time(9, 30)), alternatives)
+        self.assertIn((self.day, time(10, 30)), alternatives)
+        self.assertEqual(Appointment.objects.filter(doctor=self.doctor).count(), 1)
+
+    def test_the_constraint_rejects_a_second_active_booking(self):
+        Appointment.objects.create(
+            client=self.first, doctor=self.doctor, appointment_date=self.day, appointment_time=self.slot,
+        )
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Appointment.objects.create(
+                client=self.second, doctor=self.doctor, appointment_date=self.day, appointment_time=self.slot,
+            )
+
+    def test_cancelled_appointments_release_the_slot(self):
+        appointment = book_slot(self.first, self.doctor, self.day, self.slot)
+        appointment.status = 'cancelled'
+        appointment.save()
+
+        rebooked = book_slot(self.second, self.doctor, self.day, self.slot)
+        self.assertEqual(rebooked.client, self.second)
+        self.assertEqual(
+            list(Appointment.objects.filter(doctor=self.doctor).values_list('status', flat=True).order_by('pk')),
+            ['cancelled', 'pending'],
+        )
+
+    def test_a_rebooked_slot_cannot_be_reactivated(self):
+        appointment = book_slot(self.first, self.doctor, self.day, self.slot)
+        appointment.status = 'cancelled'
+        appointment.save()
+        book_slot(self.second, self.doctor, self.day, self.slot)
+
+        self.client.force_login(self.doctor.user)
+        response = self.client.post(reverse('update_appointment', args=[appointment.pk]), {'status': 'confirmed'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(
+            response.context['form'], 'status', "This time slot has been booked again since the cancellation.",
+        )
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.status, 'cancelled')
+
+    def test_losing_the_race_answers_409_with_alternatives(self):
+        self.client.force_login(self.second)
+        # The cached bitmap still shows the slot free: the other booking committed after it was read
+        self.assertTrue(availability.is_slot_free(self.doctor.pk, self.day, self.slot))
+        Appointment.objects.bulk_create([Appointment(
+            client=self.first, doctor=self.doctor, appointment_date=self.day, appointment_time=self.slot,
+        )])
+
+        response = self.client.post(reverse('book_appointment', args=[self.doctor.pk]), {
+            'appointment_date': self.day.isoformat(), 'appointment_time': '10:00', 'reason': 'Check-up',
+        })
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(len(response.context['alternatives']), 3)
+        self.assertFalse(Appointment.objects.filter(client=self.second).exists())
+        # The stale day was dropped from the cache
+        self.assertFalse(availability.is_slot_free(self.doctor.pk, self.day, self.slot))
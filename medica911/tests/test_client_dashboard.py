@@ -0,0 +1,68 @@
+from datetime import time, timedelta
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from medica911.models import Appointment, Doctor, Review, User
+from medica911.views import APPOINTMENTS_PER_PAGE
+
+
+class ClientDashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = Doctor.objects.create(
+            user=User.objects.create_user('doc', role='doctor', first_name='Amira'), license_number='LIC-1',
+        )
+        cls.client_user = User.objects.create_user('sami', role='client')
+        today = timezone.localdate()
+        # Two visits a day, so equal dates are ordered by time then id
+        Appointment.objects.bulk_create([
+            Appointment(
+                client=cls.client_user, doctor=cls.doctor, status='completed',
+                appointment_date=today - timedelta(days=index // 2), appointment_time=time(9 + index % 2),
+                diagnosis=f'Diagnosis {index}',
+            )
+            for index in range(APPOINTMENTS_PER_PAGE + 5)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.client_user)
+
+    def test_pages_follow_each_other(self):
+        response = self.client.get(reverse('client_dashboard'))
+        first = response.context['appointments']
+        self.assertEqual(len(first), APPOINTMENTS_PER_PAGE)
+        self.assertEqual(response.context['total_appointments'], APPOINTMENTS_PER_PAGE + 5)
+        self.assertEqual(
+            [(a.appointment_date, a.appointment_time) for a in first],
+            sorted(((a.appointment_date, a.appointment_time) for a in first), reverse=True),
+        )
+
+        response = self.client.get(reverse('client_dashboard'), {'after': response.context['page'].next_cursor})
+        second = response.context['appointments']
+        self.assertEqual(len(second), 5)
+        self.assertFalse(response.context['page'].has_next)
+        self.assertEqual(
+            {a.pk for a in first} | {a.pk for a in second},
+            set(Appointment.objects.values_list('pk', flat=True)),
+        )
+
+    def test_rows_show_review_links_without_details(self):
+        appointment = Appointment.objects.order_by('-appointment_date', '-appointment_time').first()
+        Review.objects.create(appointment=appointment, rating=5)
+        response = self.client.get(reverse('client_dashboard'))
+        # Reviewed visits no longer offer a review, the others do
+        self.assertContains(response, 'btn-primary">Leave', count=APPOINTMENTS_PER_PAGE - 1)
+        self.assertNotContains(response, reverse('add_review', args=[appointment.pk]))
+        self.assertNotContains(response, 'Diagnosis')
+
+    def test_details_are_loaded_on_demand(self):
+        appointment = Appointment.objects.order_by('pk').first()
+        response = self.client.get(reverse('appointment_detail', args=[appointment.pk]))
+        self.assertContains(response, 'Diagnosis 0')
+        self.assertContains(response, 'Dr. Amira')
+
+        other = User.objects.create_user('other', role='client')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse('appointment_detail', args=[appointment.pk])).status_code, 404)
@@ -0,0 +1,31 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from medica import database
+
+
+class ConnectionSettingsTests(SimpleTestCase):
+    def test_modes(self):
+        self.assertEqual(database.connection_settings('per-request')['CONN_MAX_AGE'], 0)
+        persistent = database.connection_settings('persistent', conn_max_age=60)
+        self.assertEqual((persistent['CONN_MAX_AGE'], persistent['CONN_HEALTH_CHECKS']), (60, True))
+        pool = database.connection_settings('pool', pool_min_size=1, pool_max_size=4)
+        self.assertEqual(pool['CONN_MAX_AGE'], 0)
+        self.assertEqual(pool['OPTIONS'], {'pool': {'min_size': 1, 'max_size': 4}})
+        with self.assertRaises(ValueError):
+            database.connection_settings('pooled')
+
+    def test_pgbouncer_mode(self):
+        with mock.patch.object(database, 'find_spec', return_value=None):
+            settings = database.connection_settings('pgbouncer')
+        self.assertTrue(settings['DISABLE_SERVER_SIDE_CURSORS'])
+        self.assertEqual(settings['OPTIONS'], {})
+        with mock.patch.object(database, 'find_spec', return_value=object()):
+            self.assertEqual(database.connection_settings('pgbouncer')['OPTIONS'], {'prepare_threshold': None})
+
+    def test_asgi_default_mode(self):
+        with mock.patch.object(database, 'find_spec', return_value=object()):
+            self.assertEqual(database.asgi_default_mode(), 'pool')
+        with mock.patch.object(database, 'find_spec', return_value=None):
+            self.assertEqual(database.asgi_default_mode(), 'per-request')
@@ -0,0 +1,59 @@
+from datetime import date, time
+
+from django.test import TestCase
+from django.urls import reverse
+
+from medica911.models import Appointment, Doctor, User
+
+
+class DoctorCalendarTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = Doctor.objects.create(
+            user=User.objects.create_user('doc', role='doctor'), license_number='LIC-1',
+        )
+        other = Doctor.objects.create(user=User.objects.create_user('other', role='doctor'), license_number='LIC-2')
+        client = User.objects.create_user('sami', role='client', first_name='Sami', phone='+216 20 000 000')
+        visits = [
+            (cls.doctor, date(2026, 3, 2), 'confirmed'),   # Monday
+            (cls.doctor, date(2026, 3, 4), 'pending'),
+            (cls.doctor, date(2026, 3, 4), 'cancelled'),   # Not on the calendar
+            (cls.doctor, date(2026, 3, 9), 'pending'),     # Next week
+            (cls.doctor, date(2026, 2, 27), 'confirmed'),  # Previous month
+            (other, date(2026, 3, 3), 'pending'),
+        ]
+        Appointment.objects.bulk_create([
+            Appointment(
+                client=client, doctor=doctor, appointment_date=day, status=status,
+                appointment_time=time(9 + index), reason='Check-up',
+            )
+            for index, (doctor, day, status) in enumerate(visits)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.doctor.user)
+
+    def _feed(self, **params):
+        return self.client.get(reverse('doctor_calendar_feed'), params).json()
+
+    def test_week_window(self):
+        feed = self._feed(view='week', date='2026-03-04')
+        self.assertEqual((feed['start'], feed['end']), ('2026-03-02', '2026-03-08'))
+        self.assertEqual((feed['previous'], feed['next']), ('2026-02-23', '2026-03-09'))
+        self.assertEqual([visit['date'] for visit in feed['appointments']], ['2026-03-02', '2026-03-04'])
+        self.assertEqual(feed['appointments'][0]['client'], {'name': 'Sami', 'phone': '+216 20 000 000'})
+
+    def test_day_and_month_windows(self):
+        self.assertEqual(len(self._feed(view='day', date='2026-03-04')['appointments']), 1)
+        feed = self._feed(view='month', date='2026-03-15')
+        self.assertEqual((feed['start'], feed['end'], feed['next']), ('2026-03-01', '2026-03-31', '2026-04-01'))
+        self.assertEqual(len(feed['appointments']), 3)
+
+    def test_bad_parameters_fall_back_to_the_current_week(self):
+        feed = self._feed(view='year', date='not-a-date')
+        self.assertEqual(feed['view'], 'week')
+
+    def test_dashboard_lists_the_window(self):
+        response = self.client.get(reverse('doctor_dashboard'), {'view': 'week', 'date': '2026-03-04'})
+        self.assertEqual(len(response.context['upcoming_appointments']), 2)
+        self.assertEqual(response.context['total_appointments'], 5)
@@ -0,0 +1,80 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from medica911 import events, notifications
+from medica911.models import Notification, User
+
+
+class EventStreamTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('stream-user', role='client')
+
+    def _notify(self, title):
+        return notifications.notify([
+            Notification(user=self.user, notification_type='system', title=title, message='...')
+        ])[0]
+
+    def test_encode(self):
+        event = events.Event('notification', {'title': 'Hi'}, id=7)
+        self.assertEqual(event.encode(), 'id: 7\nevent: notification\ndata: {"title":"Hi"}\n\n')
+
+    def test_live_notifications_are_streamed(self):
+        async def scenario():
+            stream = events.stream(self.user.pk, heartbeat=0.05)
+            self.assertTrue((await anext(stream)).startswith('retry:'))
+            pending = asyncio.ensure_future(anext(stream))
+            await asyncio.sleep(0)
+            notification = await sync_to_async(self._notify)('Confirmed')
+            chunk = await asyncio.wait_for(pending, 1)
+            await stream.aclose()
+            return notification, chunk
+
+        notification, chunk = asyncio.run(scenario())
+        self.assertTrue(chunk.startswith(f'id: {notification.pk}\nevent: notification\n'))
+        self.assertIn('"title":"Confirmed"', chunk)
+
+    def test_reconnect_replays_missed_notifications(self):
+        first = self._notify('First')
+        self._notify('Second')
+        self._notify('Third')
+
+        async def scenario():
+            stream = events.stream(self.user.pk, last_event_id=first.pk, heartbeat=0.05)
+            chunks = [await anext(stream) for _ in range(4)]
+            await stream.aclose()
+            return chunks
+
+        retry, second, third, heartbeat = asyncio.run(scenario())
+        self.assertIn('Second', second)
+        self.assertIn('Third', third)
+        self.assertEqual(heartbeat, ': heartbeat\n\n')
+
+    def test_slow_subscriber_is_dropped(self):
+        async def scenario():
+            broker = events.InProcessBroker()
+            subscription = broker.subscribe('user:1', maxsize=2)
+            for index in range(3):
+                broker.publish('user:1', events.Event('notification', id=index))
+            await asyncio.sleep(0)
+            return subscription
+
+        self.assertTrue(asyncio.run(scenario()).overflowed)
+
+
+class StreamEndpointTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('stream-user', role='client'))
+
+    def test_wsgi_requests_get_no_stream(self):
+        # The test client goes through the WSGI handler, which would never finish an endless stream
+        response = self.client.get(reverse('notification_stream'))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(response.streaming)
+
+    def test_pages_open_the_stream_only_when_enabled(self):
+        self.assertNotContains(self.client.get(reverse('notification_list')), 'EventSource(')
+        with override_settings(LIVE_NOTIFICATIONS=True):
+            self.assertContains(self.client.get(reverse('notification_list')), 'EventSource(')
@@ -0,0 +1,111 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.test import TestCase
+from django.urls import reverse
+
+from medica911 import fragments
+from medica911.models import Doctor, Speciality, User
+
+
+class DoctorCardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        speciality = Speciality.objects.create(name='Cardiology')
+        self.doctors = [
+            Doctor.objects.create(
+                user=User.objects.create_user(f'doc-{index}', role='doctor', first_name=f'Doc{index}'),
+                speciality=speciality, license_number=f'LIC-{index}',
+            )
+            for index in range(3)
+        ]
+
+    def _browse(self):
+        with mock.patch.object(fragments, 'render_to_string', wraps=fragments.render_to_string) as render:
+            response = self.client.get(reverse('browse_doctors'))
+        rendered = {call.args[1]['doctor'].pk for call in render.call_args_list}
+        return response, rendered
+
+    def test_cards_are_rendered_once_and_reused(self):
+        response, rendered = self._browse()
+        self.assertEqual(rendered, {doctor.pk for doctor in self.doctors})
+        self.assertContains(response, 'Dr. Doc1')
+        response, rendered = self._browse()
+        self.assertEqual(rendered, set())
+        self.assertContains(response, 'Dr. Doc1')
+        self.assertContains(response, 'overflow-hidden result-card', count=3)
+
+    def test_editing_a_doctor_only_misses_its_card(self):
+        self._browse()
+        user = self.doctors[1].user
+        user.first_name = 'Renamed'
+        user.save()
+        response, rendered = self._browse()
+        self.assertEqual(rendered, {self.doctors[1].pk})
+        self.assertContains(response, 'Dr. Renamed')
+
+    def test_rating_changes_miss_the_card(self):
+        self._browse()
+        Doctor.apply_review_change(self.doctors[0].pk, 5, 1)
+        _, rendered = self._browse()
+        self.assertEqual(rendered, {self.doctors[0].pk})
+
+
+class HomeFragmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.speciality = Speciality.objects.create(name='Cardiology')
+        self.doctor = Doctor.objects.create(
+            user=User.objects.create_user('doc', role='doctor', first_name='Amira'),
+            speciality=self.speciality, license_number='LIC-1',
+        )
+
+    def _versions(self):
+        return fragments.fragment_versions(fragments.HOME_SPECIALITIES, fragments.HOME_TOP_DOCTORS)
+
+    def _bumped(self, write):
+        before = self._versions()
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        after = self._versions()
+        return {name for name in before if before[name] != after[name]}
+
+    def test_warm_home_page_runs_no_queries(self):
+        self.client.get(reverse('index'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Dr. Amira')
+
+    def test_only_missing_fragments_load_their_rows(self):
+        self.client.get(reverse('index'))
+        version = self._versions()[fragments.HOME_TOP_DOCTORS]
+        cache.delete(make_template_fragment_key(fragments.HOME_TOP_DOCTORS, [version]))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Dr. Amira')
+        self.assertContains(response, 'Cardiology')
+
+    def test_writes_bump_the_fragments_they_show_in(self):
+        self.speciality.name = 'Cardiologie'
+        self.assertEqual(
+            self._bumped(self.speciality.save), {fragments.HOME_SPECIALITIES, fragments.HOME_TOP_DOCTORS},
+        )
+        self.doctor.is_available = False
+        self.assertEqual(self._bumped(self.doctor.save), {fragments.HOME_TOP_DOCTORS})
+        self.doctor.user.first_name = 'Amina'
+        self.assertEqual(self._bumped(self.doctor.user.save), {fragments.HOME_TOP_DOCTORS})
+
+    def test_logins_keep_the_fragments(self):
+        self.doctor.user.set_password('secret')
+        self.doctor.user.save()
+        self.assertEqual(self._bumped(lambda: self.client.login(username='doc', password='secret')), set())
+        self.doctor.user.unread_notifications = 3
+        self.assertEqual(self._bumped(lambda: self.doctor.user.save(update_fields=['unread_notifications'])), set())
+
+    def test_stale_fragments_are_rendered_again(self):
+        self.client.get(reverse('index'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctor.user.first_name = 'Amina'
+            self.doctor.user.save()
+        self.assertContains(self.client.get(reverse('index')), 'Dr. Amina')
@@ -0,0 +1,64 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from medica911 import geo
+from medica911.models import Doctor, Speciality, User
+
+
+class GeocodeTests(TestCase):
+    def test_matches_names_and_aliases_without_accents(self):
+        self.assertEqual(geo.geocode('GABÈS'), geo.geocode('gabes'))
+        self.assertEqual(geo.geocode('Houmt Souk'), geo.geocode('Djerba'))
+        self.assertIsNone(geo.geocode('Paris', ''))
+
+    def test_the_address_city_comes_last(self):
+        self.assertEqual(geo.find_city('12 Rue de Tunis, Sfax')[0], 'Sfax')
+        self.assertEqual(geo.find_city('Nowhere street', 'Sousse')[0], 'Sousse')
+
+    def test_the_cells_cover_the_bounding_box(self):
+        latitude, longitude = geo.geocode('Tunis')
+        box = geo.bounding_box(latitude, longitude, 25)
+        cells = geo.cells_in(box)
+        for corner in [(box[0], box[2]), (box[0], box[3]), (box[1], box[2]), (box[1], box[3])]:
+            self.assertIn(geo.cell_of(*corner), cells)
+        self.assertIsNone(geo.cells_in(geo.bounding_box(latitude, longitude, 2000)))
+
+
+class NearbyDoctorsTests(TestCase):
+    def setUp(self):
+        speciality = Speciality.objects.create(name='Cardiology')
+        self.doctors = {}
+        for index, (city, address) in enumerate([
+            ('Tunis', None), ('Ariana', 'Avenue de la Liberte, Ariana'), ('Sfax', None), ('', 'Rue inconnue'),
+        ]):
+            user = User.objects.create_user(f'doc-{index}', role='doctor', first_name=f'Doc{index}', city=city)
+            self.doctors[city] = Doctor.objects.create(
+                user=user, speciality=speciality, license_number=f'LIC-{index}', clinic_address=address,
+            )
+
+    def test_doctors_are_located_when_saved(self):
+        tunis = Doctor.objects.get(pk=self.doctors['Tunis'].pk)
+        self.assertEqual((tunis.latitude, tunis.longitude), geo.geocode('Tunis'))
+        self.assertEqual(tunis.geo_cell, geo.cell_of(tunis.latitude, tunis.longitude))
+        self.assertIsNone(Doctor.objects.get(pk=self.doctors[''].pk).latitude)
+
+        user = self.doctors['Tunis'].user
+        user.city = 'Gafsa'
+        user.save(update_fields=['city'])
+        self.assertEqual(Doctor.objects.get(pk=tunis.pk).latitude, geo.geocode('Gafsa')[0])
+
+    def test_nearby_sorts_by_distance_within_the_radius(self):
+        doctors = geo.nearby(Doctor.objects.all(), *geo.geocode('Ariana'), 25).order_by('distance')
+        self.assertEqual([doctor.pk for doctor in doctors], [self.doctors['Ariana'].pk, self.doctors['Tunis'].pk])
+        self.assertAlmostEqual(doctors[1].distance, 6.4, places=0)
+        self.assertEqual(geo.nearby(Doctor.objects.all(), *geo.geocode('Sfax'), 300).count(), 3)
+
+    def test_browse_near_a_city(self):
+        response = self.client.get(reverse('browse_doctors'), {'near': 'ariana', 'radius': 10})
+        self.assertContains(response, 'overflow-hidden result-card', count=2)
+        self.assertContains(response, 'km away', count=2)
+        content = response.content.decode()
+        self.assertLess(content.index('Dr. Doc1'), content.index('Dr. Doc0'))
+
+        response = self.client.get(reverse('browse_doctors'), {'near': 'Atlantis'})
+        self.assertContains(response, 'Unknown city')
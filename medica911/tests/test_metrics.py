@@ -0,0 +1,85 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.test import TestCase, override_settings
+
+from medica911 import metrics
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.REGISTRY = self.registry = metrics.Registry()
+        self.addCleanup(setattr, metrics, 'REGISTRY', metrics.Registry())
+
+    def _histogram(self, name, view):
+        histograms, _ = metrics.merge([self.registry.snapshot()])
+        return histograms[name][view]
+
+    def test_request_is_recorded_under_its_url_name(self):
+        self.client.get('/doctors/browse/')
+        counts, total = self._histogram('medica_request_sql_queries', 'browse_doctors')
+        self.assertEqual(sum(counts), 1)
+        self.assertGreater(total, 0)
+        _, template_seconds = self._histogram('medica_request_template_duration_seconds', 'browse_doctors')
+        self.assertGreater(template_seconds, 0)
+
+    @override_settings(DEBUG=True)
+    def test_metrics_endpoint(self):
+        self.client.get('/doctors/browse/')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'medica_requests_total{view="browse_doctors",status="200"} 1')
+        self.assertContains(response, 'medica_request_duration_seconds_count{view="browse_doctors"} 1')
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        response = self.client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN=None, DEBUG=False)
+    def test_metrics_are_private_without_a_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    def test_snapshots_of_several_processes_are_summed(self):
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS_DIR=directory):
+            for _ in range(2):
+                # Each registry stands for one worker process
+                worker = metrics.Registry()
+                worker.observe_request('index', 200, 0.02, metrics.RequestStats())
+                worker.maybe_flush(force=True)
+            text = metrics.render_prometheus(metrics.collect())
+        self.assertIn('medica_requests_total{view="index",status="200"} 2', text)
+        self.assertIn('medica_request_duration_seconds_bucket{view="index",le="0.025"} 2', text)
+
+    def test_files_of_stopped_processes_are_dropped(self):
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS_DIR=directory):
+            stopped = metrics.Registry()
+            stopped.observe_request('index', 200, 0.02, metrics.RequestStats())
+            stopped.maybe_flush(force=True)
+            # Named after a process that has exited
+            exited = subprocess.Popen([sys.executable, '-c', ''])
+            exited.wait()
+            path = os.path.join(directory, f'{exited.pid}-1.json')
+            os.replace(stopped._path, path)
+            with open(f'{path}.1.tmp', 'w') as handle:
+                json.dump(stopped.snapshot(), handle)
+            text = metrics.render_prometheus(metrics.collect())
+            self.assertEqual(os.listdir(directory), [os.path.basename(metrics.REGISTRY._path)])
+        self.assertNotIn('view="index"', text)
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_logged(self):
+        with self.assertLogs('medica911.performance', 'WARNING') as logs:
+            self.client.get('/doctors/browse/')
+        self.assertIn('Slow request GET /doctors/browse/ (browse_doctors)', logs.output[0])
+
+    def test_duplicate_signatures(self):
+        stats = metrics.RequestStats()
+        for user_id in (1, 2, 3):
+            stats.record_query('SELECT * FROM users WHERE id = %s', 0.001)
+        stats.record_query('SELECT * FROM doctors', 0.001)
+        self.assertEqual(stats.duplicates(), [(3, 'SELECT * FROM users WHERE id = %s')])
@@ -0,0 +1,70 @@
+from unittest import mock
+
+from django.db.models import QuerySet
+from django.test import TestCase
+
+from medica911 import notifications
+from medica911.models import Notification, User
+
+
+class NotificationServiceTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', role='client')
+        self.bob = User.objects.create_user('bob', role='client')
+
+    def _notification(self, user, title='Hello'):
+        return Notification(user=user, notification_type='system', title=title, message='...')
+
+    def test_notify_creates_rows_and_bumps_counters(self):
+        with self.assertNumQueries(5):
+            # BEGIN, bulk INSERT, one UPDATE per distinct increment, COMMIT
+            notifications.notify([
+                self._notification(self.alice),
+                self._notification(self.alice),
+                self._notification(self.bob),
+            ])
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual(self.alice.unread_notifications, 2)
+        self.assertEqual(self.bob.unread_notifications, 1)
+        self.assertEqual(Notification.objects.count(), 3)
+
+    def test_full_save_keeps_concurrent_increments(self):
+        stale = User.objects.get(pk=self.alice.pk)
+        notifications.notify([self._notification(self.alice)])
+        stale.first_name = 'Alice'
+        stale.save()
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.unread_notifications, 1)
+        self.assertEqual(self.alice.first_name, 'Alice')
+
+    def test_mark_all_read(self):
+        notifications.notify([self._notification(self.alice) for _ in range(3)])
+        self.assertEqual(notifications.mark_all_read(self.alice), 3)
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.unread_notifications, 0)
+        self.assertFalse(Notification.objects.filter(user=self.alice, is_read=False).exists())
+
+    def test_mark_all_read_keeps_concurrent_notifications(self):
+        notifications.notify([self._notification(self.alice) for _ in range(2)])
+        real_update = QuerySet.update
+
+        def update(queryset, **kwargs):
+            updated = real_update(queryset, **kwargs)
+            if queryset.model is Notification:
+                # Another request notifies Alice between the two UPDATEs
+                notifications.notify([self._notification(self.alice, 'Late')])
+            return updated
+
+        with mock.patch.object(QuerySet, 'update', update):
+            self.assertEqual(notifications.mark_all_read(self.alice), 2)
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.unread_notifications, 1)
+        self.assertEqual(Notification.objects.filter(user=self.alice, is_read=False).count(), 1)
+
+    def test_mark_read_decrements(self):
+        created = notifications.notify([self._notification(self.alice) for _ in range(3)])
+        self.alice.refresh_from_db()
+        notifications.mark_read(self.alice, [created[0].pk, created[0].pk, created[1].pk])
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.unread_notifications, 1)
@@ -0,0 +1,131 @@
+import csv
+import io
+from datetime import time
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+
+from medica911.models import Doctor, DoctorAvailability, Speciality, User
+from medica911.onboarding import ChunkWriter, InvalidImportFile, import_doctors
+from medica911.stats import read_counters, role_key
+
+HEADER = 'email,first_name,last_name,license_number,speciality,city,consultation_fee,availability\n'
+
+
+def csv_file(*rows):
+    return io.StringIO(HEADER + ''.join(row + '\n' for row in rows))
+
+
+class ImportDoctorsTests(TestCase):
+    def test_creates_users_doctors_specialities_and_schedules(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            report = import_doctors(csv_file(
+                'amira@example.com,Amira,Trabelsi,LIC-1,Cardiology,Tunis,60,"mon 08:00-12:00; mon 14:00-18:00"',
+                'sami@example.com,Sami,Gharbi,LIC-2,Neurology,Sfax,,',
+            ), chunk_size=1)
+        self.assertEqual((report.rows, report.created_doctors, report.errors), (2, 2, []))
+        self.assertEqual(report.created_specialities, 2)
+        doctor = Doctor.objects.select_related('user', 'speciality').get(license_number='LIC-1')
+        self.assertEqual(doctor.user.username, 'amira@example.com')
+        self.assertEqual(doctor.user.role, 'doctor')
+        self.assertFalse(doctor.user.has_usable_password())
+        self.assertEqual(doctor.speciality.name, 'Cardiology')
+        self.assertIn('cardiology', doctor.search_document.lower())
+        self.assertAlmostEqual(doctor.latitude, 36.8065)
+        self.assertEqual(
+            list(doctor.availabilities.values_list('day_of_week', 'start_time')),
+            [(0, time(8)), (0, time(14))],
+        )
+        self.assertEqual(read_counters([role_key('doctor')]), {role_key('doctor'): 2})
+
+    def test_updates_existing_doctors(self):
+        user = User.objects.create_user('amira', email='Amira@Example.com', role='doctor')
+        placeholder = Doctor.objects.create(user=user, license_number=f'PENDING-{user.pk}')
+        DoctorAvailability.objects.create(doctor=placeholder, day_of_week=4, start_time=time(9), end_time=time(10))
+
+        report = import_doctors(csv_file('amira@example.com,Amira,Trabelsi,LIC-1,,Tunis,80,tue 09:00-17:00'))
+        self.assertEqual((report.updated_users, report.updated_doctors, report.created_doctors), (1, 1, 0))
+        placeholder.refresh_from_db()
+        self.assertEqual(placeholder.license_number, 'LIC-1')
+        self.assertEqual(placeholder.consultation_fee, 80)
+        self.assertEqual(list(placeholder.availabilities.values_list('day_of_week', flat=True)), [1])
+
+        # Importing the file again changes nothing
+        report = import_doctors(csv_file('amira@example.com,Amira,Trabelsi,LIC-1,,Tunis,80,tue 09:00-17:00'))
+        self.assertEqual((report.updated_doctors, Doctor.objects.count()), (1, 1))
+
+    def test_empty_columns_keep_stored_values(self):
+        user = User.objects.create_user('amira', email='amira@example.com', role='doctor', phone='+216 20', city='Sousse')
+        Doctor.objects.create(
+            user=user, license_number='LIC-1', clinic_name='Clinique du Lac', bio='Cardiologist', consultation_fee=70,
+        )
+        import_doctors(csv_file('amira@example.com,Amira,Trabelsi,LIC-1,,,,'))
+        doctor = Doctor.objects.select_related('user').get(license_number='LIC-1')
+        self.assertEqual((doctor.user.phone, doctor.user.city), ('+216 20', 'Sousse'))
+        self.assertEqual((doctor.clinic_name, doctor.bio, doctor.consultation_fee), ('Clinique du Lac', 'Cardiologist', 70))
+        self.assertEqual(doctor.latitude, 35.8256)
+
+    def test_reports_bad_rows_and_keeps_the_rest(self):
+        User.objects.create_user('client', email='client@example.com', role='client')
+        other = User.objects.create_user('other', email='other@example.com', role='doctor')
+        Doctor.objects.create(user=other, license_number='TAKEN')
+        report = import_doctors(csv_file(
+            'not-an-email,A,B,LIC-1,,,,',
+            'ok@example.com,Ok,Doc,LIC-2,,,,',
+            'ok@example.com,Again,Doc,LIC-3,,,,',
+            'client@example.com,C,D,LIC-4,,,,',
+            'new@example.com,E,F,TAKEN,,,,',
+            'late@example.com,G,H,LIC-5,,,,fri 18:00-09:00',
+        ), chunk_size=2)
+        self.assertEqual(report.created_doctors, 1)
+        lines = [line for line, _ in report.errors]
+        self.assertEqual(lines, [2, 4, 5, 6, 7])
+        self.assertIn('already on line 3', report.errors[1][1])
+        self.assertIn('client account', report.errors[2][1])
+        self.assertIn('another doctor', report.errors[3][1])
+
+    def test_dry_run_writes_nothing(self):
+        report = import_doctors(csv_file('amira@example.com,Amira,Trabelsi,LIC-1,Cardiology,,,'), dry_run=True)
+        self.assertEqual(report.created_doctors, 1)
+        self.assertFalse(Doctor.objects.exists())
+        self.assertFalse(Speciality.objects.exists())
+
+    def test_missing_columns(self):
+        with self.assertRaises(InvalidImportFile):
+            import_doctors(io.StringIO('email,first_name\n'))
+
+    def test_malformed_lines_stop_the_import(self):
+        too_long = 'x' * (csv.field_size_limit() + 1)
+        with self.assertRaisesMessage(InvalidImportFile, 'Line 3'):
+            import_doctors(csv_file('amira@example.com,Amira,Trabelsi,LIC-1,,,,', f'{too_long},,,,,,,'), chunk_size=1)
+        self.assertTrue(Doctor.objects.filter(license_number='LIC-1').exists())
+
+
+class ImportDoctorsViewTests(TestCase):
+    def test_upload(self):
+        self.client.force_login(User.objects.create_user('admin', role='admin'))
+        upload = SimpleUploadedFile(
+            'doctors.csv', ('﻿' + HEADER + 'amira@example.com,Amira,Trabelsi,LIC-1,,,,\n').encode()
+        )
+        response = self.client.post(reverse('import_doctors'), {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['report'].created_doctors, 1)
+        self.assertTrue(Doctor.objects.filter(license_number='LIC-1').exists())
+
+    def test_a_concurrent_import_is_reported(self):
+        self.client.force_login(User.objects.create_user('admin', role='admin'))
+        match = ChunkWriter._match
+
+        def racing(writer, chunk):
+            rows = match(writer, chunk)
+            # Another import creates the same doctor after this one matched its rows
+            User.objects.create_user('amira@example.com', email='amira@example.com', role='doctor')
+            return rows
+
+        upload = SimpleUploadedFile('doctors.csv', (HEADER + 'amira@example.com,Amira,Trabelsi,LIC-1,,,,\n').encode())
+        with mock.patch.object(ChunkWriter, '_match', racing):
+            response = self.client.post(reverse('import_doctors'), {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('another import', response.context['form'].errors['file'][0])
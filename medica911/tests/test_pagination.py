@@ -0,0 +1,51 @@
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+
+from medica911.models import Doctor, User
+from medica911.views import DOCTORS_PER_PAGE
+
+
+class BrowseDoctorsPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Only two ratings and one first name, so most rows tie on everything but their id
+        for index in range(2 * DOCTORS_PER_PAGE + 3):
+            Doctor.objects.create(
+                user=User.objects.create_user(f'doc-{index}', role='doctor', first_name='Doc'),
+                license_number=f'LIC-{index}', rating=Decimal('4.50') if index % 3 else Decimal('3.00'),
+            )
+
+    def _page(self, **params):
+        response = self.client.get(reverse('browse_doctors'), params)
+        return response, response.context['page']
+
+    def test_pages_list_every_doctor_once(self):
+        response, page = self._page()
+        self.assertFalse(page.has_previous)
+        self.assertNotContains(response, 'before=')
+        pages = [[doctor.pk for doctor in page]]
+        while page.has_next:
+            response, page = self._page(after=page.next_cursor)
+            pages.append([doctor.pk for doctor in page])
+        self.assertNotContains(response, 'after=')
+
+        self.assertEqual([len(pks) for pks in pages], [DOCTORS_PER_PAGE, DOCTORS_PER_PAGE, 3])
+        listed = [pk for pks in pages for pk in pks]
+        self.assertEqual(listed, list(
+            Doctor.objects.order_by('-rating', 'user__first_name', 'id').values_list('pk', flat=True)
+        ))
+
+        # Walking back gives the same pages
+        for expected in reversed(pages[:-1]):
+            response, page = self._page(before=page.previous_cursor)
+            self.assertEqual([doctor.pk for doctor in page], expected)
+        self.assertFalse(page.has_previous)
+
+    def test_bad_cursors_show_the_first_page(self):
+        _, first = self._page()
+        # Not base64, a list of the wrong length, values of the wrong types
+        for cursor in ('not-a-cursor', 'WzFd', 'WyJ4IiwieSIsInoiXQ'):
+            _, page = self._page(after=cursor)
+            self.assertEqual([doctor.pk for doctor in page], [doctor.pk for doctor in first])
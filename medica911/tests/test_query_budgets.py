@@ -0,0 +1,228 @@
+"""
+Query-count budgets.
+
+Renders every view that lists rows with 1, 10 and 100 of them and fails
+when the number of queries changes with the size of the list, which is
+how an N+1 (a template reaching for a relation per row) shows up. The
+failure lists the statements that ran more often on the bigger list.
+The cache is cleared before each render so cached fragments cannot hide
+the queries behind them.
+"""
+import re
+from collections import Counter
+from datetime import time, timedelta
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from medica911 import events, urls
+from medica911.models import Appointment, Doctor, Notification, Review, Speciality, User
+from medica911.search import refresh_search_index
+
+SIZES = (1, 10, 100)
+DOCTOR_CARD = 'overflow-hidden result-card'
+SLOTS_PER_DAY = 20
+
+# Views without a list whose length depends on the data
+NO_LISTS = {
+    'signup', 'login', 'logout', 'metrics', 'dashboard', 'profile_edit', 'mark_notifications_read',
+    'doctor_profile_edit', 'update_appointment', 'appointment_detail', 'add_review', 'import_doctors',
+}
+
+
+def statement_shape(sql):
+    """SQL with its literals and IN lists collapsed, so repeats of one lookup count as one statement"""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(?:\.\d+)?\b', '?', sql)
+    return re.sub(r'IN \((?:\?, )*\?\)', 'IN (...)', sql)
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.speciality = Speciality.objects.create(name='Cardiology')
+        cls.admin = User.objects.create_user('budget-admin', role='admin', is_staff=True)
+        cls.client_user = User.objects.create_user('budget-client', role='client', first_name='Cli')
+        doctor_user = User.objects.create_user('budget-doctor', role='doctor', first_name='Doc')
+        cls.doctor = Doctor.objects.create(
+            user=doctor_user, speciality=cls.speciality, license_number='BUDGET-0', rating=5
+        )
+        # Monday of this week, so the doctor's week calendar shows every generated visit
+        today = timezone.localdate()
+        cls.monday = today - timedelta(days=today.weekday())
+
+    def assertConstantQueries(self, url, add_rows, login=None, row_marker=None):
+        """
+        Render url after add_rows(start, count) grew its list to each of SIZES and compare query counts.
+        With row_marker, also check that the page lists more rows (occurrences of the marker) as they grow
+        """
+        if login is not None:
+            self.client.force_login(login)
+        # Lazily created state (stat counters, cache versions) is set up once, outside the measurements
+        self.client.get(url)
+        rendered = {}
+        listed = []
+        previous = 0
+        for size in SIZES:
+            add_rows(previous, size - previous)
+            previous = size
+            cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(url)
+                if response.streaming:
+                    # Streamed rows are only queried while the body is consumed
+                    b''.join(response.streaming_content)
+            self.assertEqual(response.status_code, 200, url)
+            rendered[size] = [query['sql'] for query in captured]
+            if row_marker is not None:
+                listed.append(response.content.decode().count(row_marker))
+
+        if row_marker is not None:
+            self.assertEqual(listed, sorted(set(listed)), f"{url} does not list the added rows: {listed}")
+
+        counts = {size: len(statements) for size, statements in rendered.items()}
+        if len(set(counts.values())) > 1:
+            smallest = Counter(map(statement_shape, rendered[SIZES[0]]))
+            largest = Counter(map(statement_shape, rendered[SIZES[-1]]))
+            grown = [
+                f"  {smallest[sql]}x -> {count}x {sql}"
+                for sql, count in largest.most_common() if count > smallest[sql]
+            ]
+            self.fail(
+                f"{url} runs {', '.join(f'{count} queries for {size} rows' for size, count in counts.items())}:\n"
+                + '\n'.join(grown)
+            )
+
+    # --- Row factories, each adds `count` rows numbered from `start` ---
+
+    def add_doctors(self, start, count):
+        users = User.objects.bulk_create([
+            User(username=f'budget-doctor-{index}', first_name=f'Doc{index}', role='doctor', city='Tunis')
+            for index in range(start, start + count)
+        ])
+        doctors = Doctor.objects.bulk_create([
+            Doctor(user=user, speciality=self.speciality, license_number=f'BUDGET-{start + index + 1}', rating=4)
+            for index, user in enumerate(users)
+        ])
+        # bulk_create() sends no signals, index them as saving them one by one would
+        refresh_search_index([doctor.pk for doctor in doctors])
+
+    def _appointments(self, start, count, **fields):
+        appointments = []
+        for index in range(start, start + count):
+            slot = index % SLOTS_PER_DAY
+            appointments.append(Appointment(
+                client=self.client_user, doctor=self.doctor,
+                appointment_date=self.monday + timedelta(days=index // SLOTS_PER_DAY),
+                appointment_time=time(8 + slot // 2, 30 * (slot % 2)), **fields,
+            ))
+        return Appointment.objects.bulk_create(appointments)
+
+    def add_open_appointments(self, start, count):
+        self._appointments(start, count, status='confirmed')
+
+    def add_reviewed_appointments(self, start, count):
+        appointments = self._appointments(start, count, status='completed')
+        Review.objects.bulk_create([Review(appointment=appointment, rating=5) for appointment in appointments])
+
+    def add_notifications(self, start, count):
+        Notification.objects.bulk_create([
+            Notification(user=self.client_user, notification_type='system', title=f'Hello {index}', message='...')
+            for index in range(start, start + count)
+        ])
+
+    def add_clients(self, start, count):
+        User.objects.bulk_create([
+            User(username=f'budget-client-{index}', role='client') for index in range(start, start + count)
+        ])
+
+    # --- Views ---
+
+    def test_index(self):
+        self.assertConstantQueries(reverse('index'), self.add_doctors)
+
+    def test_browse_doctors(self):
+        self.assertConstantQueries(reverse('browse_doctors'), self.add_doctors, row_marker=DOCTOR_CARD)
+
+    def test_browse_doctors_search(self):
+        self.assertConstantQueries(
+            reverse('browse_doctors') + '?name=doc', self.add_doctors, row_marker=DOCTOR_CARD
+        )
+
+    def test_doctor_detail(self):
+        self.assertConstantQueries(reverse('doctor_detail', args=[self.doctor.pk]), self.add_reviewed_appointments)
+
+    def test_book_appointment(self):
+        self.assertConstantQueries(
+            reverse('book_appointment', args=[self.doctor.pk]), self.add_open_appointments, login=self.client_user
+        )
+
+    def test_doctor_slots(self):
+        self.assertConstantQueries(reverse('doctor_slots', args=[self.doctor.pk]), self.add_open_appointments)
+
+    def test_client_dashboard(self):
+        self.assertConstantQueries(
+            reverse('client_dashboard'), self.add_reviewed_appointments, login=self.client_user
+        )
+
+    def test_doctor_dashboard(self):
+        self.assertConstantQueries(
+            reverse('doctor_dashboard'), self.add_open_appointments, login=self.doctor.user
+        )
+
+    def test_doctor_calendar_feed(self):
+        self.assertConstantQueries(
+            reverse('doctor_calendar_feed'), self.add_open_appointments, login=self.doctor.user
+        )
+
+    def test_notification_list(self):
+        self.assertConstantQueries(reverse('notification_list'), self.add_notifications, login=self.client_user)
+
+    def test_notification_stream(self):
+        # The test client goes through WSGI, which gets a 204, so the catch-up of a reconnecting
+        # ASGI stream is measured directly. It replays the notifications missed since Last-Event-ID
+        async def catch_up():
+            chunks = []
+            stream = events.stream(self.client_user.pk, last_event_id=0, heartbeat=0)
+            async for chunk in stream:
+                if chunk.startswith(': heartbeat'):
+                    break
+                chunks.append(chunk)
+            await stream.aclose()
+            return chunks
+
+        counts = {}
+        previous = 0
+        for size in SIZES:
+            self.add_notifications(previous, size - previous)
+            previous = size
+            # async_to_sync runs the async ORM calls on this thread, inside the test transaction
+            with CaptureQueriesContext(connection) as captured:
+                chunks = async_to_sync(catch_up)()
+            self.assertEqual(len(chunks), size + 1)
+            counts[size] = len(captured)
+        self.assertEqual(len(set(counts.values())), 1, f"the stream catch-up runs {counts} queries")
+
+    def test_admin_dashboard(self):
+        self.assertConstantQueries(reverse('admin_dashboard'), self.add_open_appointments, login=self.admin)
+
+    def test_manage_users(self):
+        self.assertConstantQueries(reverse('manage_users', args=['client']), self.add_clients, login=self.admin)
+
+    def test_export_users(self):
+        self.assertConstantQueries(reverse('export_users', args=['client']), self.add_clients, login=self.admin)
+
+    def test_export_appointments(self):
+        self.assertConstantQueries(
+            reverse('export_appointments') + '?format=ndjson', self.add_reviewed_appointments, login=self.admin
+        )
+
+    def test_every_listing_view_has_a_budget(self):
+        tested = {name[len('test_'):] for name in dir(self) if name.startswith('test_')}
+        for pattern in urls.urlpatterns:
+            self.assertTrue(pattern.name in tested or pattern.name in NO_LISTS, pattern.name)
@@ -0,0 +1,155 @@
+"""
+Query-plan regression tests.
+
+Seeds a synthetic dataset big enough for the planner to prefer indexes,
+then EXPLAINs the main query of each view and fails on a full table scan
+of the table it reads. Works on Postgres (no "Seq Scan on <table>") and
+SQLite (no bare "SCAN <table>").
+"""
+import re
+from datetime import date, datetime, time, timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from medica911.models import Appointment, Doctor, Notification, Review, Speciality, User
+
+DOCTORS = 300
+CLIENTS = 3000
+APPOINTMENTS = 30000
+NOTIFICATIONS = 20000
+SLOTS_PER_DAY = 20
+
+
+def seed_dataset():
+    specialities = Speciality.objects.bulk_create(
+        [Speciality(name=f'Speciality {index}') for index in range(10)]
+    )
+    doctor_users = User.objects.bulk_create([
+        User(username=f'plan-doctor-{index}', first_name=f'Doc{index % 97}', role='doctor')
+        for index in range(DOCTORS)
+    ])
+    doctors = Doctor.objects.bulk_create([
+        Doctor(
+            user=user,
+            speciality=specialities[index % len(specialities)],
+            license_number=f'PLAN-{index}',
+            # Most doctors are listed, a few are on leave
+            is_available=index % 10 != 0,
+            rating=(index % 50) / 10,
+        )
+        for index, user in enumerate(doctor_users)
+    ])
+    clients = User.objects.bulk_create([
+        User(username=f'plan-client-{index}', role='client') for index in range(CLIENTS)
+    ])
+
+    # History is mostly completed, only recent rows are still open
+    start = date(2024, 1, 1)
+    appointments = []
+    for index in range(APPOINTMENTS):
+        slot = index // DOCTORS
+        day = start + timedelta(days=slot // SLOTS_PER_DAY)
+        appointments.append(Appointment(
+            client=clients[(index * 7) % CLIENTS],
+            doctor=doctors[index % DOCTORS],
+            appointment_date=day,
+            appointment_time=time(8 + (slot % SLOTS_PER_DAY) // 2, 30 * (slot % 2)),
+            status='pending' if index > APPOINTMENTS * 0.97 else ('cancelled' if index % 13 == 0 else 'completed'),
+        ))
+    Appointment.objects.bulk_create(appointments, batch_size=2000)
+
+    Notification.objects.bulk_create([
+        Notification(
+            user=clients[index % CLIENTS],
+            notification_type='appointment',
+            title='Appointment update',
+            message='Your appointment was updated.',
+            is_read=index % 5 != 0,
+        )
+        for index in range(NOTIFICATIONS)
+    ], batch_size=2000)
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return doctors, clients
+
+
+class QueryPlanTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctors, cls.clients = seed_dataset()
+        cls.doctor = cls.doctors[1]
+        cls.client_user = cls.clients[1]
+
+    def assertNoFullScan(self, queryset, table):
+        plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            full_scan = re.search(rf'Seq Scan on {table}\b', plan)
+        else:
+            full_scan = re.search(rf'\bSCAN {table}\b(?! USING)', plan)
+        self.assertIsNone(full_scan, f"Full scan of {table}:\n{plan}\n\n{queryset.query}")
+
+    def test_browse_doctors_first_page(self):
+        doctors = (
+            Doctor.objects.filter(is_available=True).select_related('user', 'speciality')
+            .order_by('-rating', 'user__first_name', 'id')[:13]
+        )
+        self.assertNoFullScan(doctors, 'doctors')
+
+    def test_index_top_doctors(self):
+        doctors = Doctor.objects.filter(is_available=True).order_by('-rating')[:4]
+        self.assertNoFullScan(doctors, 'doctors')
+
+    def test_client_dashboard_history(self):
+        appointments = (
+            Appointment.objects.filter(client=self.client_user)
+            .select_related('doctor__user', 'doctor__speciality', 'review')
+            .order_by('-appointment_date', '-appointment_time', '-id')[:21]
+        )
+        self.assertNoFullScan(appointments, 'appointments')
+
+    def test_doctor_calendar_window(self):
+        appointments = Appointment.objects.filter(
+            doctor=self.doctor,
+            appointment_date__range=(date(2024, 1, 1), date(2024, 1, 7)),
+            status__in=['pending', 'confirmed'],
+        ).select_related('client').order_by('appointment_date', 'appointment_time')
+        self.assertNoFullScan(appointments, 'appointments')
+
+    def test_doctor_slot_bookings(self):
+        appointments = Appointment.objects.filter(
+            doctor=self.doctor, appointment_date__range=(date(2024, 1, 1), date(2024, 1, 14))
+        ).exclude(status='cancelled').values_list('appointment_date', 'appointment_time')
+        self.assertNoFullScan(appointments, 'appointments')
+
+    def test_admin_latest_appointments(self):
+        appointments = Appointment.objects.select_related(
+            'client', 'doctor__user', 'doctor__speciality'
+        ).order_by('-created_at')[:5]
+        self.assertNoFullScan(appointments, 'appointments')
+
+    def test_recent_appointments_window(self):
+        since = timezone.make_aware(datetime.now() - timedelta(days=7))
+        self.assertNoFullScan(Appointment.objects.filter(created_at__gte=since), 'appointments')
+
+    def test_pending_appointments(self):
+        self.assertNoFullScan(Appointment.objects.filter(status='pending'), 'appointments')
+
+    def test_open_appointments_by_date(self):
+        appointments = Appointment.objects.filter(
+            appointment_date=date(2024, 3, 1), status__in=['pending', 'confirmed']
+        ).order_by('appointment_date', 'appointment_time')
+        self.assertNoFullScan(appointments, 'appointments')
+
+    def test_doctor_detail_reviews(self):
+        reviews = Review.objects.filter(appointment__doctor=self.doctor).select_related('appointment__client')
+        self.assertNoFullScan(reviews, 'appointments')
+
+    def test_unread_notifications(self):
+        notifications = Notification.objects.filter(
+            user=self.client_user, is_read=False
+        ).order_by('-created_at')[:10]
+        self.assertNoFullScan(notifications, 'notifications')
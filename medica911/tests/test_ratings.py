@@ -0,0 +1,85 @@
+from datetime import time, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Count, Sum
+from django.test import TestCase
+from django.utils import timezone
+
+from medica911.models import Appointment, Doctor, Review, User
+
+
+class IncrementalRatingTests(TestCase):
+    def setUp(self):
+        self.doctor = Doctor.objects.create(
+            user=User.objects.create_user('doc', role='doctor'), license_number='LIC-1',
+        )
+        self.client_user = User.objects.create_user('amira', role='client')
+        self.visits = 0
+
+    def _review(self, rating):
+        self.visits += 1
+        appointment = Appointment.objects.create(
+            client=self.client_user, doctor=self.doctor, status='completed',
+            appointment_date=timezone.localdate() - timedelta(days=self.visits), appointment_time=time(10, 0),
+        )
+        return Review.objects.create(appointment=appointment, rating=rating)
+
+    def assertMatchesRecompute(self):
+        self.doctor.refresh_from_db()
+        totals = Review.objects.filter(appointment__doctor=self.doctor).aggregate(
+            total=Sum('rating', default=0), count=Count('id'),
+        )
+        average = (
+            (Decimal(totals['total']) / totals['count']).quantize(Decimal('0.01'), ROUND_HALF_UP)
+            if totals['count'] else Decimal('0.00')
+        )
+        self.assertEqual(
+            (self.doctor.rating_sum, self.doctor.total_reviews, self.doctor.rating),
+            (totals['total'], totals['count'], average),
+        )
+
+    def test_new_reviews(self):
+        for rating in (5, 4, 4):
+            self._review(rating)
+        self.assertMatchesRecompute()
+        self.assertEqual(self.doctor.rating, Decimal('4.33'))
+
+    def test_edits_apply_the_difference(self):
+        self._review(5)
+        review = Review.objects.get(pk=self._review(2).pk)
+        review.rating = 3
+        review.save()
+        # Saving again without a change must not count it twice
+        review.save()
+        self.assertMatchesRecompute()
+        self.assertEqual(self.doctor.rating, Decimal('4.00'))
+
+    def test_deletes(self):
+        first = self._review(5)
+        self._review(2)
+        first.delete()
+        self.assertMatchesRecompute()
+        self.assertEqual(self.doctor.rating, Decimal('2.00'))
+
+        # Deleting the appointment removes its review by cascade
+        Appointment.objects.filter(doctor=self.doctor).delete()
+        self.assertMatchesRecompute()
+        self.assertEqual((self.doctor.total_reviews, self.doctor.rating), (0, Decimal('0.00')))
+
+    def test_a_stale_doctor_save_keeps_the_rating(self):
+        stale = Doctor.objects.get(pk=self.doctor.pk)
+        self._review(4)
+        stale.bio = 'Cardiologist'
+        stale.save()
+        self.assertMatchesRecompute()
+        self.assertEqual((self.doctor.total_reviews, self.doctor.bio), (1, 'Cardiologist'))
+
+    def test_reconcile_repairs_drift(self):
+        self._review(4)
+        Doctor.objects.filter(pk=self.doctor.pk).update(rating_sum=40, total_reviews=3, rating=Decimal('1.00'))
+        output = StringIO()
+        call_command('reconcile_ratings', stdout=output)
+        self.assertIn('Repaired 1', output.getvalue())
+        self.assertMatchesRecompute()
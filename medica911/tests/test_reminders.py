@@ -0,0 +1,63 @@
+import asyncio
+from datetime import datetime, time, timedelta
+
+from django.test import TransactionTestCase
+
+from medica911.models import Appointment, Doctor, Notification, User
+from medica911.reminders import run_reminders
+
+NOW = datetime(2030, 5, 6, 9, 15)
+
+
+class ReminderTests(TransactionTestCase):
+    # Batches are written on worker threads, so the rows have to be committed
+    def setUp(self):
+        doctor_user = User.objects.create_user('reminder-doctor', role='doctor')
+        self.doctor = Doctor.objects.create(user=doctor_user, license_number='REM-1')
+        self.client_user = User.objects.create_user('reminder-client', role='client')
+
+    def _appointment(self, start, status='confirmed'):
+        return Appointment.objects.create(
+            client=self.client_user, doctor=self.doctor,
+            appointment_date=start.date(), appointment_time=start.time(), status=status,
+        )
+
+    def _run(self, now=NOW):
+        return asyncio.run(run_reminders(now=now, batch_size=2))
+
+    def test_each_reminder_is_sent_once(self):
+        soon = self._appointment(NOW + timedelta(minutes=45))
+        tomorrow = self._appointment(NOW + timedelta(hours=23, minutes=45))
+        self._appointment(NOW + timedelta(hours=30))
+        self._appointment(NOW + timedelta(hours=2), status='cancelled')
+        self._appointment(NOW - timedelta(hours=1))
+
+        self.assertEqual(self._run(), {2: 1, 1: 1})
+        self.assertEqual(self._run(), {2: 0, 1: 0})
+
+        soon.refresh_from_db()
+        tomorrow.refresh_from_db()
+        self.assertEqual((soon.reminder_level, tomorrow.reminder_level), (2, 1))
+        self.assertEqual(Notification.objects.filter(notification_type='reminder').count(), 2)
+        self.client_user.refresh_from_db()
+        self.assertEqual(self.client_user.unread_notifications, 2)
+
+    def test_hour_reminder_follows_day_reminder(self):
+        appointment = self._appointment(datetime.combine(NOW.date() + timedelta(days=1), time(9, 0)))
+        self.assertEqual(self._run(), {2: 0, 1: 1})
+        self.assertEqual(self._run(NOW + timedelta(hours=23, minutes=10)), {2: 1, 1: 0})
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.reminder_level, 2)
+
+    def test_batches_cover_the_whole_window(self):
+        for minutes in range(0, 300, 30):
+            self._appointment(NOW + timedelta(hours=2, minutes=minutes))
+        self.assertEqual(self._run(), {2: 0, 1: 10})
+
+    def test_stale_save_keeps_the_reminder_level(self):
+        appointment = self._appointment(NOW + timedelta(hours=3))
+        self._run()
+        appointment.notes = 'Bring previous results'
+        appointment.save()
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.reminder_level, 1)
@@ -0,0 +1,92 @@
+from unittest import mock
+
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.http import HttpRequest
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from medica911 import auth_cache, routers
+from medica911.models import Doctor, Notification, User
+
+
+class ReplicaRouterTests(TransactionTestCase):
+    def setUp(self):
+        token = routers.begin_request(pinned=False)
+        self.addCleanup(routers.end_request, token)
+
+    @override_settings(DATABASE_REPLICAS=['replica_1', 'replica_2'])
+    def test_reads_go_to_replicas_until_a_write(self):
+        self.assertIn(Doctor.objects.all().db, ['replica_1', 'replica_2'])
+        with transaction.atomic():
+            self.assertEqual(Doctor.objects.all().db, 'default')
+        User.objects.create_user('amira')
+        self.assertEqual(Doctor.objects.all().db, 'default')
+
+    @override_settings(DATABASE_REPLICAS=['replica_1'])
+    def test_sessions_read_the_primary(self):
+        self.assertEqual(Session.objects.all().db, 'default')
+
+    def test_without_replicas(self):
+        self.assertEqual(Doctor.objects.all().db, 'default')
+
+
+# Reads routed to the replica are counted and sent to the test database.
+# TestCase would wrap every request in a transaction, which keeps all reads on the primary
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class StickinessTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('amira', role='client')
+        Notification.objects.create(user=self.user, notification_type='system', title='Hello', message='...')
+        self.client.force_login(self.user)
+        patcher = mock.patch.object(routers.random, 'choice', return_value='default')
+        self.replica_reads = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_stick_to_the_primary_after_a_write(self):
+        response = self.client.get(reverse('notification_list'))
+        self.assertTrue(self.replica_reads.called)
+        self.assertNotIn(routers.STICKY_COOKIE, response.cookies)
+
+        response = self.client.post(reverse('mark_notifications_read'))
+        self.assertIn(routers.STICKY_COOKIE, response.cookies)
+
+        self.replica_reads.reset_mock()
+        self.client.get(reverse('notification_list'))
+        self.assertFalse(self.replica_reads.called)
+
+    def test_the_window_expires(self):
+        self.client.post(reverse('mark_notifications_read'))
+        self.client.cookies[routers.STICKY_COOKIE] = '1'
+        self.replica_reads.reset_mock()
+        self.client.get(reverse('notification_list'))
+        self.assertTrue(self.replica_reads.called)
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class SnapshotReloadTests(TransactionTestCase):
+    """A lagging replica must not end up in the cached request user, whose writes it may miss"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('amira', role='client')
+        self.client.force_login(self.user)
+        self.request = HttpRequest()
+        self.request.session = self.client.session
+        token = routers.begin_request(pinned=False)
+        self.addCleanup(routers.end_request, token)
+        # Any read sent to the replica fails, as if it had not caught up with the user row yet
+        patcher = mock.patch.object(routers.random, 'choice', side_effect=AssertionError("read from the replica"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_snapshots_are_loaded_from_the_primary(self):
+        self.assertEqual(auth_cache.get_user(self.request).pk, self.user.pk)
+        # Only the reload was pinned, the rest of the request still reads replicas
+        self.assertFalse(routers._pin.get().pinned)
+
+    async def test_async_snapshots_are_loaded_from_the_primary(self):
+        user = await auth_cache.aget_user(self.request)
+        self.assertEqual((user.pk, user.doctor_profile_id), (self.user.pk, None))
+        self.assertFalse(routers._pin.get().pinned)
@@ -0,0 +1,31 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from medica911.models import Doctor, User
+from medica911.search import refresh_search_index
+
+
+class DoctorSearchTests(TestCase):
+    def setUp(self):
+        self.doctors = {}
+        for index, (name, city, clinic) in enumerate([
+            ('Amira', 'Tunis', ''), ('Amine', 'Sfax', 'Clinique de Tunis'), ('Sami', 'Tunis', ''),
+        ]):
+            user = User.objects.create_user(f'doc-{index}', role='doctor', first_name=name, city=city)
+            self.doctors[name] = Doctor.objects.create(
+                user=user, license_number=f'LIC-{index}', clinic_name=clinic,
+            )
+        refresh_search_index()
+
+    def _found(self, **params):
+        response = self.client.get(reverse('browse_doctors'), params)
+        return [doctor.user.first_name for doctor in response.context['doctors']]
+
+    def test_city_filters_the_results(self):
+        # Amine only mentions Tunis in the clinic name
+        self.assertEqual(set(self._found(city='tunis')), {'Amira', 'Sami'})
+        self.assertNotIn('Amine', self._found(name='Amine', city='Tunis'))
+
+    def test_the_name_is_ranked(self):
+        self.assertEqual(self._found(name='Amine')[0], 'Amine')
+        self.assertEqual(self._found(name='Amine', city='Sfax'), ['Amine'])
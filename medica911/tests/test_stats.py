@@ -0,0 +1,104 @@
+from datetime import time, timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from medica911 import stats
+from medica911.models import Appointment, Doctor, StatCounter, User
+from medica911.stats import dashboard_stats, rebuild_stats
+
+
+class DashboardCounterTests(TestCase):
+    def setUp(self):
+        # The first read seeds the counters from the tables
+        dashboard_stats()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctor = Doctor.objects.create(
+                user=User.objects.create_user('doc', role='doctor'), license_number='LIC-1',
+            )
+            self.client_user = User.objects.create_user('amira', role='client')
+
+    def _book(self, hour, **fields):
+        return Appointment.objects.create(
+            client=self.client_user, doctor=self.doctor,
+            appointment_date=timezone.localdate() + timedelta(days=1), appointment_time=time(hour), **fields,
+        )
+
+    def assertMatchesRebuild(self):
+        counters = dashboard_stats()
+        rebuild_stats()
+        self.assertEqual(counters, dashboard_stats())
+        return counters
+
+    def test_users_are_counted_by_role(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            other = User.objects.create_user('sami', role='client')
+        self.assertEqual(self.assertMatchesRebuild()['total_clients'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.role = 'doctor'
+            other.save()
+        counters = self.assertMatchesRebuild()
+        self.assertEqual((counters['total_clients'], counters['total_doctors']), (1, 2))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertEqual(self.assertMatchesRebuild()['total_doctors'], 1)
+
+    def test_appointments_are_counted_by_status(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self._book(9)
+            self._book(10, status='confirmed')
+        counters = self.assertMatchesRebuild()
+        self.assertEqual(
+            (counters['total_appointments'], counters['pending_appointments'], counters['recent_appointments']),
+            (2, 1, 2),
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.status = 'confirmed'
+            first.save()
+        self.assertEqual(self.assertMatchesRebuild()['pending_appointments'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        counters = self.assertMatchesRebuild()
+        self.assertEqual((counters['total_appointments'], counters['recent_appointments']), (1, 1))
+
+    def test_the_dashboard_reads_counters_in_one_query(self):
+        with self.assertNumQueries(1):
+            dashboard_stats()
+
+    def test_deltas_wait_for_the_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self._book(9)
+            self.assertEqual(dashboard_stats()['total_appointments'], 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(dashboard_stats()['total_appointments'], 1)
+
+    def test_deltas_are_spread_over_shards(self):
+        shards = stats.shard_keys(stats.TOTAL_APPOINTMENTS_KEY)
+        picked = iter(shards[:3])
+
+        def choice(keys):
+            return next(picked) if keys == shards else keys[0]
+
+        with mock.patch.object(stats.random, 'choice', side_effect=choice), \
+                self.captureOnCommitCallbacks(execute=True):
+            for hour in (9, 10, 11):
+                self._book(hour)
+        self.assertEqual(StatCounter.objects.filter(key__in=shards).count(), 3)
+        self.assertEqual(self.assertMatchesRebuild()['total_appointments'], 3)
+        # rebuild_stats() folds the shards back into one row
+        self.assertEqual(StatCounter.objects.filter(key__in=shards).count(), 1)
+
+    def test_old_days_are_pruned(self):
+        today = timezone.localdate()
+        old = stats.created_key(today - timedelta(days=stats.RECENT_DAYS))
+        StatCounter.objects.bulk_create([StatCounter(key=old, value=4), StatCounter(key=f'{old}#2', value=1)])
+        with self.captureOnCommitCallbacks(execute=True):
+            self._book(9)
+        self.assertFalse(StatCounter.objects.filter(key__startswith=old).exists())
+        self.assertTrue(StatCounter.objects.filter(key__startswith=stats.created_key(today)).exists())
@@ -0,0 +1,59 @@
+from datetime import date
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db.models import Count, Sum
+from django.test import TestCase
+
+from medica911.models import Appointment, Doctor, DoctorAvailability, Notification, Review, User
+from medica911.synthetic import SyntheticDataset
+
+ANCHOR = date(2026, 1, 15)
+
+
+class SyntheticDatasetTests(TestCase):
+    def _generate(self, prefix='synthetic', seed=7):
+        dataset = SyntheticDataset(
+            doctors=4, clients=10, appointments=200, notifications=50, history_days=60, future_days=10,
+            seed=seed, anchor=ANCHOR, batch_size=64, prefix=prefix,
+        )
+        dataset.generate(log=lambda message: None)
+        return dataset
+
+    def _rows(self, prefix):
+        return list(
+            Appointment.objects.filter(client__username__startswith=prefix)
+            .order_by('pk').values_list('appointment_date', 'appointment_time', 'status', 'created_at')
+        )
+
+    def test_generates_requested_rows(self):
+        self._generate()
+        self.assertEqual(User.objects.filter(role='doctor').count(), 4)
+        self.assertEqual(User.objects.filter(role='client').count(), 10)
+        self.assertTrue(User.objects.get(username='synthetic-admin').is_superuser)
+        self.assertEqual(Appointment.objects.count(), 200)
+        self.assertEqual(Notification.objects.count(), 50)
+        self.assertTrue(DoctorAvailability.objects.exists())
+        self.assertFalse(Review.objects.exclude(appointment__status='completed').exists())
+
+    def test_same_seed_same_rows(self):
+        self._generate(prefix='first')
+        self._generate(prefix='second')
+        self._generate(prefix='third', seed=8)
+        self.assertEqual(self._rows('first'), self._rows('second'))
+        self.assertNotEqual(self._rows('first'), self._rows('third'))
+
+    def test_denormalized_columns_match(self):
+        self._generate()
+        totals = Review.objects.values('appointment__doctor').annotate(total=Sum('rating'), count=Count('id'))
+        for row in totals:
+            doctor = Doctor.objects.get(pk=row['appointment__doctor'])
+            self.assertEqual((doctor.rating_sum, doctor.total_reviews), (row['total'], row['count']))
+            self.assertTrue(doctor.search_document)
+        unread = Notification.objects.filter(is_read=False).count()
+        self.assertEqual(User.objects.aggregate(total=Sum('unread_notifications'))['total'], unread)
+
+    def test_command_refuses_existing_prefix(self):
+        self._generate()
+        with self.assertRaises(CommandError):
+            call_command('generate_data', doctors=1, clients=1, appointments=1, notifications=0, stdout=StringIO())
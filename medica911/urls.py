@@ -1,5 +1,6 @@
 from django.urls import path
 from . import views
+from .metrics import metrics_view
 
 urlpatterns = [
     # Public
@@ -7,24 +8,34 @@ urlpatterns = [
     path('signup/', views.signup_view, name='signup'),
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
+    path('metrics', metrics_view, name='metrics'),
     
     # Shared
     path('dashboard/', views.dashboard, name='dashboard'),
     path('profile/edit/', views.profile_edit, name='profile_edit'),
+    path('notifications/', views.notification_list, name='notification_list'),
+    path('notifications/read/', views.mark_notifications_read, name='mark_notifications_read'),
+    path('notifications/stream/', views.notification_stream, name='notification_stream'),
     
     # Admin
     path('admin-dashboard/', views.admin_dashboard, name='admin_dashboard'),
     path('admin/users/<str:role>/', views.manage_users, name='manage_users'),
+    path('admin/users/<str:role>/export/', views.export_users, name='export_users'),
+    path('admin/doctors/import/', views.import_doctors, name='import_doctors'),
+    path('admin/appointments/export/', views.export_appointments, name='export_appointments'),
     
     # Doctor
     path('doctor-dashboard/', views.doctor_dashboard, name='doctor_dashboard'),
+    path('doctor/calendar/feed/', views.doctor_calendar_feed, name='doctor_calendar_feed'),
     path('doctor/profile/edit/', views.doctor_profile_edit, name='doctor_profile_edit'),
     path('doctor/appointment/<int:pk>/update/', views.update_appointment, name='update_appointment'),
     
     # Client
     path('client-dashboard/', views.client_dashboard, name='client_dashboard'),
+    path('appointment/<int:appointment_id>/', views.appointment_detail, name='appointment_detail'),
     path('doctors/browse/', views.browse_doctors, name='browse_doctors'),
     path('doctors/<int:doctor_id>/book/', views.book_appointment, name='book_appointment'),
+    path('doctors/<int:doctor_id>/slots/', views.doctor_slots, name='doctor_slots'),
     path('doctors/<int:doctor_id>/', views.doctor_detail, name='doctor_detail'),
     path('appointment/<int:appointment_id>/review/', views.add_review, name='add_review'),
 ]
@@ -1,30 +1,57 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_POST
 from django.contrib import messages
-from django.db.models import Count, Sum, Avg, Q
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Sum
 from django.utils import timezone
 from datetime import datetime, timedelta
+import io
 import json
 
 from .models import User, Speciality, Doctor, Appointment, Review, Notification
 from .forms import (
     CustomUserCreationForm, CustomLoginForm, UserProfileForm, 
     DoctorProfileForm, AppointmentForm, ReviewForm, 
-    DoctorSearchForm, AppointmentUpdateForm
+    DoctorSearchForm, AppointmentUpdateForm, AppointmentFilterForm, UserFilterForm,
+    DoctorImportForm
 )
-from .decorators import admin_required, doctor_required, client_required
+from .decorators import admin_required, doctor_required, client_required, resolve_user
+from .pagination import KeysetPaginator
+from . import availability, events, exports, fragments, notifications, onboarding
+from .booking import SlotUnavailable, book_slot
+from .stats import dashboard_stats
+
+DOCTORS_PER_PAGE = 12
+APPOINTMENTS_PER_PAGE = 20
+NOTIFICATIONS_PER_PAGE = 20
+USERS_PER_PAGE = 50
+IMPORT_ERRORS_SHOWN = 200
+CALENDAR_VIEWS = ['day', 'week', 'month']
+SLOT_FEED_DEFAULT_DAYS = 14
+SLOT_FEED_MAX_DAYS = 62
 
 # --- Public Views ---
 
-def index(request):
+async def _home_specialities():
+    return {'specialities': [speciality async for speciality in Speciality.objects.all()[:6]]}
+
+async def _home_top_doctors():
+    doctors = Doctor.objects.filter(is_available=True).select_related('user', 'speciality').order_by('-rating')[:4]
+    return {'top_doctors': [doctor async for doctor in doctors]}
+
+@resolve_user
+async def index(request):
     """Home page showing top doctors and specialities"""
-    specialities = Speciality.objects.all()[:6]
-    top_doctors = Doctor.objects.filter(is_available=True).order_by('-rating')[:4]
-    return render(request, 'medica911/index.html', {
-        'specialities': specialities,
-        'top_doctors': top_doctors
-    })
+    # Rows are only loaded for the fragments without a cached copy
+    return render(request, 'medica911/index.html', await fragments.afragments(fragments.HOME_TEMPLATES, {
+        fragments.HOME_SPECIALITIES: _home_specialities,
+        fragments.HOME_TOP_DOCTORS: _home_top_doctors,
+    }))
 
 def signup_view(request):
     """Unified signup for doctors and clients"""
@@ -97,14 +124,16 @@ def dashboard(request):
 @login_required
 def profile_edit(request):
     """Shared profile edit view"""
+    # request.user only carries the columns of its cached snapshot
+    user = get_object_or_404(User, pk=request.user.pk)
     if request.method == 'POST':
-        form = UserProfileForm(request.POST, request.FILES, instance=request.user)
+        form = UserProfileForm(request.POST, request.FILES, instance=user)
         if form.is_valid():
             form.save()
             messages.success(request, "Profile updated successfully!")
             return redirect('dashboard')
     else:
-        form = UserProfileForm(instance=request.user)
+        form = UserProfileForm(instance=user)
     return render(request, 'medica911/profile_edit.html', {'form': form})
 
 # --- Admin Views ---
@@ -112,56 +141,167 @@ def profile_edit(request):
 @admin_required
 def admin_dashboard(request):
     """Admin dashboard with statistics"""
-    total_doctors = User.objects.filter(role='doctor').count()
-    total_clients = User.objects.filter(role='client').count()
-    total_appointments = Appointment.objects.count()
-    
-    # Simple trend: appointments in the last 7 days
-    last_week = timezone.now() - timedelta(days=7)
-    recent_appointments = Appointment.objects.filter(created_at__gte=last_week).count()
-    
-    pending_appointments = Appointment.objects.filter(status='pending').count()
-    
-    context = {
-        'total_doctors': total_doctors,
-        'total_clients': total_clients,
-        'total_appointments': total_appointments,
-        'recent_appointments': recent_appointments,
-        'pending_appointments': pending_appointments,
-        'latest_appointments': Appointment.objects.all().order_by('-created_at')[:5]
-    }
+    context = dashboard_stats()
+    context['latest_appointments'] = (
+        Appointment.objects.select_related('client', 'doctor__user', 'doctor__speciality')
+        .order_by('-created_at')[:5]
+    )
     return render(request, 'medica911/admin/dashboard.html', context)
 
 @admin_required
 def manage_users(request, role):
-    """View to manage doctors or clients"""
-    users = User.objects.filter(role=role)
+    """Paginated, sortable and filterable table of the doctors or clients"""
+    form = UserFilterForm(request.GET)
+    users = form.filter(User.objects.filter(role=role)).only(
+        'id', 'username', 'first_name', 'last_name', 'email', 'phone', 'profile_picture',
+        'is_active', 'date_joined', 'last_login'
+    )
+    paginator = KeysetPaginator(users, form.ordering, USERS_PER_PAGE)
+    page = paginator.page(after=request.GET.get('after'), before=request.GET.get('before'))
     return render(request, 'medica911/admin/manage_users.html', {
-        'users': users,
+        'users': page.object_list,
+        'page': page,
+        'form': form,
+        'role_key': role,
         'role': role.capitalize()
     })
 
+@admin_required
+def export_users(request, role):
+    """Stream the filtered users of a role as CSV or NDJSON (?format=ndjson)"""
+    form = UserFilterForm(request.GET)
+    users = form.filter(User.objects.filter(role=role)).order_by(*form.ordering)
+    return exports.stream_export(users, exports.USER_COLUMNS, f'{role}s', request.GET.get('format'))
+
+@admin_required
+def export_appointments(request):
+    """Stream the filtered appointments as CSV or NDJSON (?format=ndjson)"""
+    form = AppointmentFilterForm(request.GET)
+    appointments = Appointment.objects.order_by('id')
+    if form.is_valid():
+        appointments = form.filter(appointments)
+    return exports.stream_export(
+        appointments, exports.APPOINTMENT_COLUMNS, 'appointments', request.GET.get('format')
+    )
+
+@admin_required
+def import_doctors(request):
+    """Upload a doctor onboarding CSV, `manage.py import_doctors` takes the same file for very large ones"""
+    report = None
+    if request.method == 'POST':
+        form = DoctorImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            lines = io.TextIOWrapper(form.cleaned_data['file'].file, encoding='utf-8-sig', newline='')
+            try:
+                report = onboarding.import_doctors(lines, dry_run=form.cleaned_data['dry_run'])
+            except (onboarding.InvalidImportFile, UnicodeDecodeError) as exc:
+                form.add_error('file', str(exc))
+    else:
+        form = DoctorImportForm()
+    return render(request, 'medica911/admin/import_doctors.html', {
+        'form': form,
+        'report': report,
+        'errors': report.errors[:IMPORT_ERRORS_SHOWN] if report else [],
+    })
+
 # --- Doctor Views ---
 
+def _calendar_window(view, anchor):
+    """First and last day of the day/week/month containing `anchor`, plus the anchors either side"""
+    if view == 'day':
+        return anchor, anchor, anchor - timedelta(days=1), anchor + timedelta(days=1)
+    if view == 'month':
+        start = anchor.replace(day=1)
+        next_start = (start + timedelta(days=32)).replace(day=1)
+        previous_start = (start - timedelta(days=1)).replace(day=1)
+        return start, next_start - timedelta(days=1), previous_start, next_start
+    start = anchor - timedelta(days=anchor.weekday())
+    return start, start + timedelta(days=6), start - timedelta(days=7), start + timedelta(days=7)
+
+def _calendar_appointments(request, doctor):
+    """Parse ?view=&date= and load the window's appointments with their client in one query"""
+    view = request.GET.get('view', 'week')
+    if view not in CALENDAR_VIEWS:
+        view = 'week'
+    try:
+        anchor = datetime.strptime(request.GET['date'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        anchor = timezone.localdate()
+
+    start, end, previous_anchor, next_anchor = _calendar_window(view, anchor)
+    appointments = (
+        Appointment.objects.filter(
+            doctor=doctor,
+            appointment_date__range=(start, end),
+            status__in=['pending', 'confirmed']
+        )
+        .select_related('client')
+        .only(
+            'id', 'appointment_date', 'appointment_time', 'status', 'reason',
+            'client__first_name', 'client__last_name', 'client__phone'
+        )
+        .order_by('appointment_date', 'appointment_time')
+    )
+    return {
+        'view': view,
+        'start': start,
+        'end': end,
+        'previous': previous_anchor,
+        'next': next_anchor,
+        'appointments': appointments,
+    }
+
 @doctor_required
 def doctor_dashboard(request):
-    """Doctor-specific dashboard"""
-    doctor = request.user.doctor_profile
-    upcoming = Appointment.objects.filter(
-        doctor=doctor, 
-        appointment_date__gte=timezone.now().date(),
-        status__in=['pending', 'confirmed']
-    ).order_by('appointment_date', 'appointment_time')
+    """Doctor-specific dashboard with a day/week/month appointment calendar"""
+    doctor = get_object_or_404(Doctor.objects.select_related('user', 'speciality'), user=request.user)
+    calendar = _calendar_appointments(request, doctor)
+    today = timezone.localdate()
     
     return render(request, 'medica911/doctor/dashboard.html', {
         'doctor': doctor,
-        'upcoming_appointments': upcoming
+        'calendar': calendar,
+        'calendar_views': CALENDAR_VIEWS,
+        'upcoming_appointments': calendar['appointments'],
+        'todays_visits': Appointment.objects.filter(
+            doctor=doctor, appointment_date=today, status__in=['pending', 'confirmed']
+        ).count(),
+        'total_appointments': Appointment.objects.filter(doctor=doctor).count()
+    })
+
+@doctor_required
+def doctor_calendar_feed(request):
+    """JSON feed of the doctor's appointments for one calendar window"""
+    doctor = get_object_or_404(Doctor.objects.only('id'), pk=request.user.doctor_profile_id)
+    calendar = _calendar_appointments(request, doctor)
+    return JsonResponse({
+        'view': calendar['view'],
+        'start': calendar['start'].isoformat(),
+        'end': calendar['end'].isoformat(),
+        'previous': calendar['previous'].isoformat(),
+        'next': calendar['next'].isoformat(),
+        'appointments': [
+            {
+                'id': app.id,
+                'date': app.appointment_date.isoformat(),
+                'time': app.appointment_time.strftime('%H:%M'),
+                'status': app.status,
+                'status_display': app.get_status_display(),
+                'reason': app.reason or '',
+                'client': {
+                    'name': app.client.get_full_name(),
+                    'phone': app.client.phone or '',
+                },
+                'update_url': reverse('update_appointment', args=[app.id]),
+            }
+            for app in calendar['appointments']
+        ],
     })
 
 @doctor_required
 def doctor_profile_edit(request):
     """Doctor medical profile edit"""
-    doctor = request.user.doctor_profile
+    doctor = get_object_or_404(Doctor, pk=request.user.doctor_profile_id)
     if request.method == 'POST':
         form = DoctorProfileForm(request.POST, instance=doctor)
         if form.is_valid():
@@ -175,13 +315,23 @@ def doctor_profile_edit(request):
 @doctor_required
 def update_appointment(request, pk):
     """Doctor updates appointment status/notes"""
-    appointment = get_object_or_404(Appointment, pk=pk, doctor=request.user.doctor_profile)
+    appointment = get_object_or_404(
+        Appointment.objects.select_related('doctor__user'), pk=pk, doctor_id=request.user.doctor_profile_id
+    )
     if request.method == 'POST':
         form = AppointmentUpdateForm(request.POST, instance=appointment)
         if form.is_valid():
-            form.save()
-            messages.success(request, "Appointment updated!")
-            return redirect('doctor_dashboard')
+            try:
+                with transaction.atomic():
+                    form.save()
+            except IntegrityError:
+                # The slot was booked again between the form's check and the save
+                form.add_error('status', "This time slot has been booked again since the cancellation.")
+            else:
+                if 'status' in form.changed_data:
+                    notifications.appointment_status_changed(appointment)
+                messages.success(request, "Appointment updated!")
+                return redirect('doctor_dashboard')
     else:
         form = AppointmentUpdateForm(instance=appointment)
     return render(request, 'medica911/doctor/update_appointment.html', {
@@ -194,58 +344,103 @@ def update_appointment(request, pk):
 @client_required
 def client_dashboard(request):
     """Client-specific dashboard"""
-    appointments = Appointment.objects.filter(client=request.user).order_by('-appointment_date')
+    appointments = (
+        Appointment.objects.filter(client=request.user)
+        .select_related('doctor__user', 'doctor__speciality', 'review')
+        .defer('notes', 'diagnosis', 'prescription')
+    )
+    paginator = KeysetPaginator(
+        appointments, ['-appointment_date', '-appointment_time', '-id'], APPOINTMENTS_PER_PAGE
+    )
+    page = paginator.page(after=request.GET.get('after'), before=request.GET.get('before'))
     return render(request, 'medica911/client/dashboard.html', {
-        'appointments': appointments
+        'appointments': page.object_list,
+        'page': page,
+        'total_appointments': Appointment.objects.filter(client=request.user).count()
+    })
+
+@client_required
+def appointment_detail(request, appointment_id):
+    """Details of one of the client's appointments, loaded into the dashboard modal"""
+    appointment = get_object_or_404(
+        Appointment.objects.select_related('doctor__user', 'doctor__speciality', 'review'),
+        id=appointment_id, client=request.user
+    )
+    return render(request, 'medica911/client/appointment_detail.html', {
+        'appointment': appointment
     })
 
-def browse_doctors(request):
+@resolve_user
+async def browse_doctors(request):
     """Search and filter doctors"""
     form = DoctorSearchForm(request.GET)
-    doctors = Doctor.objects.filter(is_available=True)
-    
-    if form.is_valid():
-        if form.cleaned_data.get('speciality'):
-            doctors = doctors.filter(speciality=form.cleaned_data['speciality'])
-        if form.cleaned_data.get('city'):
-            doctors = doctors.filter(user__city__icontains=form.cleaned_data['city'])
-        if form.cleaned_data.get('name'):
-            doctors = doctors.filter(
-                Q(user__first_name__icontains=form.cleaned_data['name']) |
-                Q(user__last_name__icontains=form.cleaned_data['name'])
-            )
-            
+    doctors = Doctor.objects.filter(is_available=True).select_related('user', 'speciality')
+    # Keyset pagination on the default ordering, 'id' breaks ties between equal names
+    ordering = ['-rating', 'user__first_name', 'id']
+    by_distance = False
+
+    if await form.ais_valid():
+        doctors = form.search(doctors)
+        by_distance = form.origin is not None
+        if by_distance:
+            ordering = ['distance', 'id']
+        elif form.search_query:
+            ordering = ['-search_rank', 'id']
+
+    paginator = KeysetPaginator(doctors, ordering, DOCTORS_PER_PAGE)
+    page = await paginator.apage(after=request.GET.get('after'), before=request.GET.get('before'))
+
     return render(request, 'medica911/client/browse_doctors.html', {
-        'doctors': doctors,
+        'doctors': page.object_list,
+        # The distance depends on the search, it is shown next to the cached card
+        'results': zip(page.object_list, await fragments.adoctor_cards(page.object_list)),
+        'page': page,
+        'by_distance': by_distance,
         'form': form
     })
 
 @client_required
 def book_appointment(request, doctor_id):
     """Book an appointment with a doctor"""
-    doctor = get_object_or_404(Doctor, id=doctor_id)
+    doctor = get_object_or_404(Doctor.objects.select_related('user', 'speciality'), id=doctor_id)
+    alternatives = []
+    status = 200
     if request.method == 'POST':
-        form = AppointmentForm(request.POST)
+        form = AppointmentForm(request.POST, doctor=doctor)
         if form.is_valid():
-            appointment = form.save(commit=False)
-            appointment.client = request.user
-            appointment.doctor = doctor
-            appointment.status = 'pending'
-            appointment.save()
-            messages.success(request, f"Appointment request sent to Dr. {doctor.user.get_full_name()}!")
-            return redirect('client_dashboard')
+            try:
+                appointment = book_slot(
+                    request.user, doctor,
+                    form.cleaned_data['appointment_date'],
+                    form.cleaned_data['appointment_time'],
+                    reason=form.cleaned_data.get('reason'),
+                )
+            except SlotUnavailable as exc:
+                # Lost the race for this slot, offer the closest free ones instead
+                form.add_error('appointment_time', str(exc))
+                alternatives = exc.alternatives
+                status = 409
+            else:
+                notifications.appointment_requested(appointment)
+                messages.success(request, f"Appointment request sent to Dr. {doctor.user.get_full_name()}!")
+                return redirect('client_dashboard')
+        else:
+            alternatives = form.alternatives
     else:
-        form = AppointmentForm()
+        form = AppointmentForm(doctor=doctor)
     
     return render(request, 'medica911/client/book_appointment.html', {
         'form': form,
-        'doctor': doctor
-    })
+        'doctor': doctor,
+        'alternatives': alternatives
+    }, status=status)
 
 @client_required
 def add_review(request, appointment_id):
     """Add a review for a completed appointment"""
-    appointment = get_object_or_404(Appointment, id=appointment_id, client=request.user, status='completed')
+    appointment = get_object_or_404(
+        Appointment.objects.select_related('doctor'), id=appointment_id, client=request.user, status='completed'
+    )
     if hasattr(appointment, 'review'):
         messages.info(request, "You have already reviewed this appointment.")
         return redirect('client_dashboard')
@@ -256,14 +451,7 @@ def add_review(request, appointment_id):
             review = form.save(commit=False)
             review.appointment = appointment
             review.save()
-            
-            # Update doctor overall rating
-            doctor = appointment.doctor
-            doctor_reviews = Review.objects.filter(appointment__doctor=doctor)
-            avg_rating = doctor_reviews.aggregate(Avg('rating'))['rating__avg']
-            doctor.rating = avg_rating
-            doctor.total_reviews = doctor_reviews.count()
-            doctor.save()
+            notifications.review_posted(review)
 
             messages.success(request, "Thank you for your review!")
             return redirect('client_dashboard')
@@ -275,10 +463,78 @@ def add_review(request, appointment_id):
     })
 
 
-def doctor_detail(request, doctor_id):
+# --- Notifications ---
+
+@login_required
+def notification_list(request):
+    """The user's notifications, newest first"""
+    paginator = KeysetPaginator(
+        Notification.objects.filter(user=request.user), ['-created_at', '-id'], NOTIFICATIONS_PER_PAGE
+    )
+    page = paginator.page(after=request.GET.get('after'), before=request.GET.get('before'))
+    return render(request, 'medica911/notifications.html', {
+        'notifications': page.object_list,
+        'page': page
+    })
+
+@login_required
+@require_POST
+def mark_notifications_read(request):
+    """Mark every notification as read in one UPDATE"""
+    notifications.mark_all_read(request.user)
+    return redirect('notification_list')
+
+@login_required
+async def notification_stream(request):
+    """Server-Sent Events stream of the user's new notifications, only served over ASGI"""
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would have to drain the endless stream, holding its thread forever.
+        # 204 also tells EventSource not to reconnect
+        return HttpResponse(status=204)
+    user = await request.auser()
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    response = StreamingHttpResponse(events.stream(user.pk, last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def doctor_slots(request, doctor_id):
+    """JSON feed of a doctor's free slots, ?start=YYYY-MM-DD&days=N"""
+    doctor = get_object_or_404(Doctor.objects.only('id'), id=doctor_id)
+    today = timezone.localdate()
+    try:
+        start = datetime.strptime(request.GET['start'], '%Y-%m-%d').date() if request.GET.get('start') else today
+        days = int(request.GET.get('days', SLOT_FEED_DEFAULT_DAYS))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid start or days parameter.'}, status=400)
+
+    start = max(start, today)
+    days = min(max(days, 1), SLOT_FEED_MAX_DAYS)
+    slots = availability.free_slots(doctor.id, start, start + timedelta(days=days - 1))
+    return JsonResponse({
+        'doctor': doctor.id,
+        'slot_minutes': availability.SLOT_MINUTES,
+        'days': {
+            day.isoformat(): [slot.strftime('%H:%M') for slot in times]
+            for day, times in slots.items()
+        },
+    })
+
+
+@resolve_user
+async def doctor_detail(request, doctor_id):
     """View doctor profile details"""
-    doctor = get_object_or_404(Doctor, id=doctor_id)
-    reviews = Review.objects.filter(appointment__doctor=doctor)
+    doctor = await aget_object_or_404(Doctor.objects.select_related('user', 'speciality'), id=doctor_id)
+    reviews = [
+        review async for review in
+        Review.objects.filter(appointment__doctor=doctor).select_related('appointment__client')
+    ]
     return render(request, 'medica911/client/doctor_detail.html', {
         'doctor': doctor,
         'reviews': reviews